@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = ""
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--max-capacity",
+        type=float,
+        default=None,
+        help="Skip memory benchmarks with a larger capacity",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    max_capacity = config.getoption("--max-capacity")
+    if max_capacity is None:
+        return
+
+    selected, deselected = [], []
+    for item in items:
+        callspec = getattr(item, "callspec", None)
+        if callspec and callspec.params.get("capacity", 0) > max_capacity:
+            deselected.append(item)
+        else:
+            selected.append(item)
+
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
@@ -1,29 +1,330 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import functools
+import math
+
 import numpy
+import pytest
 
-from neodroidagent.utilities import TrajectoryBuffer, TransitionBuffer
+from neodroidagent.common.memory import (
+    ExpandableCircularBuffer,
+    PrioritisedBuffer,
+    SampleTrajectoryBuffer,
+    SumTree,
+    TransitionPoint,
+    TransitionPointBuffer,
+)
+from neodroidagent.common.memory.data_structures.segment_tree import (
+    MinSegmentTree,
+    SumSegmentTree,
+)
 
 __author__ = "Christian Heider Nielsen"
-__doc__ = ""
+__doc__ = r"""
+  Insert, sample and priority update throughput of the memory structures, run with
+
+    pytest benchmark
+
+  from the repository root, every run is saved as json in .benchmarks, compare against a previous run and fail on
+  regressions with
+
+    pytest benchmark --benchmark-compare=0001 --benchmark-compare-fail=mean:25%
+
+  --max-capacity limits the capacities benchmarked for a quick run
+  """
+
+CAPACITIES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+OBSERVATION_SHAPES = [(8,), (64,), (4, 84, 84)]
+INSERT_SIZE = 1000
+BATCH_SIZE = 256
+
+capacities = pytest.mark.parametrize(
+    "capacity", CAPACITIES, ids=[f"capacity{c:.0e}" for c in CAPACITIES]
+)
+observation_shapes = pytest.mark.parametrize(
+    "observation_shape",
+    OBSERVATION_SHAPES,
+    ids=["x".join(str(d) for d in s) for s in OBSERVATION_SHAPES],
+)
+
+
+def transition_points(observation_shape, num):
+    """
+A batch of num transition points, the observations of a batch are views of the same array so that filling large
+buffers is bounded by the buffer overhead and not by memory
+"""
+    observation = numpy.zeros(observation_shape, dtype=numpy.float32)
+    observations = numpy.broadcast_to(observation, (num, *observation_shape))
+    return TransitionPoint(
+        observations,
+        numpy.zeros((num, 1), dtype=numpy.int64),
+        observations,
+        numpy.zeros(num),
+        numpy.zeros(num, dtype=bool),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def filled(constructor, capacity, observation_shape=None):
+    """
+Memories filled to capacity, shared between the benchmarks of a configuration as inserting keeps them full
+"""
+    if constructor is ExpandableCircularBuffer:
+        memory = ExpandableCircularBuffer(capacity)
+        memory._extend([numpy.zeros(observation_shape)] * capacity)
+    elif constructor is TransitionPointBuffer:
+        memory = TransitionPointBuffer(capacity)
+        memory.add_transition_points(transition_points(observation_shape, capacity))
+    elif constructor is PrioritisedBuffer:
+        memory = PrioritisedBuffer(capacity)
+        memory.extend([numpy.zeros(observation_shape)] * capacity, numpy.random.random(capacity))
+    elif constructor is SumTree:
+        memory = SumTree(capacity, round_capacity_to_nearest_power_of_two=False)
+        memory.extend(range(capacity), numpy.random.random(capacity))
+    else:  # Segment trees
+        memory = constructor(2 ** math.ceil(math.log2(capacity)))
+        memory[numpy.arange(capacity)] = numpy.random.random(capacity)
+    return memory
+
+
+# region ExpandableCircularBuffer
+
+
+@capacities
+@observation_shapes
+def benchmark_expandable_circular_buffer_add(benchmark, capacity, observation_shape):
+    memory = filled(ExpandableCircularBuffer, capacity, observation_shape)
+    values = [numpy.zeros(observation_shape)] * INSERT_SIZE
+
+    def add():
+        for value in values:
+            memory._add(value)
+
+    benchmark(add)
+
+
+@capacities
+@observation_shapes
+def benchmark_expandable_circular_buffer_extend(benchmark, capacity, observation_shape):
+    memory = filled(ExpandableCircularBuffer, capacity, observation_shape)
+    values = [numpy.zeros(observation_shape)] * INSERT_SIZE
+    benchmark(memory._extend, values)
+
+
+@capacities
+@observation_shapes
+def benchmark_expandable_circular_buffer_sample(benchmark, capacity, observation_shape):
+    memory = filled(ExpandableCircularBuffer, capacity, observation_shape)
+    benchmark(memory._sample, BATCH_SIZE)
+
+
+# endregion
+
+# region TransitionPointBuffer
+
+
+@capacities
+@observation_shapes
+def benchmark_transition_point_buffer_add(benchmark, capacity, observation_shape):
+    memory = filled(TransitionPointBuffer, capacity, observation_shape)
+    points = [
+        TransitionPoint(*p)
+        for p in zip(*transition_points(observation_shape, INSERT_SIZE))
+    ]
+
+    def add():
+        for point in points:
+            memory.add_transition_point(point)
+
+    benchmark(add)
+
+
+@capacities
+@observation_shapes
+def benchmark_transition_point_buffer_add_batch(
+    benchmark, capacity, observation_shape
+):
+    memory = filled(TransitionPointBuffer, capacity, observation_shape)
+    benchmark(
+        memory.add_transition_points, transition_points(observation_shape, INSERT_SIZE)
+    )
+
+
+@capacities
+@observation_shapes
+def benchmark_transition_point_buffer_sample(benchmark, capacity, observation_shape):
+    memory = filled(TransitionPointBuffer, capacity, observation_shape)
+    benchmark(memory.sample, BATCH_SIZE)
+
+
+# endregion
+
+# region PrioritisedBuffer
+
+
+@capacities
+@observation_shapes
+def benchmark_prioritised_buffer_add(benchmark, capacity, observation_shape):
+    memory = filled(PrioritisedBuffer, capacity, observation_shape)
+    samples = [numpy.zeros(observation_shape)] * INSERT_SIZE
+    errors = numpy.random.random(INSERT_SIZE)
+
+    def add():
+        for sample, error in zip(samples, errors):
+            memory.add(sample, error)
+
+    benchmark(add)
+
+
+@capacities
+@observation_shapes
+def benchmark_prioritised_buffer_extend(benchmark, capacity, observation_shape):
+    memory = filled(PrioritisedBuffer, capacity, observation_shape)
+    benchmark(
+        memory.extend,
+        [numpy.zeros(observation_shape)] * INSERT_SIZE,
+        numpy.random.random(INSERT_SIZE),
+    )
+
+
+@capacities
+@observation_shapes
+def benchmark_prioritised_buffer_sample(benchmark, capacity, observation_shape):
+    memory = filled(PrioritisedBuffer, capacity, observation_shape)
+    benchmark(memory.sample_weighted, BATCH_SIZE)
+
+
+@capacities
+def benchmark_prioritised_buffer_update(benchmark, capacity):
+    memory = filled(PrioritisedBuffer, capacity, OBSERVATION_SHAPES[0])
+    memory.sample_weighted(BATCH_SIZE)
+    benchmark(memory.update_last_batch, numpy.random.random(BATCH_SIZE))
+
+
+# endregion
+
+# region SumTree
+
+
+@capacities
+def benchmark_sum_tree_push(benchmark, capacity):
+    memory = filled(SumTree, capacity)
+    priorities = numpy.random.random(INSERT_SIZE)
+
+    def push():
+        for i, p in enumerate(priorities):
+            memory.push(i, p)
+
+    benchmark(push)
+
+
+@capacities
+def benchmark_sum_tree_extend(benchmark, capacity):
+    memory = filled(SumTree, capacity)
+    benchmark(memory.extend, range(INSERT_SIZE), numpy.random.random(INSERT_SIZE))
+
+
+@capacities
+def benchmark_sum_tree_get_batch(benchmark, capacity):
+    memory = filled(SumTree, capacity)
+    benchmark(memory.get_batch, numpy.random.random(BATCH_SIZE))
+
+
+@capacities
+def benchmark_sum_tree_update_leaves(benchmark, capacity):
+    memory = filled(SumTree, capacity)
+    leaf_indices = numpy.random.randint(0, len(memory), BATCH_SIZE) + capacity - 1
+    benchmark(memory.update_leaves, leaf_indices, numpy.random.random(BATCH_SIZE))
+
+
+# endregion
+
+# region Segment trees
+
+segment_trees = pytest.mark.parametrize(
+    "constructor", [SumSegmentTree, MinSegmentTree], ids=["sum", "min"]
+)
+
+
+@capacities
+@segment_trees
+def benchmark_segment_tree_set(benchmark, capacity, constructor):
+    memory = filled(constructor, capacity)
+    indices = numpy.random.randint(0, capacity, BATCH_SIZE)
+    priorities = numpy.random.random(BATCH_SIZE)
+
+    def set_items():
+        for i, p in zip(indices, priorities):
+            memory[i] = p
+
+    benchmark(set_items)
+
+
+@capacities
+@segment_trees
+def benchmark_segment_tree_set_batch(benchmark, capacity, constructor):
+    memory = filled(constructor, capacity)
+    indices = numpy.random.randint(0, capacity, BATCH_SIZE)
+    benchmark(memory.__setitem__, indices, numpy.random.random(BATCH_SIZE))
+
+
+@capacities
+@segment_trees
+def benchmark_segment_tree_reduce(benchmark, capacity, constructor):
+    memory = filled(constructor, capacity)
+    benchmark(memory.reduce, 0, capacity)
+
+
+@capacities
+@segment_trees
+def benchmark_segment_tree_reduce_range(benchmark, capacity, constructor):
+    memory = filled(constructor, capacity)
+    benchmark(memory.reduce, 1, capacity - 1)
+
+
+@capacities
+def benchmark_sum_segment_tree_find_prefix_sum_idx(benchmark, capacity):
+    memory = filled(SumSegmentTree, capacity)
+    prefix_sums = numpy.random.random(BATCH_SIZE) * memory.sum()
+
+    def find():
+        for prefix_sum in prefix_sums:
+            memory.find_prefix_sum_idx(prefix_sum)
+
+    benchmark(find)
+
+
+@capacities
+def benchmark_sum_segment_tree_find_prefix_sum_idx_batch(benchmark, capacity):
+    memory = filled(SumSegmentTree, capacity)
+    benchmark(
+        memory.find_prefix_sum_idx, numpy.random.random(BATCH_SIZE) * memory.sum()
+    )
+
+
+# endregion
+
+# region SampleTrajectoryBuffer
+
 
+@capacities
+@observation_shapes
+def benchmark_sample_trajectory_buffer(benchmark, capacity, observation_shape):
+    """
+Fills a trajectory of length capacity and retrieves it, as done once per rollout
+"""
+    signal = numpy.zeros(1)
+    action = numpy.zeros(observation_shape)
 
-def benchmark_transition_buffer_list():
-    rb = TransitionBuffer()
-    a = numpy.random.random((999, 999))
-    for e in a:
-        rb.add_transition_point(e, None, None, None, None)
-    b, *_ = rb.sample(999)
+    def setup():
+        return (SampleTrajectoryBuffer(),), {}
 
+    def fill_and_retrieve(memory):
+        for _ in range(capacity):
+            memory.add_trajectory_point(signal, False, action, None)
+        memory.retrieve_trajectory()
 
-def benchmark_trajectory_list():
-    rb = TrajectoryBuffer()
-    a = numpy.random.random((999, 999))
-    for e in a:
-        rb.add_trajectory_point(e, None, None)
-    b, *_ = rb.retrieve_trajectory()
+    benchmark.pedantic(fill_and_retrieve, setup=setup, rounds=3)
 
 
-if __name__ == "__main__":
-    benchmark_transition_buffer_list()
-    benchmark_trajectory_list()
+# endregion
@@ -10,4 +10,5 @@ __doc__ = r"""
 from .evolutionary import *
 from .model_free import *
 from .numpy_agent import *
+from .q_table import *
 from .model_based import *
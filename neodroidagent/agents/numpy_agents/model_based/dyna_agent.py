@@ -1,9 +1,11 @@
-from collections import defaultdict
 from typing import Iterable
 
 import numpy
 
 from neodroidagent.agents.numpy_agents.numpy_agent import NumpyAgent
+from neodroidagent.common.memory.data_structures.indexed_priority_queue import (
+    IndexedPriorityQueue,
+)
 from neodroidagent.utilities.misc import tile_state_space, EnvModel
 
 
@@ -30,10 +32,14 @@ class DynaAgent(NumpyAgent):
 A Dyna-`Q` / Dyna-`Q+` agent with full TD(0) `Q`-learning updates via
 prioritized-sweeping.
 
+Given a list of environments the agent runs an episode in each of them at
+once, the model learns from the steps of all environments and the
+planning backups are run once per step of the environments.
+
 Parameters
 ----------
-env : :class:`gym.wrappers` or :class:`gym.envs` instance
-The environment to run the agent on
+env : :class:`gym.wrappers` or :class:`gym.envs` instance, or a list of them
+The environment(s) to run the agent on
 lr : float
 Learning rate for the `Q` function updates. Default is 0.05.
 epsilon : float between [0, 1]
@@ -106,22 +112,19 @@ Default is 50.
         self.behavior_policy = self.target_policy = self._epsilon_soft_policy
 
         # initialize Q function and model
-        self.parameters["Q"] = defaultdict(numpy.random.rand)
+        self.parameters["Q"] = self._create_q_table()
         self.parameters["model"] = EnvModel()
 
-        # initialize returns object for each state-action pair
+        # the steps since (s, a) was last visited are the number of real
+        # steps taken minus the step of the last visit
         self.derived_variables = {
             "episode_num": 0,
-            "sweep_queue": {},
+            "sweep_queue": IndexedPriorityQueue(),
             "visited": set([]),
-            "steps_since_last_visit": defaultdict(lambda: 0),
+            "n_real_steps": 0,
+            "last_visit": self._create_q_table(init=numpy.zeros),
         }
 
-        if self.q_plus:
-            self.derived_variables["steps_since_last_visit"] = defaultdict(
-                numpy.random.rand
-            )
-
         self.hyperparameters = {
             "agent": "DynaAgent",
             "lr": self.lr,
@@ -202,18 +205,8 @@ action_prob : float in range [0, 1]
 If `a` is not None, returns the probability of `a` under the
 epsilon-soft policy.
 """
-        E, P = self.env_info, self.parameters
-
         # TODO: this assumes all actions are available in every state
-        n_actions = numpy.prod(E["n_actions_per_dim"])
-
-        a_star = numpy.argmax([P["Q"][(s, aa)] for aa in range(n_actions)])
-        p_a_star = 1.0 - self.epsilon + (self.epsilon / n_actions)
-        p_a = self.epsilon / n_actions
-
-        action_probs = numpy.ones(n_actions) * p_a
-        action_probs[a_star] = p_a_star
-        numpy.testing.assert_allclose(numpy.sum(action_probs), 1)
+        action_probs = self.parameters["Q"].epsilon_soft_probs(s, self.epsilon)
 
         if a is not None:
             return action_probs[a]
@@ -249,9 +242,7 @@ action_prob : float in range [0, 1]
 If `a` is not None, returns the probability of `a` under the
 greedy policy.
 """
-        E, Q = self.env_info, self.parameters["Q"]
-        n_actions = numpy.prod(E["n_actions_per_dim"])
-        a_star = numpy.argmax([Q[(s, aa)] for aa in range(n_actions)])
+        a_star = self.parameters["Q"].argmax(s)
         if a is None:
             out = self._num2action[a_star]
         else:
@@ -274,8 +265,14 @@ threshold the pair is added to the queue and the process is repeated
 until either the queue is empty or we exceed `n_simulated_actions`
 updates.
 """
-        s, a = self.episode_history["state_actions"][-1]
-        self._update_queue(s, a)
+        HS = self.episode_history
+        s, a = HS["state_actions"][-1]
+        if self.n_envs > 1:
+            active = HS["active"][-1]
+            for s_i, a_i in zip(s[active].tolist(), a[active].tolist()):
+                self._update_queue(s_i, a_i)
+        else:
+            self._update_queue(s, a)
         self._simulate_behavior()
 
     def _update_queue(self, s, a):
@@ -295,9 +292,7 @@ The id for the action taken from state `s`
         # TODO: what's a good threshold here?
         priority = self._calc_priority(s, a)
         if priority >= 0.001:
-            if (s, a) in sweep_queue:
-                sweep_queue[(s, a)] = max(priority, sweep_queue[(s, a)])
-            else:
+            if (s, a) not in sweep_queue or priority > sweep_queue[(s, a)]:
                 sweep_queue[(s, a)] = priority
 
     def _calc_priority(self, s, a):
@@ -324,15 +319,14 @@ The absolute magnitude of the full-backup TD(0) Q-learning update
 for (s, a)
 """
         priority = 0.0
-        E = self.env_info
         Q = self.parameters["Q"]
         env_model = self.parameters["model"]
-        n_actions = numpy.prod(E["n_actions_per_dim"])
 
+        qsa = Q[(s, a)]
         outcome_probs = env_model.outcome_probs(s, a)
         for (r, s_), p_rs_ in outcome_probs:
-            max_q = numpy.max([Q[(s_, aa)] for aa in range(n_actions)])
-            P = p_rs_ * (r + self.temporal_discount * max_q - Q[(s, a)])
+            max_q = Q.max(s_) if s_ is not None else 0.0
+            P = p_rs_ * (r + self.temporal_discount * max_q - qsa)
             priority += numpy.abs(P)
         return priority
 
@@ -357,12 +351,8 @@ have exceeded a `n_simulated_actions` updates.
             if len(sweep_queue) == 0:
                 break
 
-            # select (s, a) pair with the largest update (priority)
-            sq_items = list(sweep_queue.items())
-            (s_sim, a_sim), _ = sorted(sq_items, key=lambda x: x[1], reverse=True)[0]
-
-            # remove entry from queue
-            del sweep_queue[(s_sim, a_sim)]
+            # select and remove the (s, a) pair with the largest update (priority)
+            (s_sim, a_sim), _ = sweep_queue.pop()
 
             # update Q function for (s_sim, a_sim) using the full-backup
             # version of the TD(0) Q-learning update
@@ -393,21 +383,23 @@ The id for the action taken from state `s`
 """
         update = 0.0
         env_model = self.parameters["model"]
-        E, D, Q = self.env_info, self.derived_variables, self.parameters["Q"]
-        n_actions = numpy.prod(E["n_actions_per_dim"])
+        D, Q = self.derived_variables, self.parameters["Q"]
 
         # sample rewards from the model
+        # encourage visiting long-untried actions by adding a "bonus"
+        # reward proportional to the sqrt of the time since last visit
+        bonus = 0.0
+        if self.q_plus:
+            bonus = self.explore_weight * numpy.sqrt(
+                D["n_real_steps"] - D["last_visit"][(s, a)]
+            )
+
+        qsa = Q[(s, a)]
         outcome_probs = env_model.outcome_probs(s, a)
         for (r, s_), p_rs_ in outcome_probs:
-            # encourage visiting long-untried actions by adding a "bonus"
-            # reward proportional to the sqrt of the time since last visit
-            if self.q_plus:
-                r += self.explore_weight * numpy.sqrt(
-                    D["steps_since_last_visit"][(s, a)]
-                )
-
-            max_q = numpy.max([Q[(s_, a_)] for a_ in range(n_actions)])
-            update += p_rs_ * (r + self.temporal_discount * max_q - Q[(s, a)])
+            r += bonus
+            max_q = Q.max(s_) if s_ is not None else 0.0
+            update += p_rs_ * (r + self.temporal_discount * max_q - qsa)
 
         # update Q value for (s, a) pair
         Q[(s, a)] += self.lr * update
@@ -454,7 +446,7 @@ The number of steps taken on the episode.
 """
         D = self.derived_variables
         total_rwd, n_steps = self._episode(max_steps, render, update=True)
-        D["episode_num"] += 1
+        D["episode_num"] += self.n_envs
         return total_rwd, n_steps
 
     def _episode(self, max_steps, render, update=True):
@@ -478,6 +470,9 @@ The total reward on the episode.
 steps : float
 The number of steps taken on the episode.
 """
+        if self.n_envs > 1:
+            return self._batched_episode(max_steps, render, update)
+
         self.flush_history()
 
         obs = self.env.reset()
@@ -513,9 +508,8 @@ The number of steps taken on the episode.
             env_model[(s, a, reward, s_)] += 1
 
             # update history counter
-            for k in D["steps_since_last_visit"].keys():
-                D["steps_since_last_visit"][k] += 1
-            D["steps_since_last_visit"][(s, a)] = 0
+            D["n_real_steps"] += 1
+            D["last_visit"][(s, a)] = D["n_real_steps"]
 
             if update:
                 self.update()
@@ -529,6 +523,86 @@ The number of steps taken on the episode.
 
         return total_reward, n_steps
 
+    def _batched_episode(self, max_steps, render, update=True):
+        """
+Run or train the agent on an episode in every environment at once.
+Environments whose episode terminated are no longer stepped.
+
+The history holds arrays over the environments, with the additional
+entries "dones" and "active", the environments that terminated and the
+environments that were stepped.
+
+Parameters
+----------
+max_steps : int
+The maximum number of steps to run the episodes.
+render : bool
+Whether to render the first environment during training.
+update : bool
+Whether to perform the `Q` function backups after each step.
+Default is True.
+
+Returns
+-------
+reward : :py:class:`ndarray <numpy.ndarray>` of shape `(n_envs,)`
+The total reward on the episode of each environment.
+steps : :py:class:`ndarray <numpy.ndarray>` of shape `(n_envs,)`
+The number of steps taken on the episode of each environment.
+"""
+        self.flush_history()
+
+        Q, env_model = self.parameters["Q"], self.parameters["model"]
+        HS, D = self.episode_history, self.derived_variables
+        HS["dones"], HS["active"] = [], []
+
+        s = self._reset_envs()
+        a = self._sample_action_nums(Q.epsilon_soft_probs(s, self.epsilon))
+
+        terminated = numpy.zeros(self.n_envs, dtype=bool)
+        total_reward = numpy.zeros(self.n_envs)
+        n_steps = numpy.zeros(self.n_envs, dtype=int)
+        for i in range(max_steps):
+            if render:
+                self.env.render()
+
+            active = ~terminated
+            s_, r, done = self._step_envs(a, active)
+            n_steps += active
+            total_reward += r
+
+            # sample the next actions of the environments still running
+            s_[~active] = s[~active]
+            a_ = a.copy()
+            a_[active] = self._sample_action_nums(
+                Q.epsilon_soft_probs(s_[active], self.epsilon)
+            )
+
+            # update model
+            stepped = numpy.flatnonzero(active)
+            for j in stepped:
+                outcome = None if done[j] else s_[j].item()
+                env_model[(s[j].item(), a[j].item(), r[j].item(), outcome)] += 1
+
+            # update history counter
+            D["n_real_steps"] += 1
+            for j in stepped:
+                D["last_visit"][(s[j].item(), a[j].item())] = D["n_real_steps"]
+
+            HS["state_actions"].append((s, a))
+            HS["rewards"].append(r)
+            HS["dones"].append(done)
+            HS["active"].append(active)
+
+            if update:
+                self.update()
+
+            terminated |= done
+            if terminated.all():
+                break
+            s, a = s_, a_
+
+        return total_reward, n_steps
+
     def greedy_policy(self, max_steps, render=True):
         """
 Execute a deterministic greedy policy using the current agent
@@ -10,6 +10,7 @@ __doc__ = r"""
 import numpy
 
 from neodroidagent.agents.numpy_agents.numpy_agent import NumpyAgent
+from neodroidagent.utilities.signal.linear_recurrence import reverse_discount_numpy
 
 
 class MonteCarloAgent(NumpyAgent):
@@ -66,11 +67,12 @@ encourage greater exploration during training. Default is 0.1.
             self.target_policy = self._greedy
 
         # initialize Q function
-        self.parameters["Q"] = numpy.random.rand(n_states, n_actions)
+        self.parameters["Q"] = self._create_q_table()
 
-        # initialize returns object for each state-action pair
+        # initialize the number of first-visit returns averaged into each
+        # state-action value
         self.derived_variables = {
-            "returns": {(s, a): [] for s in range(n_states) for a in range(n_actions)},
+            "n_returns": self._create_q_table(init=numpy.zeros),
             "episode_num": 0,
         }
 
@@ -132,18 +134,8 @@ If `a` is None, this is an action sampled from the distribution
 over actions defined by the epsilon-soft policy. If `a` is not
 None, this is the probability of `a` under the epsilon-soft policy.
 """
-        E, P = self.env_info, self.parameters
-
         # TODO: this assumes all actions are available in every state
-        n_actions = numpy.prod(E["n_actions_per_dim"])
-
-        a_star = P["Q"][s, :].argmax()
-        p_a_star = 1.0 - self.epsilon + (self.epsilon / n_actions)
-        p_a = self.epsilon / n_actions
-
-        action_probs = numpy.ones(n_actions) * p_a
-        action_probs[a_star] = p_a_star
-        numpy.testing.assert_allclose(numpy.sum(action_probs), 1)
+        action_probs = self.parameters["Q"].epsilon_soft_probs(s, self.epsilon)
 
         if a is not None:
             return action_probs[a]
@@ -178,7 +170,7 @@ If `a` is None, this is an action sampled from the distribution
 over actions defined by the greedy policy. If `a` is not
 None, this is the probability of `a` under the greedy policy.
 """
-        a_star = self.parameters["Q"][s, :].argmax()
+        a_star = self.parameters["Q"].argmax(s)
         if a is None:
             out = self._num2action[a_star]
         else:
@@ -197,9 +189,13 @@ The on-policy first-visit Monte Carlo update is
 .. math::
 
 Q'(s, a) \leftarrow
-\\text{avg}(\\text{reward following first visit to } (s, a)
+\\text{avg}(\\text{discounted return following first visit to } (s, a)
 \\text{ across all episodes})
 
+The returns of every time step are computed in one reverse pass over the
+episode and the average is kept as a running mean, so the update is
+linear in the episode length and the memory does not grow with training.
+
 RL agents seek to learn action values conditional on subsequent optimal
 behavior, but they need to behave non-optimally in order to explore all
 actions (to find the optimal actions).
@@ -209,18 +205,21 @@ for the optimal policy, but for a *near*-optimal policy that still
 explores (the epsilon-soft policy).
 """
         D, P, HS = self.derived_variables, self.parameters, self.episode_history
+        Q, N = P["Q"], D["n_returns"]
 
-        ep_rewards = HS["rewards"]
-        sa_tuples = set(HS["state_actions"])
+        returns = reverse_discount_numpy(
+            numpy.asarray(HS["rewards"], dtype=float), self.temporal_discount
+        )
 
-        locs = [HS["state_actions"].index(sa) for sa in sa_tuples]
-        cumulative_returns = [numpy.sum(ep_rewards[i:]) for i in locs]
+        # the first visit of every (s, a) pair
+        sa_tuples = numpy.asarray(HS["state_actions"]).reshape(-1, 2)
+        sa_tuples, locs = numpy.unique(sa_tuples, axis=0, return_index=True)
+        s, a = sa_tuples.T
 
-        # update Q value with the average of the first-visit return across
-        # episodes
-        for (s, a), cr in zip(sa_tuples, cumulative_returns):
-            D["returns"][(s, a)].append(cr)
-            P["Q"][s, a] = numpy.mean(D["returns"][(s, a)])
+        # update Q value with the running average of the first-visit return
+        # across episodes
+        N[s, a] += 1
+        Q[s, a] += (returns[locs] - Q[s, a]) / N[s, a]
 
     def _off_policy_update(self):
         """
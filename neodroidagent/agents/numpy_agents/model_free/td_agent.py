@@ -7,11 +7,10 @@ __doc__ = r"""
            Created on 27/02/2020
            """
 
-from collections import defaultdict
-
 import numpy
 
 from neodroidagent.agents.numpy_agents.numpy_agent import NumpyAgent
+from neodroidagent.agents.numpy_agents.q_table import DenseQTable
 from neodroidagent.utilities.misc.environment_model import tile_state_space
 
 
@@ -41,10 +40,14 @@ Notes
 The agent requires a discrete action space, but will try to discretize
 the observation space via tiling if it is continuous.
 
+Given a list of environments the agent runs an episode in each of them at
+once, the `Q` function backups of all environments are then applied
+together per step.
+
 Parameters
 ----------
-env : gym.wrappers or gym.envs instance
-The environment to run the agent on.
+env : gym.wrappers or gym.envs instance, or a list of them
+The environment(s) to run the agent on.
 lr : float
 Learning rate for the Q function updates. Default is 0.05.
 epsilon : float between [0, 1]
@@ -115,7 +118,7 @@ values result in greater discounting of future rewards. Default is
             self.target_policy = self._greedy
 
         # initialize Q function
-        self.parameters["Q"] = defaultdict(numpy.random.rand)
+        self.parameters["Q"] = self._create_q_table()
 
         # initialize returns object for each state-action pair
         self.derived_variables = {"episode_num": 0}
@@ -148,11 +151,11 @@ Whether to render the episode during training
 
 Returns
 -------
-reward : float
-The total reward on the episode, averaged over the theta samples.
-steps : float
-The total number of steps taken on the episode, averaged over the
-theta samples.
+reward : float or :py:class:`ndarray <numpy.ndarray>` of shape `(n_envs,)`
+The total reward on the episode, per environment if given several.
+steps : float or :py:class:`ndarray <numpy.ndarray>` of shape `(n_envs,)`
+The total number of steps taken on the episode, per environment if
+given several.
 """
         return self._episode(max_steps, render, update=False)
 
@@ -169,15 +172,16 @@ Whether to render the episode during training.
 
 Returns
 -------
-reward : float
-The total reward on the episode.
-steps : float
-The number of steps taken on the episode.
+reward : float or :py:class:`ndarray <numpy.ndarray>` of shape `(n_envs,)`
+The total reward on the episode, per environment if given several.
+steps : float or :py:class:`ndarray <numpy.ndarray>` of shape `(n_envs,)`
+The number of steps taken on the episode, per environment if given
+several.
 """
         D = self.derived_variables
         total_rwd, n_steps = self._episode(max_steps, render, update=True)
 
-        D["episode_num"] += 1
+        D["episode_num"] += self.n_envs
 
         return total_rwd, n_steps
 
@@ -202,6 +206,9 @@ The total reward on the episode.
 steps : float
 The number of steps taken on the episode.
 """
+        if self.n_envs > 1:
+            return self._batched_episode(max_steps, render, update)
+
         self.flush_history()
 
         obs = self.env.reset()
@@ -243,6 +250,75 @@ The number of steps taken on the episode.
 
         return total_reward, n_steps
 
+    def _batched_episode(self, max_steps, render, update=True):
+        """
+Run or train the agent on an episode in every environment at once.
+Environments whose episode terminated are no longer stepped.
+
+The history holds arrays over the environments, with the
+additional entries "dones" and "active", the environments that
+terminated and the environments that were stepped.
+
+Parameters
+----------
+max_steps : int
+The maximum number of steps to run the episodes.
+render : bool
+Whether to render the first environment during training.
+update : bool
+Whether to perform the Q function backups after each step. Default
+is True.
+
+Returns
+-------
+reward : :py:class:`ndarray <numpy.ndarray>` of shape `(n_envs,)`
+The total reward on the episode of each environment.
+steps : :py:class:`ndarray <numpy.ndarray>` of shape `(n_envs,)`
+The number of steps taken on the episode of each environment.
+"""
+        self.flush_history()
+
+        Q, HS = self.parameters["Q"], self.episode_history
+        HS["dones"], HS["active"] = [], []
+
+        s = self._reset_envs()
+        a = self._sample_action_nums(Q.epsilon_soft_probs(s, self.epsilon))
+        HS["state_actions"].append((s, a))
+
+        terminated = numpy.zeros(self.n_envs, dtype=bool)
+        total_reward = numpy.zeros(self.n_envs)
+        n_steps = numpy.zeros(self.n_envs, dtype=int)
+        for i in range(max_steps):
+            if render:
+                self.env.render()
+
+            active = ~terminated
+            s_, r, done = self._step_envs(a, active)
+            n_steps += active
+            total_reward += r
+
+            # sample the next actions of the environments still running
+            s_[~active] = s[~active]
+            a_ = a.copy()
+            a_[active] = self._sample_action_nums(
+                Q.epsilon_soft_probs(s_[active], self.epsilon)
+            )
+
+            HS["rewards"].append(r)
+            HS["state_actions"].append((s_, a_))
+            HS["dones"].append(done)
+            HS["active"].append(active)
+
+            if update:
+                self.update()
+
+            terminated |= done
+            if terminated.all():
+                break
+            s, a = s_, a_
+
+        return total_reward, n_steps
+
     def _epsilon_soft_policy(self, s, a=None):
         """
 Epsilon-soft exploration policy.
@@ -288,18 +364,8 @@ action_prob : float in range [0, 1]
 If `a` is not None, returns the probability of `a` under the
 epsilon-soft policy.
 """
-        E, P = self.env_info, self.parameters
-
         # TODO: this assumes all actions are available in every state
-        n_actions = numpy.prod(E["n_actions_per_dim"])
-
-        a_star = numpy.argmax([P["Q"][(s, aa)] for aa in range(n_actions)])
-        p_a_star = 1.0 - self.epsilon + (self.epsilon / n_actions)
-        p_a = self.epsilon / n_actions
-
-        action_probs = numpy.ones(n_actions) * p_a
-        action_probs[a_star] = p_a_star
-        numpy.testing.assert_allclose(numpy.sum(action_probs), 1)
+        action_probs = self.parameters["Q"].epsilon_soft_probs(s, self.epsilon)
 
         if a is not None:
             return action_probs[a]
@@ -335,9 +401,7 @@ action_prob : float in range [0, 1]
 If `a` is not None, returns the probability of `a` under the
 greedy policy.
 """
-        P, E = self.parameters, self.env_info
-        n_actions = numpy.prod(E["n_actions_per_dim"])
-        a_star = numpy.argmax([P["Q"][(s, aa)] for aa in range(n_actions)])
+        a_star = self.parameters["Q"].argmax(s)
         if a is None:
             out = self._num2action[a_star]
         else:
@@ -373,15 +437,12 @@ The id for the state/observation at timestep t
 a_ : int as returned by `self._action2num`
 The id for the action taken at timestep t
 """
-        Q, E, pi = self.parameters["Q"], self.env_info, self.behavior_policy
-
-        # TODO: this assumes that all actions are available in each state
-        n_actions = numpy.prod(E["n_actions_per_dim"])
+        Q = self.parameters["Q"]
 
         # compute the expected value of Q(s', a') given that we are in state s'
         E_Q = (
-            numpy.sum([pi(s_, aa) * Q[(s_, aa)] for aa in range(n_actions)])
-            if s_
+            Q.expected(s_, Q.epsilon_soft_probs(s_, self.epsilon))
+            if s_ is not None
             else 0
         )
 
@@ -406,17 +467,19 @@ The reward after taking action `a` in state `s` at timestep `t-1`
 s_ : int as returned by `self._obs2num`
 The id for the state/observation at timestep `t`
 """
-        Q, E = self.parameters["Q"], self.env_info
-        n_actions = numpy.prod(E["n_actions_per_dim"])
+        Q = self.parameters["Q"]
 
         qsa = Q[(s, a)]
-        Qs_ = [Q[(s_, aa)] for aa in range(n_actions)] if s_ else [0]
-        Q[(s, a)] = qsa + self.lr * (r + self.temporal_discount * numpy.max(Qs_) - qsa)
+        max_q = Q.max(s_) if s_ is not None else 0
+        Q[(s, a)] = qsa + self.lr * (r + self.temporal_discount * max_q - qsa)
 
     def update(self):
         """
 Update the parameters of the model online after each new state-action.
 """
+        if self.n_envs > 1:
+            return self._batched_update()
+
         H, HS = self.hyperparameters, self.episode_history
         (s, a), r = HS["state_actions"][-2], HS["rewards"][-1]
         s_, a_ = HS["state_actions"][-1]
@@ -426,6 +489,42 @@ Update the parameters of the model online after each new state-action.
         else:
             self._on_policy_update(s, a, r, s_, a_)
 
+    def _batched_update(self):
+        """
+Apply the expected SARSA or Q-learning update of the last step of every
+active environment at once. On a dense `Q` table the updates are
+scattered with ``numpy.add.at``, environments backing up the same (s, a)
+pair in the same step contribute the mean of their TD errors.
+"""
+        Q, HS = self.parameters["Q"], self.episode_history
+        active = HS["active"][-1]
+        s, a = (x[active] for x in HS["state_actions"][-2])
+        s_, a_ = (x[active] for x in HS["state_actions"][-1])
+        r, done = HS["rewards"][-1][active], HS["dones"][-1][active]
+
+        if not isinstance(Q, DenseQTable):
+            for args in zip(s, a, r, s_, a_, done):
+                self._scalar_update(*args)
+            return
+
+        if self.hyperparameters["off_policy"]:
+            next_q = Q.max(s_)
+        else:
+            next_q = Q.expected(s_, Q.epsilon_soft_probs(s_, self.epsilon))
+        next_q[done] = 0
+
+        td_error = r + self.temporal_discount * next_q - Q[s, a]
+        sa = s * Q.n_actions + a
+        n_backups = numpy.bincount(sa)[sa]
+        numpy.add.at(Q.table, (s, a), self.lr * td_error / n_backups)
+
+    def _scalar_update(self, s, a, r, s_, a_, done):
+        s_ = None if done else s_
+        if self.hyperparameters["off_policy"]:
+            self._off_policy_update(s, a, r, s_)
+        else:
+            self._on_policy_update(s, a, r, s_, a_)
+
     def sample(self, obs):
         """
 Execute the behavior policy--an :math:`\epsilon`-soft policy used to
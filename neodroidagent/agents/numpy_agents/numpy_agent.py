@@ -11,17 +11,50 @@ from abc import ABC, abstractmethod
 
 import numpy
 
+from neodroidagent.agents.numpy_agents.q_table import DenseQTable, HashQTable, QTable
 from neodroidagent.utilities.misc.environment_model import env_stats
 
 
+class EncodingDict(dict):
+    """
+Numbers keys on first access, after mapping them through `encoder` if
+given, eg. the tile coding of continuous observations. Arrays are keyed as
+tuples.
+"""
+
+    def __init__(self, encoder=None):
+        super().__init__()
+        self._encoder = encoder
+
+    def __getitem__(self, key):
+        if self._encoder is not None:
+            key = self._encoder(key)
+        if isinstance(key, numpy.ndarray):
+            key = tuple(key)
+        num = self.get(key)
+        if num is None:
+            num = len(self)
+            self[key] = num
+        return num
+
+
 class NumpyAgent(ABC):
     def __init__(self, env):
+        """
+Parameters
+----------
+env : ``gym.wrappers`` or ``gym.envs`` instance, or a list of them
+The environment to run the agent on. Given a list of environments with
+identical spaces, agents supporting it step all of them at once, the
+first is used where a single environment is needed.
+"""
         super().__init__()
-        self.env = env
+        self.envs = list(env) if isinstance(env, (list, tuple)) else [env]
+        self.env = self.envs[0]
         self.parameters = {}
         self.hyperparameters = {}
         self.derived_variables = {}
-        self.env_info = env_stats(env)
+        self.env_info = env_stats(self.env)
         self.episode_history = {"rewards": [], "state_actions": []}
 
     def _create_2num_dicts(self, obs_encoder=None, act_encoder=None):
@@ -31,18 +64,103 @@ class NumpyAgent(ABC):
 
         # create action -> scalar dictionaries
         self._num2action = dict()
-        self._action2num = dict(act_encoder)
+        self._action2num = EncodingDict(act_encoder)
         if n_actions != numpy.inf:
             self._action2num = {act: i for i, act in enumerate(E["action_ids"])}
             self._num2action = {i: act for act, i in self._action2num.items()}
 
         # create obs -> scalar dictionaries
         self._num2obs = dict()
-        self._obs2num = dict(obs_encoder)
+        self._obs2num = EncodingDict(obs_encoder)
         if n_states != numpy.inf:
             self._obs2num = {act: i for i, act in enumerate(E["obs_ids"])}
             self._num2obs = {i: act for act, i in self._obs2num.items()}
 
+        self._n_states, self._n_actions = n_states, n_actions
+
+    def _create_q_table(self, init=numpy.random.random) -> QTable:
+        """
+Create a `Q` table over the numbers of ``_obs2num`` and
+``_action2num``, dense if both have a finite size and a hash map of
+rows otherwise. Requires :meth:`_create_2num_dicts` to have been called.
+
+Parameters
+----------
+init : callable
+Called with the shape of the rows to initialise. Default is
+``numpy.random.random``.
+
+Returns
+-------
+Q : :class:`QTable`
+"""
+        assert self._n_actions != numpy.inf, "Action space must be discrete"
+        if self._n_states != numpy.inf:
+            return DenseQTable(self._n_states, self._n_actions, init)
+        return HashQTable(self._n_actions, init)
+
+    @property
+    def n_envs(self) -> int:
+        return len(self.envs)
+
+    def _reset_envs(self) -> numpy.ndarray:
+        """
+Reset every environment.
+
+Returns
+-------
+s : :py:class:`ndarray <numpy.ndarray>` of shape `(n_envs,)`
+The state numbers of the initial observations.
+"""
+        return numpy.array([self._obs2num[env.reset()] for env in self.envs])
+
+    def _step_envs(self, a, active):
+        """
+Step the `active` environments with the actions numbered `a`.
+
+Parameters
+----------
+a : :py:class:`ndarray <numpy.ndarray>` of shape `(n_envs,)`
+The action numbers, as returned by ``self._action2num``.
+active : :py:class:`ndarray <numpy.ndarray>` of shape `(n_envs,)`
+Boolean mask of the environments to step.
+
+Returns
+-------
+s_ : :py:class:`ndarray <numpy.ndarray>` of shape `(n_envs,)`
+The state numbers of the observations, -1 for inactive environments.
+r : :py:class:`ndarray <numpy.ndarray>` of shape `(n_envs,)`
+The rewards, 0 for inactive environments.
+done : :py:class:`ndarray <numpy.ndarray>` of shape `(n_envs,)`
+Whether the episode of an environment terminated, False for inactive
+environments.
+"""
+        s_ = numpy.full(self.n_envs, -1)
+        r = numpy.zeros(self.n_envs)
+        done = numpy.zeros(self.n_envs, dtype=bool)
+        for i in numpy.flatnonzero(active):
+            obs, r[i], done[i], info = self.envs[i].step(self._num2action[a[i]])
+            s_[i] = self._obs2num[obs]
+        return s_, r, done
+
+    @staticmethod
+    def _sample_action_nums(action_probs) -> numpy.ndarray:
+        """
+Sample an action number from every row of `action_probs`, by inverting
+their cumulative distributions.
+
+Parameters
+----------
+action_probs : :py:class:`ndarray <numpy.ndarray>` of shape `(n, n_actions)`
+
+Returns
+-------
+a : :py:class:`ndarray <numpy.ndarray>` of shape `(n,)`
+"""
+        u = numpy.random.random((len(action_probs), 1))
+        a = (action_probs.cumsum(-1) < u).sum(-1)
+        return numpy.minimum(a, action_probs.shape[-1] - 1)
+
     def flush_history(self) -> None:
         """Clear the episode history"""
         for k, v in self.episode_history.items():
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+           Tabular action value functions of the numpy agents, with per state operations vectorised over the actions
+           """
+
+__all__ = ["QTable", "DenseQTable", "HashQTable"]
+
+from abc import ABC, abstractmethod
+from typing import Callable
+
+import numpy
+
+
+class QTable(ABC):
+    """
+Action values `Q[s, a]` for states and actions numbered by the ``_obs2num``
+and ``_action2num`` dictionaries of a :class:`NumpyAgent`. The rows of the
+table are `Q[s, :]`, all actions are assumed available in every state.
+"""
+
+    def __init__(self, n_actions: int, init: Callable = numpy.random.random):
+        """
+Parameters
+----------
+n_actions : int
+The number of actions.
+init : callable
+Called with the shape of the rows to initialise, eg.
+``numpy.random.random`` or ``numpy.zeros``. Default is
+``numpy.random.random``.
+"""
+        self.n_actions = int(n_actions)
+        self._init = init
+
+    @abstractmethod
+    def row(self, s) -> numpy.ndarray:
+        """
+The action values of state `s`, writing to the returned array writes to
+the table.
+"""
+        raise NotImplementedError
+
+    def __getitem__(self, key):
+        s, a = key
+        return self.row(s)[a]
+
+    def __setitem__(self, key, value):
+        s, a = key
+        self.row(s)[a] = value
+
+    def max(self, s):
+        r"""
+:math:`\max_a Q(s, a)`
+"""
+        return self.row(s).max(-1)
+
+    def argmax(self, s):
+        r"""
+:math:`\arg \max_a Q(s, a)`, ties go to the lowest action number.
+"""
+        return self.row(s).argmax(-1)
+
+    def expected(self, s, action_probs):
+        r"""
+The expected action value of `s` under a policy,
+:math:`\sum_a \pi(a \mid s) Q(s, a)`.
+
+Parameters
+----------
+s : int
+The state number.
+action_probs : :py:class:`ndarray <numpy.ndarray>` of shape `(n_actions,)`
+The action probabilities of the policy in state `s`.
+"""
+        return (self.row(s) * action_probs).sum(-1)
+
+    def epsilon_soft_probs(self, s, epsilon: float) -> numpy.ndarray:
+        r"""
+The action probabilities of the epsilon-soft policy in `s`,
+:math:`1 - \epsilon + \epsilon / |A|` for the greedy action and
+:math:`\epsilon / |A|` for the others.
+"""
+        a_star = numpy.asarray(self.argmax(s))
+        action_probs = numpy.full(
+            (*a_star.shape, self.n_actions), epsilon / self.n_actions
+        )
+        numpy.put_along_axis(
+            action_probs,
+            a_star[..., None],
+            1.0 - epsilon + epsilon / self.n_actions,
+            axis=-1,
+        )
+        return action_probs
+
+
+class DenseQTable(QTable):
+    """
+A `(n_states, n_actions)` array, used when the number of states is finite.
+Besides single state numbers, every operation accepts arrays of state
+numbers (and action numbers when indexing) and is then vectorised over the
+states as well.
+"""
+
+    def __init__(
+        self, n_states: int, n_actions: int, init: Callable = numpy.random.random
+    ):
+        super().__init__(n_actions, init)
+        self.table = numpy.asarray(
+            init((int(n_states), self.n_actions)), dtype=float
+        )
+
+    @property
+    def n_states(self) -> int:
+        return self.table.shape[0]
+
+    def row(self, s) -> numpy.ndarray:
+        return self.table[s]
+
+    def __getitem__(self, key):
+        return self.table[key]
+
+    def __setitem__(self, key, value):
+        self.table[key] = value
+
+
+class HashQTable(QTable):
+    """
+A dictionary of state numbers to rows, used when the states are not known
+in advance, eg. tile coded continuous observations. Rows are initialised
+on first access. Arrays of state numbers are supported by the read only
+operations, the rows are then copied.
+"""
+
+    def __init__(self, n_actions: int, init: Callable = numpy.random.random):
+        super().__init__(n_actions, init)
+        self.table = {}
+
+    @property
+    def n_states(self) -> int:
+        return len(self.table)
+
+    def row(self, s) -> numpy.ndarray:
+        if isinstance(s, numpy.ndarray):
+            return numpy.stack([self.row(x) for x in s.tolist()])
+        row = self.table.get(s)
+        if row is None:
+            row = numpy.asarray(self._init((self.n_actions,)), dtype=float)
+            self.table[s] = row
+        return row
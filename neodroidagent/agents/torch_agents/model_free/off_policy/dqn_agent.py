@@ -4,6 +4,7 @@ import copy
 import logging
 import math
 import random
+from contextlib import suppress
 from typing import Any, Dict, Iterable, Sequence, Tuple
 
 import numpy
@@ -19,7 +20,10 @@ from neodroidagent.common import (
     Architecture,
     DuelingQMLP,
     Memory,
+    NStepTransitionAccumulator,
+    PrefetchingSampler,
     TransitionPoint,
+    TransitionPointArrayBuffer,
     TransitionPointPrioritisedBuffer,
 )
 from neodroidagent.utilities import (
@@ -49,7 +53,9 @@ https://www.cs.toronto.edu/~vmnih/docs/dqn.pdf
         exploration_spec: ExplorationSpecification = ExplorationSpecification(
             start=0.95, end=0.05, decay=3000
         ),
-        memory_buffer: Memory = TransitionPointPrioritisedBuffer(int(1e5)),
+        memory_buffer: Memory = TransitionPointPrioritisedBuffer(
+            int(1e5), per_beta_increment_per_sampling=1e-4
+        ),
         batch_size: int = 256,
         discount_factor: float = 0.95,
         double_dqn: bool = True,
@@ -61,6 +67,8 @@ https://www.cs.toronto.edu/~vmnih/docs/dqn.pdf
         initial_observation_period: int = 1000,
         learning_frequency: int = 1,
         copy_percentage: float = 1e-2,
+        prefetch_batches: int = 0,
+        n_step: int = 1,
         **kwargs,
     ):
         """
@@ -71,13 +79,18 @@ https://www.cs.toronto.edu/~vmnih/docs/dqn.pdf
 @param discount_factor:
 @param double_dqn: https://arxiv.org/abs/1509.06461
 @param use_per:  https://arxiv.org/abs/1511.05952
-@param loss_function:  default is huber loss
+@param loss_function:  default is huber loss, must accept reduction="none" when use_per is enabled, so that
+the element-wise losses can be weighted by the importance-sampling weights
 @param optimiser_spec:
 @param scheduler_spec:
 @param sync_target_model_frequency:
 @param initial_observation_period:
 @param learning_frequency:
 @param copy_percentage:
+@param prefetch_batches: Number of minibatches sampled and staged ahead on a worker thread, 0 disables prefetching.
+Not used with use_per, as the priorities of a minibatch are updated before the next one is sampled
+@param n_step: Number of steps of the multi-step targets, transitions are folded into n-step transitions before they
+are stored, see NStepTransitionAccumulator
 @param kwargs:
 """
         super().__init__(**kwargs)
@@ -112,9 +125,25 @@ https://www.cs.toronto.edu/~vmnih/docs/dqn.pdf
         self._copy_percentage = copy_percentage
         assert 0 <= copy_percentage <= 1.0
 
+        self._prefetch_batches = prefetch_batches
+        assert prefetch_batches >= 0
+        self._num_staging_buffers = (
+            PrefetchingSampler.num_alive(prefetch_batches) if prefetch_batches else 1
+        )
+        self._prefetcher = None
+
+        self._n_step_accumulator = NStepTransitionAccumulator(n_step, discount_factor)
+
         self._state_type = torch.float
         self._value_type = torch.float
         self._action_type = torch.long
+        self._transition_dtypes = (
+            self._state_type,
+            self._action_type,
+            self._state_type,
+            self._value_type,
+            self._value_type,
+        )
 
     @drop_unused_kws
     def __build__(
@@ -164,6 +193,28 @@ https://www.cs.toronto.edu/~vmnih/docs/dqn.pdf
     def optimisers(self) -> Dict[str, Optimizer]:
         return {"_optimiser": self._optimiser}
 
+    def close_prefetcher(self) -> None:
+        """
+Stops the worker thread prefetching minibatches, it is started again by the next update
+
+@return:
+"""
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+
+    def save(self, **kwargs) -> None:
+        """
+
+@param kwargs:
+@return:
+"""
+        self.close_prefetcher()
+        super().save(**kwargs)
+
+    def eval(self) -> None:
+        self.close_prefetcher()
+        super().eval()
+
     def _exploration_sample(self, steps_taken, metric_writer=None):
         """
 :param steps_taken:
@@ -211,7 +262,15 @@ https://www.cs.toronto.edu/~vmnih/docs/dqn.pdf
         return numpy.random.choice(numpy.arange(self._output_shape[0]), (len(state), 1))
 
     @drop_unused_kws
-    def _remember(self, *, signal, terminated, transition):
+    def _remember(
+        self,
+        *,
+        signal,
+        terminated,
+        transition,
+        new_episode: bool = False,
+        num_episode_steps: int = None,
+    ):
         """
 
 @param state:
@@ -219,18 +278,31 @@ https://www.cs.toronto.edu/~vmnih/docs/dqn.pdf
 @param signal:
 @param next_state:
 @param terminated:
+@param new_episode: Whether the environments were reset before this transition
+@param num_episode_steps: Number of time steps of the episode, if transition holds a whole episode
 @return:
 """
         if transition:
-            a = [TransitionPoint(*s) for s in zip(*transition, signal, terminated)]
+            if num_episode_steps:
+                a = self._n_step_accumulator.add_episode(
+                    TransitionPoint(*transition, signal, terminated), num_episode_steps
+                )
+            else:
+                a = self._n_step_accumulator.add(
+                    TransitionPoint(*transition, signal, terminated),
+                    new_episode=new_episode,
+                )
+            if a is None:  # Still filling the first n-step window of the episode
+                return
             if self._use_per:
                 with torch.no_grad():
-                    td_error, *_ = self._td_error(zip(*a))
-                    for a_, e_ in zip(a, td_error.detach().squeeze(-1).cpu().numpy()):
-                        self._memory_buffer.add_transition_point(a_, e_)
+                    td_error, *_ = self._td_error(a)
+                    self._memory_buffer.add_transition_points(
+                        a, td_error.detach().squeeze(-1).cpu().numpy()
+                    )
             else:
-                for a_ in a:
-                    self._memory_buffer.add_transition_point(a_)
+                with self._prefetcher.lock if self._prefetcher else suppress():  # No-op context
+                    self._memory_buffer.add_transition_points(a)
         else:
             raise ValueError('Missing transition')
 
@@ -269,7 +341,9 @@ https://www.cs.toronto.edu/~vmnih/docs/dqn.pdf
     ) -> torch.tensor:
         return (
             signal
-            + self._discount_factor * self._max_q_successor(successor_state) * mask
+            + self._n_step_accumulator.bootstrap_discount_factor
+            * self._max_q_successor(successor_state)
+            * mask
         )
 
     def _q_state(self, state: torch.tensor, action: torch.tensor) -> torch.tensor:
@@ -279,21 +353,43 @@ https://www.cs.toronto.edu/~vmnih/docs/dqn.pdf
         tensorised = TransitionPoint(
             *[
                 to_tensor(a, device=self._device, dtype=d)
-                for a, d in zip(
-                    transitions, [torch.float, torch.long] + [torch.float] * 3
-                )
+                for a, d in zip(transitions, self._transition_dtypes)
             ]
         )
 
+        Q_state = self._q_state(tensorised.state, tensorised.action)
         Q_expected = self._q_expected(
-            tensorised.signal,
-            tensorised.non_terminal_numerical,
+            tensorised.signal.reshape(Q_state.shape),  # Rows may hold (B,) signals
+            tensorised.non_terminal_numerical.reshape(Q_state.shape),
             tensorised.successor_state,
         )
-        Q_state = self._q_state(tensorised.state, tensorised.action)
 
         return Q_expected - Q_state, Q_expected, Q_state
 
+    def _sample_transitions(self) -> TransitionPoint:
+        """
+Samples a uniform minibatch tensorised on the device
+
+@return:
+"""
+        if isinstance(self._memory_buffer, TransitionPointArrayBuffer):
+            return self._memory_buffer.sample_tensors(
+                self._batch_size,
+                device=self._device,
+                dtypes=self._transition_dtypes,
+                num_staging_buffers=self._num_staging_buffers,
+            )
+
+        return TransitionPoint(
+            *[
+                to_tensor(a, device=self._device, dtype=d)
+                for a, d in zip(
+                    self._memory_buffer.sample(self._batch_size),
+                    self._transition_dtypes,
+                )
+            ]
+        )
+
     @drop_unused_kws
     def _update(self, *, metric_writer: Writer = MockWriter()) -> None:
         """
@@ -307,15 +403,33 @@ https://www.cs.toronto.edu/~vmnih/docs/dqn.pdf
         if self.update_i > self._initial_observation_period:
             if is_zero_or_mod_zero(self._learning_frequency, self.update_i):
                 if len(self._memory_buffer) > self._batch_size:
-                    transitions = self._memory_buffer.sample(self._batch_size)
+                    if self._use_per:
+                        transitions, weights = self._memory_buffer.sample_weighted(
+                            self._batch_size
+                        )
+                    elif self._prefetch_batches:
+                        if self._prefetcher is None:
+                            self._prefetcher = PrefetchingSampler(
+                                self._sample_transitions, self._prefetch_batches
+                            )
+                        transitions = next(self._prefetcher)
+                    else:
+                        transitions = self._sample_transitions()
 
                     td_error, Q_expected, Q_state = self._td_error(transitions)
                     td_error = td_error.detach().squeeze(-1).cpu().numpy()
 
                     if self._use_per:
                         self._memory_buffer.update_last_batch(td_error)
-
-                    loss = self._loss_function(Q_state, Q_expected)
+                        weights = to_tensor(
+                            weights, device=self._device, dtype=self._value_type
+                        ).unsqueeze(-1)
+                        loss = torch.mean(
+                            self._loss_function(Q_state, Q_expected, reduction="none")
+                            * weights
+                        )
+                    else:
+                        loss = self._loss_function(Q_state, Q_expected)
 
                     self._optimiser.zero_grad()
                     loss.backward()
@@ -326,6 +440,10 @@ https://www.cs.toronto.edu/~vmnih/docs/dqn.pdf
                     if metric_writer:
                         metric_writer.scalar("td_error", td_error.mean(), self.update_i)
                         metric_writer.scalar("loss", loss_, self.update_i)
+                        if self._use_per:
+                            metric_writer.scalar(
+                                "per_beta", self._memory_buffer.beta, self.update_i
+                            )
 
                     if self._scheduler:
                         self._scheduler.step()
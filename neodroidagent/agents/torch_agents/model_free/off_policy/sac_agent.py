@@ -5,6 +5,8 @@
 import copy
 
 import itertools
+from contextlib import suppress
+
 import numpy
 import torch
 import torch.nn as nn
@@ -21,10 +23,12 @@ from neodroidagent.common import (
   Architecture,
   PreConcatInputMLP,
   Memory,
+  NStepTransitionAccumulator,
+  PrefetchingSampler,
   SamplePoint,
   ShallowStdNormalMLP,
   TransitionPoint,
-  TransitionPointBuffer,
+  TransitionPointArrayBuffer,
   )
 from neodroidagent.utilities import (
   ActionSpaceNotSupported,
@@ -59,7 +63,7 @@ https://arxiv.org/pdf/1812.05905.pdf
       target_update_interval: int = 1,
       num_inner_updates: int = 20,
       sac_alpha: float = 1e-2,
-      memory_buffer: Memory = TransitionPointBuffer(1000000),
+      memory_buffer: Memory = TransitionPointArrayBuffer(1000000),
       auto_tune_sac_alpha: bool = False,
       auto_tune_sac_alpha_optimiser_spec: GDKC = GDKC(
           constructor=torch.optim.Adam, lr=3e-4
@@ -71,6 +75,8 @@ https://arxiv.org/pdf/1812.05905.pdf
           ),
       critic_arch_spec: GDKC = GDKC(PreConcatInputMLP),
       critic_criterion: callable = mse_loss,
+      prefetch_batches: int = 0,
+      n_step: int = 1,
       **kwargs
       ):
     """
@@ -84,6 +90,9 @@ https://arxiv.org/pdf/1812.05905.pdf
 :param actor_arch_spec:
 :param critic_arch_spec:
 :param random_process_spec:
+:param prefetch_batches: Number of minibatches sampled and staged ahead on a worker thread, 0 disables prefetching
+:param n_step: Number of steps of the multi-step critic targets, transitions are folded into n-step transitions before
+they are stored, see NStepTransitionAccumulator
 :param kwargs:
 """
     super().__init__(**kwargs)
@@ -109,6 +118,17 @@ https://arxiv.org/pdf/1812.05905.pdf
     self._auto_tune_sac_alpha_optimiser_spec = auto_tune_sac_alpha_optimiser_spec
     self.inner_update_i = 0
 
+    self._prefetch_batches = prefetch_batches
+    assert prefetch_batches >= 0
+    self._num_staging_buffers = (
+        PrefetchingSampler.num_alive(prefetch_batches) if prefetch_batches else 1
+    )
+    self._prefetcher = None
+
+    self._n_step_accumulator = NStepTransitionAccumulator(n_step, discount_factor)
+
+    self._transition_dtypes = (torch.float,) * len(TransitionPoint.get_fields())
+
   @drop_unused_kws
   def _remember(
       self,
@@ -117,7 +137,8 @@ https://arxiv.org/pdf/1812.05905.pdf
       terminated: Any,
       state: Any,
       successor_state: Any,
-      sample: Any
+      sample: Any,
+      new_episode: bool = False
       ) -> None:
     """
 
@@ -126,15 +147,21 @@ https://arxiv.org/pdf/1812.05905.pdf
 @param state:
 @param successor_state:
 @param sample:
+@param new_episode: Whether the environments were reset before this transition
 @param kwargs:
 @return:
 """
-    a = [
-        TransitionPoint(*s)
-        for s in zip(state, sample[0], successor_state, signal, terminated)
-        ]
-    for a_ in a:
-      self._memory_buffer.add_transition_point(a_)
+    transition_points = self._n_step_accumulator.add(
+        TransitionPoint(
+            state, self.extract_action(sample), successor_state, signal, terminated
+            ),
+        new_episode=new_episode,
+        )
+    if transition_points is None:  # Still filling the first n-step window of the episode
+      return
+
+    with self._prefetcher.lock if self._prefetcher else suppress():  # No-op context
+      self._memory_buffer.add_transition_points(transition_points)
 
   @property
   def models(self) -> Dict[str, Architecture]:
@@ -155,6 +182,28 @@ https://arxiv.org/pdf/1812.05905.pdf
         "critic_optimiser":self.critic_optimiser,
         }
 
+  def close_prefetcher(self) -> None:
+    """
+Stops the worker thread prefetching minibatches, it is started again by the next update
+
+@return:
+"""
+    if self._prefetcher is not None:
+      self._prefetcher.close()
+
+  def save(self, **kwargs) -> None:
+    """
+
+@param kwargs:
+@return:
+"""
+    self.close_prefetcher()
+    super().save(**kwargs)
+
+  def eval(self) -> None:
+    self.close_prefetcher()
+    super().eval()
+
   @drop_unused_kws
   def _sample(
       self,
@@ -272,9 +321,9 @@ https://arxiv.org/pdf/1812.05905.pdf
       )
 
       successor_q_value = (
-          tensorised.signal
-          + tensorised.non_terminal_numerical
-          * self._discount_factor
+          tensorised.signal.reshape(min_successor_q.shape)
+          + tensorised.non_terminal_numerical.reshape(min_successor_q.shape)
+          * self._n_step_accumulator.bootstrap_discount_factor
           * min_successor_q
       ).detach()
       assert not successor_q_value.requires_grad
@@ -381,6 +430,28 @@ https://arxiv.org/pdf/1812.05905.pdf
 
     return out_loss
 
+  def _sample_transitions(self) -> TransitionPoint:
+    """
+Samples a minibatch tensorised on the device
+
+@return:
+"""
+    if isinstance(self._memory_buffer, TransitionPointArrayBuffer):
+      return self._memory_buffer.sample_tensors(
+          self._batch_size,
+          device=self._device,
+          dtypes=self._transition_dtypes,
+          num_staging_buffers=self._num_staging_buffers,
+          )
+
+    batch = self._memory_buffer.sample(self._batch_size)
+    return TransitionPoint(
+        *[
+            to_tensor(a, device=self._device, dtype=d)
+            for a, d in zip(batch, self._transition_dtypes)
+            ]
+        )
+
   def _update(self, *args, metric_writer: Writer = MockWriter(), **kwargs) -> float:
     """
 
@@ -394,10 +465,14 @@ https://arxiv.org/pdf/1812.05905.pdf
         range(self._num_inner_updates), desc="Inner update #", leave=False, postfix=f"Agent update #{self.update_i}"
         ):
       self.inner_update_i += 1
-      batch = self._memory_buffer.sample(self._batch_size)
-      tensorised = TransitionPoint(
-          *[to_tensor(a, device=self._device) for a in batch]
-          )
+      if self._prefetch_batches:
+        if self._prefetcher is None:
+          self._prefetcher = PrefetchingSampler(
+              self._sample_transitions, self._prefetch_batches
+              )
+        tensorised = next(self._prefetcher)
+      else:
+        tensorised = self._sample_transitions()
 
       with frozen_parameters(self.actor.parameters()):
         accum_loss += self.update_critics(
@@ -16,6 +16,7 @@ from neodroidagent.common import (
     MLP,
     Memory,
     TransitionPoint,
+    TransitionPointArrayBuffer,
     TransitionPointBuffer,
 )
 from neodroidagent.utilities import (
@@ -110,6 +111,8 @@ The update rate that target networks slowly track the learned networks.
         self._batch_size = batch_size
         self._noise_factor = noise_factor
 
+        self._transition_dtypes = (torch.float,) * len(TransitionPoint.get_fields())
+
     @drop_unused_kws
     def __build__(
         self,
@@ -209,9 +212,19 @@ Update
 :return:
 :rtype:
 """
-        tensorised = TransitionPoint(
-            *[to_tensor(a, device=self._device) for a in self._memory_buffer.sample()]
-        )
+        if isinstance(self._memory_buffer, TransitionPointArrayBuffer):
+            tensorised = self._memory_buffer.sample_tensors(
+                device=self._device, dtypes=self._transition_dtypes
+            )
+        else:
+            tensorised = TransitionPoint(
+                *[
+                    to_tensor(a, device=self._device, dtype=d)
+                    for a, d in zip(
+                        self._memory_buffer.sample(), self._transition_dtypes
+                    )
+                ]
+            )
 
         self._memory_buffer.clear()
 
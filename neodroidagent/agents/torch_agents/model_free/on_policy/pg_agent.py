@@ -11,19 +11,13 @@ from tqdm import tqdm
 
 from draugr.writers import MockWriter, Writer
 from draugr.torch_utilities import to_tensor
-from neodroid.utilities import (
-    ActionSpace,
-    ObservationSpace,
-    SignalSpace,
-    non_terminal_numerical_mask,
-)
+from neodroid.utilities import ActionSpace, ObservationSpace, SignalSpace
 from neodroidagent.agents.torch_agents.torch_agent import TorchAgent
 from neodroidagent.common import (
     CategoricalMLP,
-    Memory,
     MultiDimensionalNormalMLP,
+    RolloutStorage,
     SamplePoint,
-    SampleTrajectoryBuffer,
 )
 from neodroidagent.utilities import NoTrajectoryException, discount_rollout_signal_torch
 from warg import GDKC, drop_unused_kws, super_init_pass_on_kws
@@ -55,7 +49,7 @@ REINFORCE, Vanilla Policy Gradient method
         scheduler_spec: GDKC = GDKC(
             constructor=torch.optim.lr_scheduler.StepLR, step_size=100, gamma=0.65
         ),
-        memory_buffer: Memory = SampleTrajectoryBuffer(),
+        memory_buffer: RolloutStorage = RolloutStorage(2048),
         **kwargs,
     ) -> None:
         r"""
@@ -64,6 +58,8 @@ REINFORCE, Vanilla Policy Gradient method
 :param policy_arch_spec:
 :param discount_factor:
 :param optimiser_spec:
+:param memory_buffer: Preallocated storage the rollouts are collected into, its num_steps should be at least the
+rollout length
 :param state_type:
 :param kwargs:
 """
@@ -158,9 +154,8 @@ REINFORCE, Vanilla Policy Gradient method
 @return:
 """
         model_input = to_tensor(state, device=self._device, dtype=torch.float)
-        distribution = self.distributional_regressor(model_input)
-
-        with torch.no_grad():
+        with torch.no_grad():  # The update evaluates the whole rollout in one pass
+            distribution = self.distributional_regressor(model_input)
             action = distribution.sample().detach()
 
         if self.action_space.is_discrete:
@@ -175,16 +170,29 @@ REINFORCE, Vanilla Policy Gradient method
         return sample[0].to("cpu").numpy()
 
     @drop_unused_kws
-    def _remember(self, *, signal: Any, terminated: Any, sample: SamplePoint) -> None:
+    def _remember(
+        self, *, signal: Any, terminated: Any, state: Any, sample: SamplePoint
+    ) -> None:
         """
 
 @param signal:
 @param terminated:
+@param state:
 @param sample:
 @return:
 """
         action, dist = sample
-        self._memory_buffer.add_trajectory_point(signal, terminated, action, dist)
+        self._memory_buffer.insert(
+            state=to_tensor(state, device=self._device, dtype=torch.float),
+            action=action,
+            signal=to_tensor(signal, device=self._device, dtype=torch.float).reshape(
+                len(action), 1
+            ),
+            non_terminal=1.0
+            - to_tensor(terminated, device=self._device, dtype=torch.float).reshape(
+                len(action), 1
+            ),
+        )
 
     # region Protected
 
@@ -206,28 +214,21 @@ REINFORCE, Vanilla Policy Gradient method
         if not len(self._memory_buffer) > 0:
             raise NoTrajectoryException
 
-        trajectory = self._memory_buffer.retrieve_trajectory()
-        self._memory_buffer.clear()
+        storage = self._memory_buffer
+        signal = storage["signal"]
 
-        log_probs = to_tensor(
-            [
-                self.get_log_prob(d, a)
-                for d, a in zip(trajectory.distribution, trajectory.action)
-            ],
-            device=self._device,
-        )
-
-        signal = to_tensor(trajectory.signal, device=self._device)
-        non_terminal = to_tensor(
-            non_terminal_numerical_mask(trajectory.terminated), device=self._device
-        )
+        log_probs = self.get_log_prob(
+            self.distributional_regressor(storage["state"].flatten(0, 1)),
+            storage["action"].flatten(0, 1),
+        ).reshape(signal.shape)
 
         discounted_signal = discount_rollout_signal_torch(
             signal,
             self._discount_factor,
             device=self._device,
-            non_terminal=non_terminal,
+            non_terminal=storage["non_terminal"],
         )
+        storage.after_update()
 
         loss = -(log_probs * discounted_signal).mean()
 
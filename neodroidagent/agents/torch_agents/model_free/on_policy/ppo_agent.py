@@ -5,7 +5,7 @@ from typing import Any, Dict, Tuple
 
 import numpy
 import torch
-from draugr import mean_accumulator, shuffled_batches
+from draugr import mean_accumulator
 from draugr.torch_utilities import freeze_model, to_scalar, to_tensor
 from draugr.writers import MockWriter, Writer
 from neodroid.utilities import ActionSpace, ObservationSpace, SignalSpace
@@ -14,12 +14,12 @@ from neodroidagent.agents.torch_agents.torch_agent import TorchAgent
 from neodroidagent.common import (
   ActorCriticMLP,
   CategoricalActorCriticMLP,
-  TransitionPointTrajectoryBuffer,
-  ValuedTransitionPoint,
+  RolloutStorage,
   )
 from neodroidagent.utilities import (
   ActionSpaceNotSupported,
-  torch_compute_gae,
+  distribution_parameter_names,
+  distribution_parameters,
   update_target,
   )
 from torch.distributions import Distribution
@@ -58,7 +58,7 @@ https://spinningup.openai.com/en/latest/algorithms/ppo.html
       surrogate_clipping_value: float = 2e-1,
       copy_percentage: float = 1.0,
       target_kl: float = 1e-2,
-      memory_buffer: Any = TransitionPointTrajectoryBuffer(),
+      memory_buffer: RolloutStorage = RolloutStorage(2048),
       critic_criterion: callable = mse_loss,
       optimiser_spec: GDKC = GDKC(constructor=torch.optim.Adam, lr=3e-4),
       continuous_arch_spec: GDKC = GDKC(constructor=ActorCriticMLP),
@@ -83,6 +83,8 @@ https://spinningup.openai.com/en/latest/algorithms/ppo.html
 :param early_stop:
 :param rollouts:
 :param surrogate_clipping_value:
+:param memory_buffer: Preallocated storage the rollouts are collected into, its num_steps should be at least the
+rollout length
 :param state_type:
 :param value_type:
 :param action_type:
@@ -115,6 +117,9 @@ https://spinningup.openai.com/en/latest/algorithms/ppo.html
     self._surrogate_clipping_value = surrogate_clipping_value
     self.inner_update_i = 0
 
+    self._distribution_type = None
+    self._last_successor_state = None
+
   @drop_unused_kws
   def __build__(
       self,
@@ -206,16 +211,24 @@ https://spinningup.openai.com/en/latest/algorithms/ppo.html
       successor_state: Any,
       sample: Any
       ) -> None:
-    self._memory_buffer.add_transition_point(
-        ValuedTransitionPoint(
-            state,
-            sample[0],
-            successor_state,
-            signal,
-            terminated,
-            sample[1],
-            sample[2],
-            )
+    action, distribution, value_estimate = sample
+    self._distribution_type = type(distribution)
+    self._last_successor_state = successor_state
+    self._memory_buffer.insert(
+        state=to_tensor(state, device=self._device, dtype=torch.float),
+        action=action,
+        signal=to_tensor(signal, device=self._device, dtype=torch.float).reshape(
+            value_estimate.shape
+            ),
+        non_terminal=1.0
+        - to_tensor(terminated, device=self._device, dtype=torch.float).reshape(
+            value_estimate.shape
+            ),
+        value_estimate=value_estimate,
+        **{
+            f"distribution_{name}":parameter
+            for name, parameter in distribution_parameters(distribution).items()
+            },
         )
 
   def _update_targets(
@@ -241,52 +254,33 @@ https://spinningup.openai.com/en/latest/algorithms/ppo.html
     else:
       return dist.log_prob(action).sum(axis=-1, keepdims=True)
 
-  def _prepare_transitions(self):
-    transitions = self._memory_buffer.sample()
-    self._memory_buffer.clear()
-
-    signal = to_tensor(transitions.signal, device=self._device)
-    non_terminal = to_tensor(
-        transitions.non_terminal_numerical, device=self._device
-        )
-    state = to_tensor(transitions.state, device=self.device)
-    action = to_tensor(transitions.action, device=self.device)
-    value_estimate_target = to_tensor(
-        transitions.value_estimate, device=self._device
-        )
+  def _prepare_transitions(self) -> None:
+    """
+Computes the returns, advantages and action log probabilities of the collected rollout into the rollout storage
 
-    action_log_prob_old = to_tensor(
-        [
-            self.get_log_prob(dist, a)
-            for dist, a in zip(transitions.distribution, transitions.action)
-            ],
-        device=self.device,
-        )
+@return:
+"""
+    storage = self._memory_buffer
 
     with torch.no_grad():
       *_, successor_value_estimate = self.actor_critic(
-          to_tensor((transitions.successor_state[-1],), device=self.device)
+          to_tensor(self._last_successor_state, device=self.device, dtype=torch.float)
           )
-      value_estimate_target = torch.cat(
-          (value_estimate_target, successor_value_estimate), dim=0
+      storage.compute_returns(
+          successor_value_estimate,
+          use_gae=True,
+          gamma=self._discount_factor,
+          tau=self._gae_lambda,
           )
 
-      discounted_signal, advantage = torch_compute_gae(
-          signal,
-          non_terminal,
-          value_estimate_target,
-          discount_factor=self._discount_factor,
-          gae_lambda=self._gae_lambda,
-          device=self.device,
+      distribution = self._distribution_type(
+          **{
+              name:storage[f"distribution_{name}"]
+              for name in distribution_parameter_names(self._distribution_type)
+              },
+          validate_args=False,
           )
-
-    return (
-        state.flatten(0, 1),
-        action.flatten(0, 1),
-        action_log_prob_old.flatten(0, 1),
-        discounted_signal.flatten(0, 1),
-        advantage.flatten(0, 1),
-        )
+      storage["log_prob"] = self.get_log_prob(distribution, storage["action"])
 
   @drop_unused_kws
   def _update(self, metric_writer: Writer = MockWriter()) -> float:
@@ -295,16 +289,14 @@ https://spinningup.openai.com/en/latest/algorithms/ppo.html
 @param metric_writer:
 @return:
 """
-    transitions = self._prepare_transitions()
+    self._prepare_transitions()
 
     accum_loss = mean_accumulator()
     for ith_inner_update in tqdm(
         range(self._num_inner_updates), desc="#Inner updates", leave=False
         ):
       self.inner_update_i += 1
-      loss, early_stop_inner = self.inner_update(
-          *transitions, metric_writer=metric_writer
-          )
+      loss, early_stop_inner = self.inner_update(metric_writer=metric_writer)
       accum_loss.send(loss)
 
       if is_none_or_zero_or_negative_or_mod_zero(
@@ -316,6 +308,7 @@ https://spinningup.openai.com/en/latest/algorithms/ppo.html
         break
 
     mean_loss = next(accum_loss)
+    self._memory_buffer.after_update()
 
     if metric_writer:
       metric_writer.scalar("Inner Updates", ith_inner_update)
@@ -358,9 +351,9 @@ https://spinningup.openai.com/en/latest/algorithms/ppo.html
 
     return policy_loss - entropy_loss, approx_kl
 
-  def inner_update(self, *transitions, metric_writer: Writer = None) -> Tuple:
-    batch_generator = shuffled_batches(
-        *transitions, size=transitions[0].size(0), batch_size=self._mini_batch_size
+  def inner_update(self, metric_writer: Writer = None) -> Tuple:
+    batch_generator = self._memory_buffer.feed_forward_generator(
+        self._mini_batch_size, "state", "action", "log_prob", "returns", "advantages"
         )
     for (
         state,
@@ -3,5 +3,7 @@
 __author__ = "Christian Heider Nielsen"
 
 from .architectures import *
+from .environment_pool import *
+from .inference import *
 from .memory import *
 from .session_factory import *
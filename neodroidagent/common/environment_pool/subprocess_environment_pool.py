@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import ctypes
+import multiprocessing
+import traceback
+from contextlib import suppress
+from typing import Any, Callable, Sequence, Tuple
+
+import numpy
+from attr import dataclass
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+  Steps gym environments in worker processes that write their observations, signals and terminals straight into shared
+  memory
+  """
+__all__ = ["PoolSnapshot", "SubprocessEnvironmentPool"]
+
+
+@dataclass
+class PoolSnapshot:
+    """
+observables, signal and terminated of all environments, each with num_envs as the first axis. The arrays are views of
+the shared memory the workers write into, see SubprocessEnvironmentPool.
+"""
+
+    observables: numpy.ndarray
+    signal: numpy.ndarray
+    terminated: numpy.ndarray
+
+
+def _shared_array(
+    shape: Sequence[int], dtype: numpy.dtype, ctype: Any
+) -> Tuple[Any, numpy.ndarray]:
+    raw = multiprocessing.RawArray(ctype, int(numpy.prod(shape)))
+    return raw, _view(raw, shape, dtype)
+
+
+def _view(raw: Any, shape: Sequence[int], dtype: numpy.dtype) -> numpy.ndarray:
+    return numpy.frombuffer(raw, dtype=dtype).reshape(shape)
+
+
+def _worker(
+    remote: Any,
+    parent_remote: Any,
+    environment_factory: Callable,
+    index: int,
+    raw_blocks: Sequence[Any],
+    observation_shape: Sequence[int],
+    num_envs: int,
+    auto_reset_on_terminal_state: bool,
+) -> None:
+    parent_remote.close()
+    observables = _view(
+        raw_blocks[0], (2, num_envs, *observation_shape), numpy.float32
+    )[:, index]
+    signal = _view(raw_blocks[1], (2, num_envs), numpy.float32)[:, index]
+    terminated = _view(raw_blocks[2], (2, num_envs), numpy.bool_)[:, index]
+
+    environment = environment_factory()
+    discrete = hasattr(environment.action_space, "n")
+    try:
+        while True:
+            command, buffer, data = remote.recv()
+            if command == "step":
+                if discrete:
+                    data = int(numpy.asarray(data).reshape(-1)[0])
+                observation, step_signal, done, _ = environment.step(data)
+                if done and auto_reset_on_terminal_state:
+                    observation = environment.reset()
+                observables[buffer] = observation
+                signal[buffer] = step_signal
+                terminated[buffer] = done
+                remote.send(None)
+            elif command == "reset":
+                observables[buffer] = environment.reset()
+                signal[buffer] = 0
+                terminated[buffer] = False
+                remote.send(None)
+            elif command == "seed":
+                environment.seed(data)
+                remote.send(None)
+            elif command == "render":
+                environment.render()
+                remote.send(None)
+            elif command == "close":
+                break
+            else:
+                raise NotImplementedError(command)
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        remote.send(traceback.format_exc())
+    finally:
+        environment.close()
+        remote.close()
+
+
+class _GymFactory(object):
+    """
+Picklable factory of the environment gym registered as environment_name, continuous actions are normalised as in
+LinearSession
+"""
+
+    def __init__(self, environment_name: str):
+        self.environment_name = environment_name
+
+    def __call__(self) -> Any:
+        import gym
+        from trolls import NormalisedActions
+
+        environment = gym.make(self.environment_name)
+        if hasattr(environment.action_space, "n"):
+            return environment
+        return NormalisedActions(environment)
+
+
+class SubprocessEnvironmentPool(object):
+    """
+Runs num_envs gym environments, one per worker process. Actions are sent to the workers through pipes, while
+observations, signals and terminals are written by the workers into shared memory blocks of shape (2, num_envs, ...)
+which the snapshots are views of, so nothing is pickled on the way back and the main process reads them without
+copying.
+
+Consecutive steps alternate between the two halves of the blocks, so the snapshot returned by step_wait stays valid
+while the next step is in flight and is only overwritten by the step after. Copy it if it is needed for longer.
+
+Can be used in place of the vector environments of neodroid through reset, react, render, seed, close and the spaces,
+or asynchronously through step_async and step_wait.
+"""
+
+    def __init__(
+        self,
+        environment_name: str = "",
+        *,
+        num_envs: int = multiprocessing.cpu_count(),
+        auto_reset_on_terminal_state: bool = True,
+        environment_factory: Callable = None,
+        start_method: str = None,
+    ):
+        """
+
+@param environment_name: Gym environment id, used when no environment_factory is given
+@param num_envs:
+@param auto_reset_on_terminal_state: Workers reset their environment when it terminates, the snapshot then holds the
+initial observation of the next episode and terminated is True
+@param environment_factory: Picklable callable constructing one gym environment in a worker
+@param start_method: multiprocessing start method, eg. "spawn", default of the platform if None
+"""
+        assert num_envs > 0
+        if environment_factory is None:
+            assert environment_name != ""
+            environment_factory = _GymFactory(environment_name)
+
+        self.environment_name = environment_name
+        self._num_envs = num_envs
+        self._build_spaces(environment_factory)
+
+        observation_shape = self._observation_shape
+        raw_observables, self._observables = _shared_array(
+            (2, num_envs, *observation_shape), numpy.float32, ctypes.c_float
+        )
+        raw_signal, self._signal = _shared_array(
+            (2, num_envs), numpy.float32, ctypes.c_float
+        )
+        raw_terminated, self._terminated = _shared_array(
+            (2, num_envs), numpy.bool_, ctypes.c_bool
+        )
+        raw_blocks = (raw_observables, raw_signal, raw_terminated)
+
+        context = multiprocessing.get_context(start_method)
+        self._remotes, work_remotes = zip(*[context.Pipe() for _ in range(num_envs)])
+        self._processes = [
+            context.Process(
+                target=_worker,
+                args=(
+                    work_remote,
+                    remote,
+                    environment_factory,
+                    i,
+                    raw_blocks,
+                    observation_shape,
+                    num_envs,
+                    auto_reset_on_terminal_state,
+                ),
+                daemon=True,
+            )
+            for i, (work_remote, remote) in enumerate(zip(work_remotes, self._remotes))
+        ]
+        for process in self._processes:
+            process.start()
+        for work_remote in work_remotes:
+            work_remote.close()
+
+        self._buffer = 0
+        self._waiting = False
+        self._closed = False
+
+    def _build_spaces(self, environment_factory: Callable) -> None:
+        """
+Constructs one environment in this process to read its spaces from
+
+@param environment_factory:
+@return:
+"""
+        from neodroid.environments.gym_environment import NeodroidGymEnvironment
+
+        probe = environment_factory()
+        self._observation_shape = tuple(probe.observation_space.shape)
+        neodroid_probe = NeodroidGymEnvironment(probe)
+        self.observation_space = neodroid_probe.observation_space
+        self.action_space = neodroid_probe.action_space
+        self.signal_space = neodroid_probe.signal_space
+        neodroid_probe.close()
+
+    @property
+    def num_envs(self) -> int:
+        """
+
+@return:
+"""
+        return self._num_envs
+
+    def _snapshot(self) -> PoolSnapshot:
+        return PoolSnapshot(
+            self._observables[self._buffer],
+            self._signal[self._buffer],
+            self._terminated[self._buffer],
+        )
+
+    def _send_all(self, command: str, data: Sequence = None) -> None:
+        for i, remote in enumerate(self._remotes):
+            remote.send((command, self._buffer, None if data is None else data[i]))
+
+    def _wait_one(self, index: int) -> None:
+        message = self._remotes[index].recv()
+        if message:
+            raise RuntimeError(f"Environment worker {index} failed:\n{message}")
+
+    def _wait_all(self) -> None:
+        """
+Receives the replies of all workers before raising the failure of the first failed one, if any, so that the replies
+of the others are not left in the pipes
+
+@return:
+"""
+        failure = None
+        for i in range(self._num_envs):
+            try:
+                self._wait_one(i)
+            except RuntimeError as e:
+                failure = failure or e
+        if failure:
+            raise failure
+
+    def step_async(self, actions: Sequence) -> None:
+        """
+Sends one action to every environment and returns immediately, the workers write the outcome into the half of the
+shared blocks not holding the current snapshot
+
+@param actions: With num_envs as the first axis
+@return:
+"""
+        assert not self._waiting, "step_wait must be called before the next step_async"
+        assert len(actions) == self._num_envs
+        self._buffer = 1 - self._buffer
+        self._send_all("step", actions)
+        self._waiting = True
+
+    def step_wait(self) -> PoolSnapshot:
+        """
+Blocks until every environment has completed the step sent by step_async
+
+@return:
+"""
+        assert self._waiting, "step_async must be called before step_wait"
+        self._waiting = False
+        self._wait_all()
+        return self._snapshot()
+
+    def react(self, actions: Sequence) -> PoolSnapshot:
+        """
+Steps all environments in lockstep
+
+@param actions: With num_envs as the first axis
+@return:
+"""
+        self.step_async(actions)
+        return self.step_wait()
+
+    def reset(self) -> PoolSnapshot:
+        """
+
+@return:
+"""
+        assert not self._waiting
+        self._buffer = 1 - self._buffer
+        self._send_all("reset")
+        self._wait_all()
+        return self._snapshot()
+
+    def seed(self, seed: int) -> None:
+        """
+Seeds environment i with seed + i
+
+@param seed:
+@return:
+"""
+        self._send_all("seed", [seed + i for i in range(self._num_envs)])
+        self._wait_all()
+
+    def render(self) -> None:
+        """
+Renders the first environment
+
+@return:
+"""
+        self._remotes[0].send(("render", self._buffer, None))
+        self._wait_one(0)
+
+    def close(self) -> None:
+        """
+Stops the workers, workers that failed have already exited
+
+@return:
+"""
+        if self._closed:
+            return
+        if self._waiting:
+            self._waiting = False
+            with suppress(RuntimeError):
+                self._wait_all()
+        for remote in self._remotes:
+            with suppress(BrokenPipeError):
+                remote.send(("close", None, None))
+        for process in self._processes:
+            process.join()
+        self._closed = True
+
+    def __enter__(self) -> "SubprocessEnvironmentPool":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+if __name__ == "__main__":
+    with SubprocessEnvironmentPool("CartPole-v1", num_envs=4) as pool:
+        pool.reset()
+        for _ in range(100):
+            pool.step_async(numpy.random.randint(0, 2, (4, 1)))
+            snapshot = pool.step_wait()
+        print(snapshot)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Sequence, Tuple
+
+import numpy
+import torch
+from draugr.writers import MockWriter, Writer
+from torch.distributions import Distribution
+
+from neodroidagent.utilities.misc.distribution_parameters import (
+    distribution_parameters,
+)
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+  Batches the action selection requests of many environment workers into single forward passes
+  """
+__all__ = ["BatchedInferenceServer", "slice_output"]
+
+
+def slice_output(output: Any, start: int, end: int) -> Any:
+    """
+Rows start to end of every tensor, array and distribution in output, tuples and lists are sliced element wise and
+anything else is passed through
+
+@param output:
+@param start:
+@param end:
+@return:
+"""
+    if isinstance(output, (torch.Tensor, numpy.ndarray)):
+        return output[start:end]
+    if isinstance(output, Distribution):
+        return type(output)(
+            **{
+                name: parameter[start:end]
+                for name, parameter in distribution_parameters(output).items()
+            },
+            validate_args=False,
+        )
+    if isinstance(output, (tuple, list)):
+        return type(output)(slice_output(o, start, end) for o in output)
+    return output
+
+
+class BatchedInferenceServer(object):
+    """
+Collects requests from any number of threads and answers them from one call of forward on the concatenation of their
+states. A batch is run once it holds max_batch_size states or max_latency seconds after its first request arrived,
+whichever is first. The requests are answered with their rows of the output, see slice_output.
+
+forward is only ever called from the thread of the server, eg. the sample method of an agent, running the value_model of
+DeepQNetworkAgent, the actor of SoftActorCriticAgent or the _target_actor_critic of ProximalPolicyOptimizationAgent.
+Exploration decided per call of sample, like the epsilon greedy choice of DeepQNetworkAgent, is decided per batch.
+
+Every report_interval batches the latencies of the requests, from submission to answer, and the batch sizes are
+written to metric_writer as histograms.
+"""
+
+    def __init__(
+        self,
+        forward: Callable[[numpy.ndarray], Any],
+        *,
+        max_batch_size: int = 256,
+        max_latency: float = 0.005,
+        metric_writer: Writer = MockWriter(),
+        report_interval: int = 100,
+    ):
+        """
+
+@param forward: Maps a batch of states, with the batch as the first axis, to outputs with the same first axis
+@param max_batch_size: Number of states, a single larger request is run on its own
+@param max_latency: Seconds a request may wait for others to join its batch
+@param metric_writer:
+@param report_interval: Batches between writes of the histograms
+"""
+        assert max_batch_size > 0 and max_latency >= 0
+        self._forward = forward
+        self._max_batch_size = max_batch_size
+        self._max_latency = max_latency
+        self._metric_writer = metric_writer
+        self._report_interval = report_interval
+
+        self._requests = queue.Queue()
+        self._pending = None  # Request that did not fit in the previous batch
+        self._stop = threading.Event()
+        self._worker = None
+
+        self._num_batches = 0
+        self._latencies = []
+        self._batch_sizes = []
+
+    def start(self) -> "BatchedInferenceServer":
+        """
+
+@return:
+"""
+        assert self._worker is None, "Already started"
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._serve, daemon=True)
+        self._worker.start()
+        return self
+
+    def stop(self) -> None:
+        """
+Answers the requests already submitted and stops the server
+
+@return:
+"""
+        if self._worker is None:
+            return
+        self._stop.set()
+        self._requests.put(None)  # Wakes the worker
+        self._worker.join()
+        self._worker = None
+
+    def __enter__(self) -> "BatchedInferenceServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def submit(self, state: Any) -> Future:
+        """
+
+@param state: Batch of states, eg. one per environment of a worker
+@return: Future of the rows of the output of forward for state
+"""
+        assert self._worker is not None, "Not started"
+        future = Future()
+        self._requests.put((numpy.asarray(state), future, time.perf_counter()))
+        return future
+
+    def sample(self, state: Any) -> Any:
+        """
+Blocking submit, so that the server can stand in for the sample method of an agent
+
+@param state:
+@return:
+"""
+        return self.submit(state).result()
+
+    def _next_request(self, timeout: float = None) -> Any:
+        if self._pending is not None:
+            request, self._pending = self._pending, None
+            return request
+        return self._requests.get(timeout=timeout)
+
+    def _collect(self) -> List[Tuple[numpy.ndarray, Future, float]]:
+        """
+Blocks for the first request, then gathers requests until the batch is full or the deadline passes
+
+@return:
+"""
+        first = self._next_request()
+        if first is None:
+            return []
+        batch = [first]
+        size = len(first[0])
+        deadline = first[2] + self._max_latency
+        while size < self._max_batch_size:
+            try:
+                request = self._next_request(
+                    timeout=max(deadline - time.perf_counter(), 0)
+                )
+            except queue.Empty:
+                break
+            if request is None:
+                self._requests.put(None)  # Keeps the stop request for the next collect
+                break
+            if size + len(request[0]) > self._max_batch_size:
+                self._pending = request
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    def _serve(self) -> None:
+        while True:
+            batch = self._collect()
+            if not batch:
+                if self._stop.is_set() and self._requests.empty():
+                    return
+                continue
+
+            futures = [future for _, future, _ in batch]
+            try:
+                output = self._forward(numpy.concatenate([s for s, _, _ in batch]))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            start = 0
+            for state, future, _ in batch:
+                end = start + len(state)
+                try:  # Eg. distributions without known parameters can not be sliced
+                    future.set_result(slice_output(output, start, end))
+                except Exception as e:
+                    future.set_exception(e)
+                start = end
+
+            answered = time.perf_counter()
+            self._record(start, [answered - t for _, _, t in batch])
+
+    def _record(self, batch_size: int, latencies: Sequence[float]) -> None:
+        self._num_batches += 1
+        self._batch_sizes.append(batch_size)
+        self._latencies.extend(latencies)
+        if self._metric_writer and self._num_batches % self._report_interval == 0:
+            self._metric_writer.histogram(
+                "inference_latency", numpy.array(self._latencies), self._num_batches
+            )
+            self._metric_writer.histogram(
+                "inference_batch_size",
+                numpy.array(self._batch_sizes),
+                self._num_batches,
+            )
+            self._latencies.clear()
+            self._batch_sizes.clear()
+
+
+if __name__ == "__main__":
+
+    def a():
+        model = torch.nn.Linear(4, 2)
+        with BatchedInferenceServer(
+            lambda s: model(torch.as_tensor(s, dtype=torch.float)), max_batch_size=8
+        ) as server:
+            futures = [server.submit(numpy.random.rand(3, 4)) for _ in range(5)]
+            print([f.result().shape for f in futures])
+
+    a()
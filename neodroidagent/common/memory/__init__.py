@@ -7,5 +7,12 @@ from .sample_transition_buffer import *
 from .sample_transition_buffer import *
 from .trajectories import *
 from .transition_point_buffer import *
+from .transition_point_array_buffer import *
+from .transition_point_memory_mapped_buffer import *
+from .transition_point_frame_stack_buffer import *
 from .transitions import *
 from .memory import *
+from .prefetching_sampler import *
+from .rollout_storage import *
+from .nstep_transition_accumulator import *
+from .snapshot import *
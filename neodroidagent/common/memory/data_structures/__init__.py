@@ -1,4 +1,8 @@
+from .array_circular_buffer import *
 from .expandable_circular_buffer import *
+from .indexed_priority_queue import *
+from .memory_mapped_array_buffer import *
 from .prioritised_buffer import *
 from .segment_tree import *
 from .sum_tree import *
+from .tensor_stager import *
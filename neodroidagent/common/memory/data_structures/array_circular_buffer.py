@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import logging
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple, Union
+
+import numpy
+import torch
+
+from neodroidagent.common.memory.data_structures.tensor_stager import TensorStager
+from neodroidagent.common.memory.memory import Memory
+from warg import is_none_or_zero_or_negative
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+  Columnar circular buffer, keeps one preallocated numpy array per field instead of a list of python objects
+  """
+__all__ = ["ArrayCircularBuffer"]
+
+
+class ArrayCircularBuffer(Memory):
+    """
+For storing records of a fixed set of fields in preallocated numpy arrays, one array (column) per field.
+
+The shape and dtype of each column is inferred from the first value inserted for that field, a capacity of 0
+means unbounded, in which case the columns are grown geometrically.
+"""
+
+    def __init__(
+        self,
+        capacity: int = 0,
+        fields: Sequence[str] = ("value",),
+        initial_unbounded_capacity: int = 1024,
+    ):
+        """
+
+@param capacity: Maximum number of records, 0 means unbounded
+@param fields: Names of the fields of a record
+@param initial_unbounded_capacity: Number of rows initially allocated when unbounded
+"""
+        assert capacity >= 0
+        assert initial_unbounded_capacity > 0
+        self._capacity = capacity
+        self._fields = tuple(fields)
+        self._num_rows = capacity if capacity > 0 else initial_unbounded_capacity
+        self._columns = {field: None for field in self._fields}
+        self._cursor = 0
+        self._num_entries = 0
+        self._num_inserted = 0
+        self._stager = None
+
+    @property
+    def capacity(self) -> int:
+        """
+
+@return:
+"""
+        return self._capacity
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        """
+
+@return:
+"""
+        return self._fields
+
+    @property
+    def columns(self) -> dict:
+        """
+The backing arrays, a column is None until the first value for its field has been seen
+
+@return:
+"""
+        return self._columns
+
+    @property
+    def num_inserted(self) -> int:
+        """
+
+@return:
+"""
+        return self._num_inserted
+
+    def _allocate(
+        self, field: str, shape: Tuple[int, ...], dtype: Any
+    ) -> numpy.ndarray:
+        """
+Allocates the backing array for a column, override to change the storage (eg. memmap)
+
+@param field:
+@param shape: Shape of a single row
+@param dtype:
+@return:
+"""
+        return numpy.zeros((self._num_rows, *shape), dtype=dtype)
+
+    def _grow(self) -> None:
+        """
+Doubles the number of allocated rows of an unbounded buffer
+
+@return:
+"""
+        self._num_rows *= 2
+        for field, column in self._columns.items():
+            if column is not None:
+                grown = self._allocate(field, column.shape[1:], column.dtype)
+                grown[: len(column)] = column
+                self._columns[field] = grown
+
+    def _write(
+        self, field: str, index: Any, value: Any, batched: bool = False
+    ) -> None:
+        """
+
+@param field:
+@param index: A row index, or a slice of rows if batched
+@param value:
+@param batched: Whether value holds a batch of rows along its first axis
+@return:
+"""
+        column = self._columns[field]
+        if value is None:
+            if column is not None:
+                column[index] = 0
+            return
+
+        value = numpy.asarray(value)
+        if column is None:
+            row_shape = value.shape[1:] if batched else value.shape
+            column = self._columns[field] = self._allocate(
+                field, row_shape, value.dtype
+            )
+        column[index] = value
+
+    def _add(self, value: Sequence) -> None:
+        """
+Adds a record to memory, value holds one entry per field in the order of fields
+
+@param value:
+@return:
+"""
+        if self._capacity == 0 and self._cursor >= self._num_rows:
+            self._grow()
+
+        for field, field_value in zip(self._fields, value):
+            self._write(field, self._cursor, field_value)
+
+        self._num_inserted += 1
+        self._cursor += 1
+        if self._capacity > 0:
+            self._cursor %= self._capacity
+            self._num_entries = min(self._num_entries + 1, self._capacity)
+        else:
+            self._num_entries += 1
+
+    def _add_columns(self, columns: Sequence) -> None:
+        """
+Adds a batch of records in one operation, columns holds one (N, ...) array per field in the order of fields.
+The write is split in two slabs if it wraps around the circular cursor
+
+@param columns:
+@return:
+"""
+        columns = [None if c is None else numpy.asarray(c) for c in columns]
+        num = next((len(c) for c in columns if c is not None), 0)
+        if num == 0:
+            return
+        self._num_inserted += num
+
+        if self._capacity == 0:
+            while self._cursor + num > self._num_rows:
+                self._grow()
+            rows = slice(self._cursor, self._cursor + num)
+            for field, column in zip(self._fields, columns):
+                self._write(field, rows, column, batched=True)
+            self._cursor += num
+            self._num_entries += num
+            return
+
+        num_dropped = num - self._capacity
+        if num_dropped > 0:  # Only the last capacity records would survive
+            columns = [None if c is None else c[num_dropped:] for c in columns]
+            self._cursor = (self._cursor + num_dropped) % self._capacity
+            num = self._capacity
+
+        head = min(num, self._capacity - self._cursor)
+        for field, column in zip(self._fields, columns):
+            self._write(
+                field,
+                slice(self._cursor, self._cursor + head),
+                None if column is None else column[:head],
+                batched=True,
+            )
+            if head < num:
+                self._write(
+                    field,
+                    slice(0, num - head),
+                    None if column is None else column[head:],
+                    batched=True,
+                )
+
+        self._cursor = (self._cursor + num) % self._capacity
+        self._num_entries = min(self._num_entries + num, self._capacity)
+
+    def _extend(self, values: Iterable) -> None:
+        """
+Adds all records of values in one operation
+
+@param values:
+@return:
+"""
+        values = list(values)
+        if values:
+            self._add_columns(
+                [
+                    None if all(v is None for v in column) else column
+                    for column in zip(*values)
+                ]
+            )
+
+    def _gather(self, indices: Any) -> Tuple[Optional[numpy.ndarray], ...]:
+        """
+
+@param indices:
+@return:
+"""
+        return tuple(
+            None if column is None else column[indices]
+            for column in self._columns.values()
+        )
+
+    def _sample_indices(self, num: int = None) -> numpy.ndarray:
+        """
+Uniformly samples indices with replacement for bounded buffers, all indices shuffled if num is not given.
+Unbounded buffers returns the indices in insertion order
+
+@param num:
+@return:
+"""
+        num_entries = len(self)
+
+        if self._capacity > 0:
+            if is_none_or_zero_or_negative(num):
+                return numpy.random.permutation(num_entries)
+
+            if num > num_entries:
+                logging.info(
+                    f"Buffer only has {num_entries},"
+                    f" returning {num_entries} entries"
+                    f" of the requested {num}"
+                )
+                num = num_entries
+
+            return numpy.random.randint(0, num_entries, num)
+
+        if num and num < num_entries:
+            return numpy.arange(num)
+        return numpy.arange(num_entries)
+
+    def _sample(self, num: int = None) -> Tuple[Optional[numpy.ndarray], ...]:
+        """Samples random records from memory, returns a tuple of arrays, one for each field"""
+        return self._gather(self._sample_indices(num))
+
+    def _sample_tensors(
+        self,
+        num: int = None,
+        *,
+        device: Union[str, torch.device] = "cpu",
+        dtypes: Sequence[Optional[torch.dtype]] = None,
+        num_staging_buffers: int = 1,
+    ) -> Tuple[Optional[torch.Tensor], ...]:
+        """
+Samples random records from memory as torch tensors on device, one for each field. The rows are gathered straight
+into reused (page-locked) staging tensors, which are overwritten num_staging_buffers calls later
+
+@param num:
+@param device:
+@param dtypes: Per field dtype of the tensors, None keeps the dtype of the column
+@param num_staging_buffers: Number of sampled minibatches that can be alive at once
+@return:
+"""
+        if (
+            self._stager is None
+            or self._stager.device != torch.device(device)
+            or self._stager.num_buffers != num_staging_buffers
+        ):
+            self._stager = TensorStager(device, num_buffers=num_staging_buffers)
+        return self._stager.stage(
+            list(self._columns.values()), self._sample_indices(num), dtypes
+        )
+
+    def _snapshot_records(self, num: int) -> Dict[str, numpy.ndarray]:
+        """
+
+@param num:
+@return:
+"""
+        indices = self._cursor - num + numpy.arange(num)
+        if self._capacity > 0:
+            indices %= self._capacity
+        return {
+            field: column[indices]
+            for field, column in self._columns.items()
+            if column is not None
+        }
+
+    def _restore(
+        self,
+        records: Dict[str, numpy.ndarray],
+        arrays: Dict[str, numpy.ndarray],
+        num_inserted: int,
+    ) -> None:
+        """
+
+@param records:
+@param arrays:
+@param num_inserted:
+@return:
+"""
+        self.clear()
+        self._add_columns([records.get(field) for field in self._fields])
+        self._num_inserted = num_inserted
+
+    def clear(self) -> None:
+        """
+Resets the buffer, the allocated columns are kept for reuse
+
+@return:
+"""
+        self._cursor = 0
+        self._num_entries = 0
+
+    def __len__(self) -> int:
+        """Return the number of records in memory."""
+        return self._num_entries
+
+
+if __name__ == "__main__":
+    unbounded = ArrayCircularBuffer(fields=("a", "b"), initial_unbounded_capacity=2)
+    for i in range(10):
+        unbounded._add((i, [i, i]))
+    print(unbounded._sample())
+    print(unbounded._sample(4))
+
+    bounded = ArrayCircularBuffer(5, fields=("a", "b"))
+    for i in range(12):
+        bounded._add((i, [i, i]))
+    print(bounded._sample())
+    print(bounded._sample(4))
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import logging
-from typing import Any, Iterable
+from typing import Any, Dict, Iterable
 
 import numpy
 
@@ -12,6 +12,7 @@ import random
 __all__ = ["ExpandableCircularBuffer"]
 
 from neodroidagent.common.memory.memory import Memory
+from neodroidagent.common.memory.snapshot import columns_to_records, records_to_columns
 from warg import is_none_or_zero_or_negative
 
 
@@ -20,6 +21,8 @@ class ExpandableCircularBuffer(Memory):
 For storing element in an expandable buffer.
 """
 
+    record_type = None  # Type the values are rebuilt as when loading a snapshot, None keeps them whole
+
     def capacity(self) -> int:
         return self._capacity
 
@@ -31,6 +34,15 @@ For storing element in an expandable buffer.
         self._capacity = capacity
         self._memory = []
         self._position = 0
+        self._num_inserted = 0
+
+    @property
+    def num_inserted(self) -> int:
+        """
+
+@return:
+"""
+        return self._num_inserted
 
     def _add(self, value: Any) -> None:
         """Adds value to memory"""
@@ -41,10 +53,32 @@ For storing element in an expandable buffer.
             if len(self._memory) < self._capacity or self._capacity == 0:
                 self._memory.append(None)
             self._memory[self._position] = value
+            self._num_inserted += 1
             self._position += 1
             if self._capacity != 0:
                 self._position = self._position % self._capacity
 
+    def _extend(self, values: Iterable) -> None:
+        """Adds all values to memory, splitting the write at the circular cursor"""
+        values = list(values)
+        self._num_inserted += len(values)
+        if self._capacity == 0:
+            self._memory.extend(values)
+            self._position += len(values)
+            return
+
+        num_dropped = len(values) - self._capacity
+        if num_dropped > 0:  # Only the last capacity values would survive
+            self._memory.extend([None] * (self._capacity - len(self._memory)))
+            self._position = (self._position + num_dropped) % self._capacity
+            values = values[num_dropped:]
+
+        head = min(len(values), self._capacity - self._position)
+        self._memory[self._position : self._position + head] = values[:head]
+        tail = values[head:]
+        self._memory[: len(tail)] = tail
+        self._position = (self._position + len(values)) % self._capacity
+
     def _sample(self, num: int = None) -> Iterable:
         """Samples random values from memory"""
         if self._capacity > 0:
@@ -71,6 +105,33 @@ For storing element in an expandable buffer.
                 return self._memory[:num]
             return self._memory
 
+    def _snapshot_records(self, num: int) -> Dict[str, numpy.ndarray]:
+        """
+
+@param num:
+@return:
+"""
+        indices = (self._position - num + numpy.arange(num)) % len(self._memory)
+        return records_to_columns([self._memory[i] for i in indices], self.record_type)
+
+    def _restore(
+        self,
+        records: Dict[str, numpy.ndarray],
+        arrays: Dict[str, numpy.ndarray],
+        num_inserted: int,
+    ) -> None:
+        """
+
+@param records:
+@param arrays:
+@param num_inserted:
+@return:
+"""
+        self.clear()
+        if records:
+            self._extend(columns_to_records(records, self.record_type))
+        self._num_inserted = num_inserted
+
     def clear(self):
         """
 
@@ -81,8 +142,7 @@ For storing element in an expandable buffer.
 
     def __len__(self):
         """Return the length of the memory list."""
-        # return len(self._memory)
-        return self._position
+        return len(self._memory)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import heapq
+import itertools
+from typing import Hashable, Iterator, Tuple
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+  Max priority queue of unique keys on a binary heap
+  """
+__all__ = ["IndexedPriorityQueue"]
+
+
+class IndexedPriorityQueue:
+    """
+Binary max heap of keys with an index from key to heap entry, so the priority of a queued key can be read, raised or
+lowered, and a key removed, without searching the heap. Changed and removed entries are invalidated in place and
+skipped when they surface, a new entry is pushed for a changed priority. The heap is rebuilt from the valid entries once
+the invalidated ones outnumber them.
+
+Keys of equal priority are popped in the order they were last given their priority.
+"""
+
+    _INVALID = object()
+
+    def __init__(self):
+        self._heap = []
+        self._entries = {}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._entries)
+
+    def __getitem__(self, key: Hashable) -> float:
+        return -self._entries[key][0]
+
+    def __setitem__(self, key: Hashable, priority: float) -> None:
+        """
+Inserts key or changes its priority
+
+@param key:
+@param priority:
+@return:
+"""
+        if key in self._entries:
+            self._invalidate(key)
+        entry = [-priority, next(self._counter), key]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+
+    def __delitem__(self, key: Hashable) -> None:
+        self._invalidate(key)
+
+    def _invalidate(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        entry[-1] = self._INVALID
+        if len(self._heap) > 2 * len(self._entries) + 32:
+            self._heap = list(self._entries.values())
+            heapq.heapify(self._heap)
+
+    def _discard_invalid(self) -> None:
+        while self._heap and self._heap[0][-1] is self._INVALID:
+            heapq.heappop(self._heap)
+
+    def peek(self) -> Tuple[Hashable, float]:
+        """
+
+@return: The key of the highest priority and its priority
+"""
+        self._discard_invalid()
+        if not self._heap:
+            raise KeyError("peek from an empty queue")
+        priority, _, key = self._heap[0]
+        return key, -priority
+
+    def pop(self) -> Tuple[Hashable, float]:
+        """
+Removes the key of the highest priority
+
+@return: The key and its priority
+"""
+        self._discard_invalid()
+        if not self._heap:
+            raise KeyError("pop from an empty queue")
+        priority, _, key = heapq.heappop(self._heap)
+        del self._entries[key]
+        return key, -priority
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._entries.clear()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({len(self)} keys)"
+
+
+if __name__ == "__main__":
+
+    def a():
+        queue = IndexedPriorityQueue()
+        for key, priority in zip("abcd", (3, 1, 4, 1)):
+            queue[key] = priority
+        queue["a"] = 5
+        del queue["c"]
+        print([queue.pop() for _ in range(len(queue))])
+
+    a()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+import logging
+import tempfile
+from pathlib import Path
+from typing import Any, Optional, Sequence, Tuple
+
+import numpy
+from numpy.lib.format import open_memmap
+
+from neodroidagent.common.memory.data_structures.array_circular_buffer import (
+    ArrayCircularBuffer,
+)
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+  Columnar circular buffer backed by numpy.memmap files, for replay sets larger than RAM
+  """
+__all__ = ["MemoryMappedArrayBuffer"]
+
+
+class MemoryMappedArrayBuffer(ArrayCircularBuffer):
+    """
+ArrayCircularBuffer whose columns are .npy files memory mapped from a directory, one file per field, so that the
+buffer can exceed the available RAM and be reopened after a restart.
+
+The cursor is persisted every flush_interval insert operations and on flush(), if never opened in a directory the
+columns are mapped from a temporary directory.
+"""
+
+    meta_file_name = "meta.json"
+
+    def __init__(
+        self,
+        capacity: int,
+        fields: Sequence[str] = ("value",),
+        directory: Path = None,
+        flush_interval: int = 1000,
+        **kwargs
+    ):
+        """
+
+@param capacity: Maximum number of records, must be positive as memory mapped files are not grown
+@param fields:
+@param directory: Directory holding the memory mapped files, see open
+@param flush_interval: Number of insert operations (single records or batches) between persisting the cursor
+@param kwargs:
+"""
+        assert capacity > 0, "A memory mapped buffer must be bounded"
+        super().__init__(capacity, fields=fields, **kwargs)
+        self._directory = None
+        self._flush_interval = flush_interval
+        self._inserts_since_flush = 0
+        if directory is not None:
+            self.open(directory)
+
+    @property
+    def directory(self) -> Optional[Path]:
+        """
+
+@return:
+"""
+        return self._directory
+
+    def _column_path(self, field: str) -> Path:
+        return self._directory / f"{field}.npy"
+
+    def open(self, directory: Path, *, resume: bool = True) -> bool:
+        """
+Maps the buffer from directory, if resume and the directory holds a buffer of the same capacity and fields it is
+reopened with its contents, otherwise any records already held are moved into the directory
+
+@param directory:
+@param resume:
+@return: Whether a previous buffer was reopened
+"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        meta_path = directory / self.meta_file_name
+
+        if resume and meta_path.exists():
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if (
+                meta["capacity"] == self._capacity
+                and tuple(meta["fields"]) == self._fields
+            ):
+                self._directory = directory
+                for field in self._fields:
+                    path = self._column_path(field)
+                    self._columns[field] = (
+                        open_memmap(str(path), mode="r+") if path.exists() else None
+                    )
+                self._cursor = meta["cursor"]
+                self._num_entries = meta["num_entries"]
+                logging.info(
+                    f"Reopened replay buffer with {self._num_entries} entries"
+                    f" from {directory}"
+                )
+                return True
+            logging.warning(
+                f"Replay buffer in {directory} does not match capacity and fields,"
+                f" overwriting it"
+            )
+
+        previous_columns = self._columns
+        self._directory = directory
+        self._columns = {field: None for field in self._fields}
+        for field, column in previous_columns.items():
+            if column is not None:
+                self._columns[field] = self._allocate(
+                    field, column.shape[1:], column.dtype
+                )
+                self._columns[field][:] = column
+        self.flush()
+        return False
+
+    def _allocate(
+        self, field: str, shape: Tuple[int, ...], dtype: Any
+    ) -> numpy.ndarray:
+        """
+Creates the .npy file of a column
+
+@param field:
+@param shape:
+@param dtype:
+@return:
+"""
+        if self._directory is None:
+            self.open(tempfile.mkdtemp(prefix="replay_buffer_"), resume=False)
+        return open_memmap(
+            str(self._column_path(field)),
+            mode="w+",
+            dtype=dtype,
+            shape=(self._num_rows, *shape),
+        )
+
+    def _sample_indices(self, num: int = None) -> numpy.ndarray:
+        """
+Sorted, so that the mapped files are read in ascending order for locality, the order of a uniformly sampled batch is
+irrelevant
+
+@param num:
+@return:
+"""
+        return numpy.sort(super()._sample_indices(num))
+
+    def _add(self, value: Sequence) -> None:
+        super()._add(value)
+        self._count_inserts()
+
+    def _add_columns(self, columns: Sequence) -> None:
+        super()._add_columns(columns)
+        self._count_inserts()
+
+    def _count_inserts(self) -> None:
+        self._inserts_since_flush += 1
+        if self._inserts_since_flush >= self._flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+Writes the mapped columns to disk and persists the cursor
+
+@return:
+"""
+        if self._directory is None:
+            return
+
+        for column in self._columns.values():
+            if column is not None:
+                column.flush()
+
+        meta_path = self._directory / self.meta_file_name
+        tmp_path = meta_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "capacity": self._capacity,
+                    "fields": list(self._fields),
+                    "cursor": self._cursor,
+                    "num_entries": self._num_entries,
+                },
+                f,
+            )
+        tmp_path.replace(meta_path)
+        self._inserts_since_flush = 0
+
+    def clear(self) -> None:
+        super().clear()
+        self.flush()
+
+
+if __name__ == "__main__":
+    buffer = MemoryMappedArrayBuffer(10, fields=("a", "b"))
+    for i in range(12):
+        buffer._add((i, [i, i]))
+    buffer.flush()
+    print(buffer.directory, buffer._sample(4))
+
+    reopened = MemoryMappedArrayBuffer(10, fields=("a", "b"))
+    print(reopened.open(buffer.directory), len(reopened), reopened._sample(4))
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from typing import Any, Iterable
+from typing import Any, Dict, Iterable, Sequence, Tuple
 
 import numpy
 
@@ -10,16 +10,21 @@ __doc__ = r"""
 
   """
 
-import random
-
 from neodroidagent.common.memory.data_structures.sum_tree import SumTree
+from neodroidagent.common.memory.snapshot import (
+    SnapshotMixin,
+    columns_to_records,
+    records_to_columns,
+)
 
 
-class PrioritisedBuffer:
+class PrioritisedBuffer(SnapshotMixin):
     """
 
 """
 
+    record_type = None  # Type the samples are rebuilt as when loading a snapshot, None keeps them whole
+
     def __init__(
         self,
         capacity: int,
@@ -47,6 +52,7 @@ class PrioritisedBuffer:
 
     def _get_priority(self, dist: float) -> float:
         """
+Works element-wise if dist is an array
 
 @param dist:
 @return:
@@ -54,7 +60,7 @@ class PrioritisedBuffer:
         abs_dist = numpy.abs(dist) + self._epsilon
 
         if self._max_abs_dist:
-            abs_dist = min(abs_dist, self._max_abs_dist)
+            abs_dist = numpy.minimum(abs_dist, self._max_abs_dist)
 
         return abs_dist ** self._alpha
 
@@ -67,36 +73,49 @@ class PrioritisedBuffer:
 """
         self._tree.push(sample, self._get_priority(dist))
 
+    def extend(self, samples: Sequence, dists: Sequence) -> None:
+        """
+Adds a batch of samples, the priorities are computed and written to the tree in one operation
+
+@param samples:
+@param dists:
+@return:
+"""
+        self._tree.extend(samples, self._get_priority(numpy.asarray(dists)))
+
     def sample(self, num: int) -> Iterable:
         """
 
 @param num:
 @return:
 """
-        segment = self._tree.total / num
-        data = []
-        leaf_indices = []
-        # priorities = []
+        data, _ = self.sample_weighted(num)
+        return data
+
+    def sample_weighted(self, num: int) -> Tuple[list, numpy.ndarray]:
+        """
+Stratified sampling of num samples proportional to their priorities, all strata are searched in one batched
+descent of the tree. Also returns the importance-sampling weights of the samples, normalised by the largest weight
+of the batch
 
+@param num:
+@return:
+"""
         self._beta = numpy.min([1.0, self._beta + self._beta_increment_per_sampling])
 
-        for i in range(num):
-            (leaf_index, _, _, data_) = self._tree.get(
-                random.uniform(segment * i, segment * (i + 1)), normalised_sum=False
-            )
-            # priorities.append(priority)
-            data.append(data_)
-            leaf_indices.append(leaf_index)
+        segment = self._tree.total / num
+        sums = (numpy.arange(num) + numpy.random.uniform(size=num)) * segment
+        leaf_indices, _, priorities, data = self._tree.get_batch(
+            sums, normalised_sum=False
+        )
 
-        """
-sampling_probabilities = priorities / self._tree.total
-weights = numpy.power(self._tree._num_entries * sampling_probabilities, -self._beta)
-weights /= (weights.max() + 1e-10)  # Normalize for stability
-"""
+        sampling_probabilities = priorities / self._tree.total
+        weights = numpy.power(len(self._tree) * sampling_probabilities, -self._beta)
+        weights /= weights.max() + 1e-10  # Normalize for stability
 
         self._last_leaf_indices = leaf_indices
 
-        return data
+        return data, weights
 
     def update_last_batch(self, errors: Iterable) -> None:
         """
@@ -104,8 +123,9 @@ weights /= (weights.max() + 1e-10)  # Normalize for stability
 @param errors:
 @return:
 """
-        for leaf_index, error in zip(self._last_leaf_indices, errors):
-            self.update(leaf_index, error)
+        self._tree.update_leaves(
+            self._last_leaf_indices, self._get_priority(numpy.asarray(errors))
+        )
 
     def update(self, leaf_index: int, error: float) -> None:
         """
@@ -116,6 +136,56 @@ weights /= (weights.max() + 1e-10)  # Normalize for stability
 """
         self._tree.update_leaf(leaf_index, self._get_priority(error))
 
+    @property
+    def num_inserted(self) -> int:
+        """
+
+@return:
+"""
+        return self._tree.num_inserted
+
+    def _snapshot_records(self, num: int) -> Dict[str, numpy.ndarray]:
+        """
+
+@param num:
+@return:
+"""
+        _, _, data = self._tree.latest(num)
+        return records_to_columns(data, self.record_type)
+
+    def _snapshot_arrays(self) -> Dict[str, numpy.ndarray]:
+        """
+The priorities of all held samples, as they change after insertion
+
+@return:
+"""
+        _, priorities, _ = self._tree.latest(len(self._tree))
+        return {"priorities": priorities, "beta": numpy.asarray(self._beta)}
+
+    def _restore(
+        self,
+        records: Dict[str, numpy.ndarray],
+        arrays: Dict[str, numpy.ndarray],
+        num_inserted: int,
+    ) -> None:
+        """
+
+@param records:
+@param arrays:
+@param num_inserted:
+@return:
+"""
+        self._tree = SumTree(
+            self._tree.capacity, round_capacity_to_nearest_power_of_two=False
+        )
+        if records:
+            self._tree.extend(
+                columns_to_records(records, self.record_type), arrays["priorities"]
+            )
+        self._tree.num_inserted = num_inserted
+        if "beta" in arrays:
+            self._beta = float(arrays["beta"])
+
     def __len__(self) -> int:
         """
 
@@ -123,6 +193,15 @@ weights /= (weights.max() + 1e-10)  # Normalize for stability
 """
         return len(self._tree)
 
+    @property
+    def beta(self) -> float:
+        """
+Current importance-sampling exponent, annealed towards 1 by per_beta_increment_per_sampling on every sample
+
+@return:
+"""
+        return self._beta
+
     @property
     def capacity(self) -> int:
         """
@@ -149,7 +228,7 @@ if __name__ == "__main__":
 
         print(rb.sample(batch_size))
 
-        rb.update_last_batch(numpy.random.rand(capacity))
+        rb.update_last_batch(numpy.random.rand(batch_size))
 
         print(rb.sample(batch_size))
 
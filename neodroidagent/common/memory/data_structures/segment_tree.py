@@ -2,17 +2,21 @@
 # -*- coding: utf-8 -*-
 __author__ = "Christian Heider Nielsen"
 
-import operator
+from typing import Any, Union
 
-__all__ = ["SegmentTree"]
+import numpy
+
+__all__ = ["SegmentTree", "SumSegmentTree", "MinSegmentTree"]
 
 
 class SegmentTree(object):
     """
+Binary tree stored in a flat numpy array, node i has the children 2i and 2i+1 and the leaves are stored from
+index capacity onwards.
 
 """
 
-    def __init__(self, capacity, operation, neutral_element):
+    def __init__(self, capacity: int, operation: numpy.ufunc, neutral_element: float):
         """Build a Segment Tree data structure.
 
 https://en.wikipedia.org/wiki/Segment_tree
@@ -31,11 +35,11 @@ Parameters
 ---------
 capacity: int
 Total size of the array - must be a power of two.
-operation: lambda obj, obj -> obj
-and operation for combining elements (eg. sum, max)
-must for a mathematical group together with the set of
-possible values for array elements.
-neutral_element: obj
+operation: numpy.ufunc
+binary numpy ufunc combining elements (eg. numpy.add, numpy.minimum),
+must be associative and commutative, and together with the set of
+possible values for array elements form a mathematical group.
+neutral_element: float
 neutral element for the operation above. eg. float('-inf')
 for max and 0 for sum.
 """
@@ -43,45 +47,32 @@ for max and 0 for sum.
             capacity > 0 and capacity & (capacity - 1) == 0
         ), "capacity must be positive and a power of 2."
         self._capacity = capacity
-        self._value = [neutral_element for _ in range(2 * capacity)]
+        self._value = numpy.full(2 * capacity, neutral_element, dtype=numpy.float64)
         self._operation = operation
+        self._neutral_element = neutral_element
 
-    def _reduce_helper(self, start, end, node, node_start, node_end):
+    @property
+    def capacity(self) -> int:
         """
 
-@param start:
-@param end:
-@param node:
-@param node_start:
-@param node_end:
 @return:
 """
-        if start == node_start and end == node_end:
-            return self._value[node]
-        mid = (node_start + node_end) // 2
-        if end <= mid:
-            return self._reduce_helper(start, end, 2 * node, node_start, mid)
-        else:
-            if mid + 1 <= start:
-                return self._reduce_helper(start, end, 2 * node + 1, mid + 1, node_end)
-            else:
-                return self._operation(
-                    self._reduce_helper(start, mid, 2 * node, node_start, mid),
-                    self._reduce_helper(mid + 1, end, 2 * node + 1, mid + 1, node_end),
-                )
-
-    def reduce(self, start=0, end=None):
+        return self._capacity
+
+    def reduce(self, start: int = 0, end: int = None) -> float:
         """Returns result of applying `self.operation`
 to a contiguous subsequence of the array.
 
-self.operation(arr[start], operation(arr[start+1], operation(... arr[end])))
+self.operation(arr[start], operation(arr[start+1], operation(... arr[end - 1])))
+
+Iterative bottom-up, O(lg capacity), the whole array is read directly from the root.
 
 Parameters
 ----------
 start: int
 beginning of the subsequence
 end: int
-end of the subsequences
+end of the subsequences, exclusive
 
 Returns
 -------
@@ -92,53 +83,87 @@ result of reducing self.operation over the specified range of array elements.
             end = self._capacity
         if end < 0:
             end += self._capacity
-        end -= 1
-        return self._reduce_helper(start, end, 1, 0, self._capacity - 1)
-
-    def __setitem__(self, idx, val):
+        if start == 0 and end == self._capacity:
+            return float(self._value[1])
+
+        result = self._neutral_element
+        start += self._capacity
+        end += self._capacity
+        while start < end:
+            if start & 1:
+                result = self._operation(result, self._value[start])
+                start += 1
+            if end & 1:
+                end -= 1
+                result = self._operation(result, self._value[end])
+            start //= 2
+            end //= 2
+        return float(result)
+
+    def __setitem__(self, idx: Union[int, numpy.ndarray], val: Any) -> None:
         """
+Sets one or a batch of leaves, then recomputes the affected parents bottom-up, one tree level per iteration. A
+parent shared by several leaves is only recomputed once per level
 
 @param idx:
 @param val:
 @return:
 """
+        nodes = numpy.asarray(idx, dtype=numpy.int64) + self._capacity
+        self._value[nodes] = val
 
-        idx += self._capacity  # index of the leaf
-        self._value[idx] = val
-        idx //= 2
-        while idx >= 1:
-            self._value[idx] = self._operation(
-                self._value[2 * idx], self._value[2 * idx + 1]
+        nodes = numpy.unique(nodes // 2)
+        while nodes[0] >= 1:
+            self._value[nodes] = self._operation(
+                self._value[2 * nodes], self._value[2 * nodes + 1]
             )
-            idx //= 2
+            if nodes[0] == 1:
+                break
+            nodes = numpy.unique(nodes // 2)
 
-    def __getitem__(self, idx):
+    def __getitem__(self, idx: Union[int, numpy.ndarray]) -> Any:
         """
 
 @param idx:
 @return:
 """
-        assert 0 <= idx < self._capacity
+        idx = numpy.asarray(idx)
+        assert ((0 <= idx) & (idx < self._capacity)).all()
         return self._value[self._capacity + idx]
 
 
 class SumSegmentTree(SegmentTree):
     """
-
+Optionally keeps a MinSegmentTree of the same leaves in lockstep, so that the smallest priority, and thereby the
+largest importance-sampling weight, of a prioritised replay is available in O(1)
 """
 
-    def __init__(self, capacity):
+    def __init__(self, capacity: int, with_min_tree: bool = False):
         """
 
 @param capacity:
+@param with_min_tree: Also maintain a MinSegmentTree of the leaves, see min
 """
-        super().__init__(capacity=capacity, operation=operator.add, neutral_element=0.0)
+        super().__init__(capacity=capacity, operation=numpy.add, neutral_element=0.0)
+        self._min_tree = MinSegmentTree(capacity) if with_min_tree else None
+
+    def __setitem__(self, idx: Union[int, numpy.ndarray], val: Any) -> None:
+        super().__setitem__(idx, val)
+        if self._min_tree is not None:
+            self._min_tree[idx] = val
 
-    def sum(self, start=0, end=None):
-        """Returns arr[start] + ... + arr[end]"""
+    def sum(self, start: int = 0, end: int = None) -> float:
+        """Returns arr[start] + ... + arr[end - 1]"""
         return super().reduce(start, end)
 
-    def find_prefix_sum_idx(self, prefix_sum):
+    def min(self, start: int = 0, end: int = None) -> float:
+        """Returns min(arr[start], ...,  arr[end - 1]) from the min tree kept in lockstep, O(1) for the whole array"""
+        assert self._min_tree is not None, "Constructed without with_min_tree"
+        return self._min_tree.min(start, end)
+
+    def find_prefix_sum_idx(
+        self, prefix_sum: Union[float, numpy.ndarray]
+    ) -> Union[int, numpy.ndarray]:
         """
 Find the highest index `i` in the array such that
 sum(arr[0] + arr[1] + ... + arr[i - i]) <= prefix_sum
@@ -147,20 +172,27 @@ if array values are probabilities, this function
 allows to sample indexes according to the discrete
 probability efficiently.
 
+All queries of an array of prefix sums descend the tree together, one level per iteration.
+
 Parameters
 ----------
-:param prefix_sum: upper bound on the sum of array prefix
+:param prefix_sum: upper bound on the sum of array prefix, a float or an array of them
 :type prefix_sum: float
 """
-        assert 0 <= prefix_sum <= self.sum() + 1e-5
-        idx = 1
-        while idx < self._capacity:  # while non-leaf
-            if self._value[2 * idx] > prefix_sum:
-                idx *= 2
-            else:
-                prefix_sum -= self._value[2 * idx]
-                idx = 2 * idx + 1
-        return idx - self._capacity
+        prefix_sums = numpy.array(prefix_sum, dtype=numpy.float64, ndmin=1)
+        assert ((0 <= prefix_sums) & (prefix_sums <= self.sum() + 1e-5)).all()
+
+        idx = numpy.ones(len(prefix_sums), dtype=numpy.int64)
+        while idx[0] < self._capacity:  # while non-leaf, all leaves are at the same depth
+            left_sums = self._value[2 * idx]
+            go_right = left_sums <= prefix_sums
+            prefix_sums = numpy.where(go_right, prefix_sums - left_sums, prefix_sums)
+            idx = 2 * idx + go_right
+
+        idx -= self._capacity
+        if numpy.ndim(prefix_sum) == 0:
+            return int(idx[0])
+        return idx
 
 
 class MinSegmentTree(SegmentTree):
@@ -168,14 +200,23 @@ class MinSegmentTree(SegmentTree):
 
 """
 
-    def __init__(self, capacity):
+    def __init__(self, capacity: int):
         """
 
 @param capacity:
 """
-        super().__init__(capacity=capacity, operation=min, neutral_element=float("inf"))
+        super().__init__(
+            capacity=capacity, operation=numpy.minimum, neutral_element=float("inf")
+        )
 
-    def min(self, start=0, end=None):
-        """Returns min(arr[start], ...,  arr[end])"""
+    def min(self, start: int = 0, end: int = None) -> float:
+        """Returns min(arr[start], ...,  arr[end - 1])"""
 
         return super().reduce(start, end)
+
+
+if __name__ == "__main__":
+    tree = SumSegmentTree(8, with_min_tree=True)
+    tree[numpy.arange(6)] = numpy.arange(1, 7)
+    print(tree.sum(), tree.sum(2, 4), tree.min())
+    print(tree.find_prefix_sum_idx(numpy.array([0.0, 2.5, 20.9])))
@@ -2,18 +2,21 @@
 # -*- coding: utf-8 -*-
 import math
 
+import numpy
+
 __author__ = "Christian Heider Nielsen"
 
 __all__ = ["SumTree"]
 
-from typing import Any, Iterator
+from typing import Any, Iterator, Sequence
 
 from draugr import indent_lines
 
 
 class SumTree:
     """
-
+Binary tree stored in a flat numpy array, each parent holds the sum of its children and the leaves holds the
+priorities of the data. Supports batched prefix-sum queries and batched leaf updates.
 """
 
     def __init__(
@@ -31,24 +34,25 @@ class SumTree:
         self.num_tree_levels = math.ceil(math.log(capacity, 2)) + 1
         self._tree_size = 2 ** self.num_tree_levels - 1
         self._trunc_tree_size = 2 * self.capacity - 1
-        self._tree = [0.0 for _ in range(self._tree_size)]
+        self._tree = numpy.zeros(self._tree_size)
         self._data = [None for _ in range(self.capacity)]
         self._num_entries = 0
         self._cursor = 0
+        self.num_inserted = 0
 
-    def _propagate(self, tree_index: int, delta: float) -> None:
+    def _propagate(self, tree_index: int) -> None:
         """
-propagates changes through parents to root
+propagates changes through parents to root, each parent is recomputed from its children
 
 @param tree_index:
-@param delta:
 @return:
 """
-
-        parent_node = math.floor((tree_index - 1) / 2)
-        self._tree[parent_node] += delta
-        if parent_node != 0:
-            self._propagate(parent_node, delta)
+        while tree_index > 0:
+            tree_index = (tree_index - 1) // 2
+            left_child = 2 * tree_index + 1
+            self._tree[tree_index] = (
+                self._tree[left_child] + self._tree[left_child + 1]
+            )
 
     def _retrieve_leaf_recursive(self, tree_index: int, sum: float) -> Any:
         """
@@ -111,6 +115,58 @@ propagates changes through parents to root
         data_index = leaf_index - self.capacity + 1
         return (leaf_index, data_index, self._tree[leaf_index], self._data[data_index])
 
+    def _retrieve_leaves(self, sums: numpy.ndarray) -> numpy.ndarray:
+        """
+Descends all queries at once, one tree level per iteration
+
+@param sums:
+@return:
+"""
+        sums = numpy.array(sums, dtype=self._tree.dtype)
+        leaf_indices = numpy.zeros(len(sums), dtype=numpy.int64)
+
+        while True:
+            left_children = 2 * leaf_indices + 1
+            searching = left_children < self._trunc_tree_size
+            if not searching.any():  # All queries have reached the bottom
+                break
+
+            left_children = left_children[searching]
+            left_sums = self._tree[left_children]
+            remaining_sums = sums[searching]
+            go_left = remaining_sums <= left_sums
+
+            leaf_indices[searching] = numpy.where(
+                go_left, left_children, left_children + 1
+            )
+            sums[searching] = numpy.where(
+                go_left, remaining_sums, remaining_sums - left_sums
+            )
+
+        return leaf_indices
+
+    def get_batch(self, sums: Sequence, *, normalised_sum: bool = True) -> tuple:
+        """
+Batched version of get,
+(leaf_indices, data_indices, self._tree[leaf_indices], [self._data[i] for i in data_indices])
+
+@param sums:
+@param normalised_sum:
+@return:
+"""
+        sums = numpy.asarray(sums, dtype=self._tree.dtype)
+        if normalised_sum:
+            sums = sums * self.total
+
+        leaf_indices = self._retrieve_leaves(sums)
+        data_indices = leaf_indices - self.capacity + 1
+        return (
+            leaf_indices,
+            data_indices,
+            self._tree[leaf_indices],
+            [self._data[i] for i in data_indices],
+        )
+
     def push(self, data: Any, sum: float) -> None:
         """
 
@@ -123,6 +179,65 @@ propagates changes through parents to root
         self.update_leaf(self._cursor + self.capacity - 1, sum)
         self._cursor = (self._cursor + 1) % self.capacity
         self._num_entries = min(self._num_entries + 1, self.capacity)
+        self.num_inserted += 1
+
+    def extend(self, data: Sequence, sums: Sequence) -> None:
+        """
+Pushes a batch of data with corresponding sums, the parents are recomputed once per batch
+
+@param data:
+@param sums:
+@return:
+"""
+        data, sums = list(data), numpy.asarray(sums, dtype=self._tree.dtype)
+        assert len(data) == len(sums)
+        self.num_inserted += len(data)
+
+        num_dropped = len(data) - self.capacity
+        if num_dropped > 0:  # Only the last capacity entries would survive
+            self._cursor = (self._cursor + num_dropped) % self.capacity
+            data, sums = data[num_dropped:], sums[num_dropped:]
+
+        data_indices = (self._cursor + numpy.arange(len(data))) % self.capacity
+        for data_index, d in zip(data_indices, data):
+            self._data[data_index] = d
+        self.update_leaves(data_indices + self.capacity - 1, sums)
+
+        self._cursor = (self._cursor + len(data)) % self.capacity
+        self._num_entries = min(self._num_entries + len(data), self.capacity)
+
+    def latest(self, num: int) -> tuple:
+        """
+The num most recently pushed entries in push order,
+(data_indices, self._tree[leaf_indices], [self._data[i] for i in data_indices])
+
+@param num:
+@return:
+"""
+        data_indices = (self._cursor - num + numpy.arange(num)) % self.capacity
+        return (
+            data_indices,
+            self._tree[data_indices + self.capacity - 1],
+            [self._data[i] for i in data_indices],
+        )
+
+    def update_leaves(self, leaf_indices: Sequence, new_sums: Sequence) -> None:
+        """
+Sets a batch of leaves, then recomputes the affected parents bottom-up, one tree level per iteration.
+A parent shared by several leaves is only recomputed once per level
+
+@param leaf_indices:
+@param new_sums:
+@return:
+"""
+        nodes = numpy.asarray(leaf_indices, dtype=numpy.int64)
+        self._tree[nodes] = new_sums
+
+        while True:
+            nodes = numpy.unique((nodes[nodes > 0] - 1) // 2)
+            if not len(nodes):
+                break
+            self._tree[nodes] = self._tree[2 * nodes + 1] + self._tree[2 * nodes + 2]
 
     def update_leaf(self, leaf_index: int, new_sum: float) -> None:
         """
@@ -131,11 +246,8 @@ propagates changes through parents to root
 @param new_sum:
 @return:
 """
-        change = new_sum - self._tree[leaf_index]
         self._tree[leaf_index] = new_sum
-
-        if self.num_tree_levels > 1:
-            self._propagate(leaf_index, change)
+        self._propagate(leaf_index)
 
     @property
     def total(self) -> float:
@@ -144,7 +256,7 @@ Sum of all leaf nodes
 
 @return:
 """
-        return self._tree[0]
+        return float(self._tree[0])
 
     def print_tree(self) -> None:
         """
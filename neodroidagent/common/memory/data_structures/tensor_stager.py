@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy
+import torch
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+  Reusable page-locked staging of numpy columns as torch tensors
+  """
+__all__ = ["TensorStager"]
+
+
+class TensorStager:
+    """
+Gathers rows of numpy columns directly into reusable host tensors, page-locked when the device is a gpu, and copies
+them to reusable device tensors without blocking. Once the batch shapes have been seen assembling a minibatch does not
+allocate.
+
+The staging tensors are used in rotation, the returned tensors are overwritten num_buffers calls to stage later.
+"""
+
+    def __init__(
+        self,
+        device: Union[str, torch.device] = "cpu",
+        pin_memory: bool = None,
+        num_buffers: int = 1,
+    ):
+        """
+
+@param device:
+@param pin_memory: Whether to page-lock the host tensors, defaults to whether device is a gpu
+@param num_buffers: Number of staged minibatches that can be alive at once
+"""
+        assert num_buffers > 0
+        self._device = torch.device(device)
+        if pin_memory is None:
+            pin_memory = self._device.type == "cuda" and torch.cuda.is_available()
+        self._pin_memory = pin_memory
+        self._host = [{} for _ in range(num_buffers)]
+        self._staged = [{} for _ in range(num_buffers)]
+        self._copied = [None] * num_buffers
+        self._next_buffer = 0
+
+    @property
+    def device(self) -> torch.device:
+        """
+
+@return:
+"""
+        return self._device
+
+    @property
+    def num_buffers(self) -> int:
+        """
+
+@return:
+"""
+        return len(self._host)
+
+    @staticmethod
+    def _reuse(
+        cache: dict,
+        key: int,
+        shape: Tuple[int, ...],
+        dtype: torch.dtype,
+        device: torch.device,
+        pin_memory: bool,
+    ) -> torch.Tensor:
+        tensor = cache.get(key)
+        if tensor is None or tensor.shape != shape or tensor.dtype != dtype:
+            tensor = cache[key] = torch.empty(
+                shape, dtype=dtype, device=device, pin_memory=pin_memory
+            )
+        return tensor
+
+    def stage(
+        self,
+        columns: Sequence[Optional[numpy.ndarray]],
+        indices: numpy.ndarray,
+        dtypes: Sequence[Optional[torch.dtype]] = None,
+    ) -> Tuple[Optional[torch.Tensor], ...]:
+        """
+Gathers the rows at indices of every column and stages them on the device
+
+@param columns: None columns are passed through as None
+@param indices:
+@param dtypes: Per column dtype of the staged tensors, None keeps the dtype of the column
+@return:
+"""
+        buffer = self._next_buffer
+        self._next_buffer = (buffer + 1) % self.num_buffers
+        if self._copied[buffer] is not None:  # The host tensors may still be read
+            self._copied[buffer].synchronize()
+
+        if dtypes is None:
+            dtypes = [None] * len(columns)
+
+        staged = []
+        for key, (column, dtype) in enumerate(zip(columns, dtypes)):
+            if column is None:
+                staged.append(None)
+                continue
+
+            host = self._reuse(
+                self._host[buffer],
+                key,
+                (len(indices), *column.shape[1:]),
+                torch.from_numpy(column[:0]).dtype,
+                torch.device("cpu"),
+                self._pin_memory,
+            )
+            numpy.take(column, indices, axis=0, out=host.numpy(), mode="clip")
+
+            if dtype is None:
+                dtype = host.dtype
+            if self._device.type == "cpu" and dtype == host.dtype:
+                staged.append(host)
+                continue
+
+            device_tensor = self._reuse(
+                self._staged[buffer], key, host.shape, dtype, self._device, False
+            )
+            device_tensor.copy_(host, non_blocking=self._pin_memory)
+            staged.append(device_tensor)
+
+        if self._pin_memory:
+            self._copied[buffer] = torch.cuda.Event()
+            self._copied[buffer].record()
+
+        return tuple(staged)
+
+
+if __name__ == "__main__":
+    stager = TensorStager()
+    a = numpy.arange(10.0)
+    print(stager.stage((a, None), numpy.array([1, 5, 3]), (torch.float, None)))
@@ -10,10 +10,12 @@ __doc__ = r"""
 from abc import abstractmethod
 from typing import Any, Iterable
 
+from neodroidagent.common.memory.snapshot import SnapshotMixin
+
 __all__ = ["Memory"]
 
 
-class Memory:
+class Memory(SnapshotMixin):
     r"""
 
   """
@@ -36,6 +38,16 @@ class Memory:
     """
         raise NotImplementedError
 
+    def _extend(self, values: Iterable) -> None:
+        r"""
+    Adds every value of values, override for memories that can write a whole batch in one operation
+
+    @param values:
+    @return:
+    """
+        for value in values:
+            self._add(value)
+
     def sample(self, num: int = None) -> Iterable:
         r"""
 
@@ -52,6 +64,14 @@ class Memory:
     """
         return self._add(value)
 
+    def extend(self, values: Iterable) -> None:
+        r"""
+
+    @param values:
+    @return:
+    """
+        return self._extend(values)
+
     @abstractmethod
     def __len__(self) -> int:
         raise NotImplementedError
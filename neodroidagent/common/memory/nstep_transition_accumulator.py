@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from collections import deque
+from typing import Optional
+
+import numpy
+
+from neodroidagent.common.memory.transitions import TransitionPoint
+from neodroidagent.utilities.signal.experimental.nstep import discounted_nstep
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+  Folds consecutive transitions into n-step transitions before they are stored
+  """
+__all__ = ["NStepTransitionAccumulator"]
+
+
+class NStepTransitionAccumulator:
+    """
+Keeps the last n_step batches of transitions of a set of parallel environments and, once n_step batches have been
+seen, turns the oldest batch into n-step transitions
+
+state_t, action_t, successor_state_t+m, signal_t + discount * signal_t+1 + ... + discount^(m-1) * signal_t+m-1, terminal
+
+where m is n_step or the number of steps until the episode terminated. The successor is terminal in the latter case, so
+the target of every emitted transition bootstraps with discount ** n_step. The window is discounted for all
+environments at once by discounted_nstep.
+
+The windows pending when a new episode starts are flushed, those ending at a terminal are complete and emitted. Batches
+of whole episodes, as remembered from an episodic buffer, are folded by add_episode instead.
+"""
+
+    def __init__(self, n_step: int, discount_factor: float):
+        """
+
+@param n_step: Number of steps folded into each transition, 1 passes transitions through
+@param discount_factor:
+"""
+        assert n_step >= 1
+        self._n_step = n_step
+        self._discount_factor = discount_factor
+        self._window = deque(maxlen=n_step)
+
+    @property
+    def n_step(self) -> int:
+        """
+
+@return:
+"""
+        return self._n_step
+
+    @property
+    def bootstrap_discount_factor(self) -> float:
+        """
+Discount of the value of the successor of an emitted transition
+
+@return:
+"""
+        return self._discount_factor ** self._n_step
+
+    def reset(self) -> None:
+        """
+Drops the pending transitions
+
+@return:
+"""
+        self._window.clear()
+
+    def flush(self) -> Optional[TransitionPoint]:
+        """
+Folds the pending transitions whose windows end at a terminal, as add_episode does, and drops the rest as their
+windows can not be completed
+
+@return: The n-step transitions of the pending transitions that terminated, None if there are none
+"""
+        pending = list(self._window)
+        if len(pending) == self._n_step:
+            pending = pending[1:]  # The oldest batch has already been emitted
+        self.reset()
+        if not pending:
+            return None
+
+        return self._fold(
+            TransitionPoint(
+                *[
+                    numpy.concatenate([numpy.asarray(f) for f in fields])
+                    for fields in zip(*pending)
+                ]
+            ),  # Time major rows, as remembered from an episodic buffer
+            len(pending),
+        )
+
+    def add(
+        self, transition_points: TransitionPoint, *, new_episode: bool = False
+    ) -> Optional[TransitionPoint]:
+        """
+Appends a batch of transitions, one per environment, each field holding the batch along its first axis
+
+@param transition_points:
+@param new_episode: Whether the environments were reset before this batch, the pending transitions are flushed first
+@return: The n-step transitions of the batch added n_step - 1 calls earlier, None until the window is full. When
+new_episode is set, the transitions flushed from the previous episode instead
+"""
+        flushed = self.flush() if new_episode else None
+
+        if self._n_step == 1:
+            return transition_points
+
+        self._window.append(transition_points)
+        if len(self._window) < self._n_step:
+            return flushed
+
+        signals = numpy.stack(
+            [numpy.asarray(p.signal, dtype=numpy.float32) for p in self._window], -1
+        )  # (num_envs, ..., n_step)
+        terminals = numpy.stack(
+            [
+                numpy.asarray(p.terminal, dtype=signals.dtype).reshape(
+                    numpy.shape(p.signal)
+                )
+                for p in self._window
+            ],
+            -1,
+        )
+        discounted = discounted_nstep(
+            signals,
+            numpy.zeros((*signals.shape[:-1], self._n_step + 1), signals.dtype),
+            terminals,
+            self._discount_factor,
+            self._n_step,
+        )[..., 0]
+
+        terminated = terminals.reshape(len(signals), -1, self._n_step).any(1)
+        last = numpy.where(
+            terminated.any(-1), terminated.argmax(-1), self._n_step - 1
+        )  # Step of the successor of each environment
+        successor_states = numpy.stack([p.successor_state for p in self._window])
+        oldest = self._window[0]
+
+        return TransitionPoint(
+            oldest.state,
+            oldest.action,
+            successor_states[last, numpy.arange(len(last))],
+            discounted,
+            terminated.any(-1).reshape(numpy.shape(oldest.terminal)),
+        )
+
+    def add_episode(
+        self, transition_points: TransitionPoint, num_steps: int
+    ) -> Optional[TransitionPoint]:
+        """
+Folds a whole episode at once, the rows of each field are num_steps consecutive batches of transitions of a set of
+parallel environments concatenated along the first axis, as collected by an episodic buffer. The windows are folded
+along the time axis within the episode, windows running past the end of an episode that did not terminate are dropped.
+The pending transitions of add are dropped.
+
+@param transition_points:
+@param num_steps: Number of time steps of the episode
+@return: The n-step transitions in the order of transition_points, None if no window could be completed
+"""
+        self.reset()
+
+        if self._n_step == 1:
+            return transition_points
+
+        return self._fold(transition_points, num_steps)
+
+    def _fold(
+        self, transition_points: TransitionPoint, num_steps: int
+    ) -> Optional[TransitionPoint]:
+        """
+Folds num_steps consecutive batches concatenated along the first axis, see add_episode
+
+@param transition_points:
+@param num_steps:
+@return:
+"""
+        signal_shape = numpy.shape(transition_points.signal)
+        assert num_steps > 0 and signal_shape[0] % num_steps == 0
+        num_envs = signal_shape[0] // num_steps
+
+        signals = numpy.moveaxis(
+            numpy.asarray(transition_points.signal, dtype=numpy.float32).reshape(
+                num_steps, num_envs, *signal_shape[1:]
+            ),
+            0,
+            -1,
+        )  # (num_envs, ..., num_steps)
+        terminals = numpy.moveaxis(
+            numpy.asarray(transition_points.terminal, dtype=signals.dtype).reshape(
+                num_steps, num_envs, *signal_shape[1:]
+            ),
+            0,
+            -1,
+        )
+        discounted = discounted_nstep(
+            signals,
+            numpy.zeros((*signals.shape[:-1], num_steps + 1), signals.dtype),
+            terminals,
+            self._discount_factor,
+            self._n_step,
+        )
+
+        steps = numpy.arange(num_steps)
+        terminal_steps = numpy.where(
+            terminals.reshape(num_envs, -1, num_steps).any(1), steps, num_steps
+        )
+        next_terminal = numpy.minimum.accumulate(terminal_steps[:, ::-1], -1)[
+            :, ::-1
+        ]  # First terminal step at or after each step, num_steps if none
+        terminated = next_terminal < numpy.minimum(steps + self._n_step, num_steps)
+        last = numpy.where(terminated, next_terminal, steps + self._n_step - 1)
+        keep = (terminated | (last < num_steps)).T.reshape(-1)  # Time major rows
+        if not keep.any():
+            return None
+
+        successor_states = numpy.asarray(transition_points.successor_state)
+        successor_states = successor_states.reshape(
+            num_steps, num_envs, *successor_states.shape[1:]
+        )[numpy.minimum(last, num_steps - 1).T, numpy.arange(num_envs)]
+
+        return TransitionPoint(
+            numpy.asarray(transition_points.state)[keep],
+            numpy.asarray(transition_points.action)[keep],
+            successor_states.reshape(-1, *successor_states.shape[2:])[keep],
+            numpy.moveaxis(discounted, -1, 0).reshape(signal_shape)[keep],
+            terminated.T.reshape(numpy.shape(transition_points.terminal))[keep],
+        )
+
+
+if __name__ == "__main__":
+    accumulator = NStepTransitionAccumulator(3, 0.5)
+    for i in range(5):
+        a = numpy.full((2, 1), i)
+        print(
+            accumulator.add(
+                TransitionPoint(a, a, a + 1, numpy.ones(2), numpy.array([False, i == 1]))
+            )
+        )
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import queue
+import threading
+from typing import Any, Callable, Iterator
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+  Samples minibatches ahead of time on a worker thread
+  """
+__all__ = ["PrefetchingSampler"]
+
+
+class PrefetchingSampler:
+    """
+Calls sample_function on a worker thread and hands back the results in order through a queue holding at most
+num_prefetch minibatches, so that sampling and staging the next minibatches overlaps with the current update.
+
+The worker holds lock while sampling, anything writing to the sampled memory while the sampler runs must hold it
+too. Exceptions raised by sample_function are re-raised by the next call to next.
+"""
+
+    def __init__(self, sample_function: Callable[[], Any], num_prefetch: int = 2):
+        """
+
+@param sample_function: Returns one minibatch, eg. lambda: memory.sample(batch_size)
+@param num_prefetch: Maximum number of minibatches sampled ahead
+"""
+        assert num_prefetch > 0
+        self._sample_function = sample_function
+        self._queue = queue.Queue(num_prefetch)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = None
+
+    @property
+    def lock(self) -> threading.Lock:
+        """
+
+@return:
+"""
+        return self._lock
+
+    @staticmethod
+    def num_alive(num_prefetch: int) -> int:
+        """
+Number of minibatches that can be alive at once, queued ones plus the one held by the worker and the one being
+consumed, eg. the number of staging buffers needed if minibatches reuse storage
+
+@param num_prefetch:
+@return:
+"""
+        return num_prefetch + 2
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with self._lock:
+                    item = (True, self._sample_function())
+            except Exception as e:
+                item = (False, e)
+
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+            if not item[0]:
+                break
+
+    def start(self) -> None:
+        """
+
+@return:
+"""
+        if self._worker is None:
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._work, daemon=True)
+            self._worker.start()
+
+    def close(self) -> None:
+        """
+Stops the worker and discards the prefetched minibatches
+
+@return:
+"""
+        if self._worker is not None:
+            self._stop.set()
+            self._worker.join()
+            self._worker = None
+            while not self._queue.empty():
+                self._queue.get_nowait()
+
+    def __next__(self) -> Any:
+        self.start()
+        success, item = self._queue.get()
+        if not success:
+            self._worker.join()
+            self._worker = None
+            raise item
+        return item
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    import numpy
+
+    with PrefetchingSampler(lambda: numpy.random.random(3), 2) as sampler:
+        for _, batch in zip(range(4), sampler):
+            print(batch)
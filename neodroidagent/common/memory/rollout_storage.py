@@ -7,157 +7,176 @@ __doc__ = r"""
            Created on 17/02/2020
            """
 
+import logging
+from typing import Dict, Iterator, Tuple
+
 import torch
-from torch.utils.data.sampler import BatchSampler, SubsetRandomSampler
 
-USE_CUDA = torch.cuda.is_available()
+from neodroidagent.utilities.signal.linear_recurrence import reverse_discount_torch
+
+__all__ = ["RolloutStorage"]
 
 
 class RolloutStorage(object):
-    def __init__(
-        self, num_steps, num_processes, obs_shape, action_space, use_cuda, action_shape
-    ):
-        """
-A storage class for storing the episode rollouts across various environments
-:param num_steps: Steps into the environment
-:param num_processes: Parallel workers collecting the experiences
-:param obs_shape: Shape of the observation
-:param action_space: Action Shape
-:param state_size: Shape of the state (Maybe similar to the observation)
-:param use_cuda: Use GPU
+    """
+Preallocated storage of on-policy rollouts collected from num_envs parallel environments. Every field is a
+(num_steps, num_envs, ...) tensor allocated on the device of the first value inserted into it and reused for all later
+rollouts, so collecting a rollout does not allocate.
+
+Returns and advantages are computed into their own fields and minibatches are gathered from flattened views by an
+index permutation.
 """
-        self.observations = torch.zeros(num_steps + 1, num_processes, *obs_shape)
-        # Rewards given by the environment - Extrinsic Rewards
-        self.rewards = torch.zeros(num_steps, num_processes, 1)
-        # Rewards generated by the intrinsic curiosity module
-        self.intrinsic_rewards = torch.zeros(num_steps, num_processes, 1)
-        self.value_preds = torch.zeros(num_steps + 1, num_processes, 1)
-        # Cumulative returns (calculated using the rewards and the value predictions)
-        self.returns = torch.zeros(num_steps + 1, num_processes, 1)
-        # Log probabilities of the actions by the previous policy
-        self.action_log_probs = torch.zeros(num_steps, num_processes, 1)
 
+    def __init__(self, num_steps: int = 2048):
+        """
+:param num_steps: Steps into the environment per rollout, the storage grows, with a warning, if a rollout is longer
+"""
+        assert num_steps > 0
         self.num_steps = num_steps
-        self.num_processes = num_processes
-        self.obs_shape = obs_shape
-        self.action_space = action_space
-        self.action_shape = action_shape
-        self.use_cuda = use_cuda
-
-        action_shape = self.action_shape
-
-        self.actions = torch.zeros(num_steps, num_processes, action_shape)
-
-        self.actions = self.actions.long()
-        self.masks = torch.ones(num_steps + 1, num_processes, 1)
-        self.use_cuda = use_cuda
-        if self.use_cuda:
-            self.cuda()
-
-    def cuda(self):
-        self.observations = self.observations.cuda()
-        self.rewards = self.rewards.cuda()
-        self.intrinsic_rewards = self.intrinsic_rewards.cuda()
-        self.value_preds = self.value_preds.cuda()
-        self.returns = self.returns.cuda()
-        self.action_log_probs = self.action_log_probs.cuda()
-        self.actions = self.actions.cuda()
-        self.masks = self.masks.cuda()
-
-    def insert(
-        self,
-        step,
-        current_obs,
-        action,
-        action_log_prob,
-        value_pred,
-        reward,
-        intrinsic_reward,
-    ):
+        self.step = 0
+        self._fields: Dict[str, torch.Tensor] = {}
+
+    def _buffer(self, name: str, like: torch.Tensor) -> torch.Tensor:
+        buffer = self._fields.get(name)
+        if (
+            buffer is None
+            or buffer.shape[1:] != like.shape
+            or buffer.dtype != like.dtype
+            or buffer.device != like.device
+        ):
+            buffer = self._fields[name] = torch.zeros(
+                (self.num_steps, *like.shape), dtype=like.dtype, device=like.device
+            )
+        return buffer
+
+    def _grow(self) -> None:
+        logging.warning(
+            f"Rollout longer than {self.num_steps} steps, growing the rollout storage"
+        )
+        self.num_steps *= 2
+        for name, buffer in self._fields.items():
+            grown = buffer.new_zeros((self.num_steps, *buffer.shape[1:]))
+            grown[: len(buffer)] = buffer
+            self._fields[name] = grown
+
+    def insert(self, **values: torch.Tensor) -> None:
         """
-:param step:
-:param current_obs:
-:param state:
-:param action:
-:param action_log_prob:
-:param value_pred:
-:param reward:
-:param mask:
+Writes the values of the current step, each with num_envs as the first axis, and advances the step
+
+:param values: Field name to tensor
 :return:
 """
-        self.observations[step + 1].copy_(current_obs)
-        self.actions[step].copy_(action)
-        self.action_log_probs[step].copy_(action_log_prob)
-        self.value_preds[step].copy_(value_pred)
-        self.rewards[step].copy_(reward)
-        # self.masks[step + 1].copy_(mask)
-        self.intrinsic_rewards[step].copy_(intrinsic_reward)
-
-    def after_update(self):
-        self.observations[0].copy_(self.observations[-1])
-        self.masks[0].copy_(self.masks[-1])
-
-    def compute_returns(self, next_value, use_gae, gamma, tau):
+        if self.step == self.num_steps:
+            self._grow()
+        for name, value in values.items():
+            value = value.detach()
+            self._buffer(name, value)[self.step].copy_(value)
+        self.step += 1
+
+    def __getitem__(self, name: str) -> torch.Tensor:
+        """
+:param name:
+:return: View of the field over the steps of the current rollout
+"""
+        return self._fields[name][: self.step]
+
+    def __setitem__(self, name: str, value: torch.Tensor) -> None:
+        """
+Writes a whole field of the current rollout, value has the shape (step, num_envs, ...)
+
+:param name:
+:param value:
+:return:
+"""
+        value = value.detach()
+        self._buffer(name, value[0])[: self.step].copy_(value)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._fields
+
+    def __len__(self) -> int:
+        return self.step
+
+    def after_update(self) -> None:
+        """
+Starts a new rollout, the storage is kept
+
+:return:
+"""
+        self.step = 0
+
+    def compute_returns(
+        self,
+        next_value: torch.Tensor,
+        use_gae: bool,
+        gamma: float,
+        tau: float,
+        *,
+        normalise_advantages: bool = True,
+    ) -> None:
         """
 This function is being used to compute the true state values using a bootstrapped
-estimate and backtracking.
-:param next_value:
+estimate and backtracking, into the fields "returns" and "advantages". Reads the fields "signal", "non_terminal" and
+"value_estimate", all of shape (step, num_envs, 1).
+:param next_value: Value estimate of the successor of the last step
 :param use_gae: Use generalized advantage estimation
 :param gamma: Discount factor
 :param tau:
+:param normalise_advantages:
 :return:
 """
-        # Returns defines the possible sum of rewards/returns from a given state
+        signal = self["signal"]
+        non_terminal = self["non_terminal"]
+        value_estimate = self["value_estimate"]
+        successor_value_estimate = torch.cat(
+            (value_estimate[1:], next_value.reshape(1, *value_estimate.shape[1:]))
+        )
 
         if use_gae:
-            self.value_preds[-1] = next_value
-            # Initialize the GAE to 0
-            gae = 0
-            # Starting from the back
-            for step in reversed(range(self.rewards.size(0))):
-                # Delta = Reward + discount*Value_next_step - Value_current_step
-                delta = (
-                    (self.rewards[step] + self.intrinsic_rewards[step])
-                    + gamma * self.value_preds[step + 1]
-                    - self.value_preds[step]
-                )
-                # Advantage = delta + gamma*tau*previous_advantage
-                gae = delta + gamma * tau * gae
-                # Final return = gae + value
-                self.returns[step] = gae + self.value_preds[step]
+            # Delta = Reward + discount*Value_next_step - Value_current_step
+            delta = (
+                signal + gamma * successor_value_estimate * non_terminal - value_estimate
+            )
+            # Advantage = delta + gamma*tau*next_advantage, solved for all steps at once
+            self["advantages"] = reverse_discount_torch(delta, gamma * tau, non_terminal)
+            self["returns"] = self["advantages"] + value_estimate
         else:
-            # Initialize the returns vector with the next predicted value of the state
-            # (Value of the last state of the rollout)
-            self.returns[-1] = next_value
-            for step in reversed(range(self.rewards.size(0))):
-                # Returns at current step = gamma*Returns at next step + rewards_at_current_step
-                self.returns[step] = self.returns[step + 1] * gamma * self.masks[
-                    step + 1
-                ] + (self.rewards[step] + self.intrinsic_rewards[step])
-
-    def feed_forward_generator(self, advantages, mini_batches):
-        num_steps, num_processes = self.rewards.size()[0:2]
-        total_batch_size = num_processes * num_steps
-        assert total_batch_size >= mini_batches, (
-            f"PPO requires the number processes ({num_processes}) "
-            f"* number of steps ({num_steps}) = {num_processes * num_steps} "
-            f"to be greater than or equal to the number of PPO mini batches ({mini_batches})."
-        )
+            bootstrapped = signal.clone()
+            bootstrapped[-1] += gamma * non_terminal[-1] * successor_value_estimate[-1]
+            self["returns"] = reverse_discount_torch(bootstrapped, gamma, non_terminal)
+            self["advantages"] = self["returns"] - value_estimate
+
+        if normalise_advantages:
+            advantages = self["advantages"]
+            advantages.sub_(advantages.mean()).div_(advantages.std() + 1e-6)
+
+    def feed_forward_generator(
+        self, mini_batch_size: int, *names: str
+    ) -> Iterator[Tuple[torch.Tensor, ...]]:
+        """
+Yields the named fields in minibatches of steps of all environments, in a random order
 
-        mini_batch_size = total_batch_size // mini_batches
-        # Create a random batch sampler
-        sampler = BatchSampler(
-            SubsetRandomSampler(range(total_batch_size)),
-            mini_batch_size,
-            drop_last=False,
+:param mini_batch_size:
+:param names:
+:return:
+"""
+        flattened = [self[name].flatten(0, 1) for name in names]
+        total_batch_size = len(flattened[0])
+        permutation = torch.randperm(total_batch_size, device=flattened[0].device)
+        for start in range(0, total_batch_size, mini_batch_size):
+            indices = permutation[start : start + mini_batch_size]
+            yield tuple(field[indices] for field in flattened)
+
+
+if __name__ == "__main__":
+    storage = RolloutStorage(4)
+    for i in range(6):
+        storage.insert(
+            signal=torch.ones(2, 1),
+            non_terminal=torch.ones(2, 1),
+            value_estimate=torch.zeros(2, 1),
         )
-        for i in sampler:
-            observations_batch = self.observations[:-1].reshape(
-                -1, *self.observations.size()[2:]
-            )[i]
-            actions_batch = self.actions.reshape(-1, self.actions.size(-1))[i]
-            return_batch = self.returns[:-1].reshape(-1, 1)[i]
-            old_action_log_probs_batch = self.action_log_probs.reshape(-1, 1)[i]
-            adv_targ = advantages.reshape(-1, 1)[i]
-
-            yield observations_batch, actions_batch, return_batch, old_action_log_probs_batch, adv_targ
+    storage.compute_returns(torch.zeros(2, 1), True, 0.5, 1.0, normalise_advantages=False)
+    print(storage["returns"][:, :, 0].T)
+    for batch in storage.feed_forward_generator(5, "signal", "returns"):
+        print(batch[1].T)
@@ -45,15 +45,16 @@ __slots__=['state','action','successor_state','signal','terminal','distribution'
 
 
 class SampleTransitionBuffer(ExpandableCircularBuffer):
+    record_type = SampleTransitionPoint
+
     def add_transition_points(self, transition_points: SampleTransitionPoint) -> None:
         """
-Iteratively adds transition points with TransitionPointBuffer.add_transition_point
+Adds a batch of transition points, each field of transition_points holds the batch along its first axis
 
 @param transition_points:
 @return:
 """
-        for t in zip(*transition_points):
-            self.add_transition_point(SampleTransitionPoint(*t))
+        self._extend(SampleTransitionPoint(*t) for t in zip(*transition_points))
 
     @wrap_args(SampleTransitionPoint)
     def add_transition_point(self, transition_point: SampleTransitionPoint) -> None:
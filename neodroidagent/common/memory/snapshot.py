@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+import logging
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import numpy
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+  Saving and loading of memories as chunked .npz shards
+  """
+__all__ = ["SnapshotMixin", "records_to_columns", "columns_to_records"]
+
+
+def records_to_columns(
+    records: Sequence, record_type: Any = None
+) -> Dict[str, numpy.ndarray]:
+    """
+Stacks records into one array per field, named by field position, records are kept whole if record_type is None.
+Fields that do not stack are stored as object arrays
+
+@param records:
+@param record_type:
+@return:
+"""
+    if record_type is None:
+        fields = {"value": records}
+    else:
+        fields = {str(i): column for i, column in enumerate(zip(*records))}
+
+    columns = {}
+    for key, column in fields.items():
+        try:
+            columns[key] = numpy.asarray(column)
+        except ValueError:  # Ragged
+            columns[key] = numpy.empty(len(column), dtype=object)
+            for i, value in enumerate(column):
+                columns[key][i] = value
+    return columns
+
+
+def columns_to_records(
+    columns: Dict[str, numpy.ndarray], record_type: Any = None
+) -> list:
+    """
+Inverse of records_to_columns
+
+@param columns:
+@param record_type:
+@return:
+"""
+    if record_type is None:
+        return list(columns["value"])
+    return [
+        record_type(*row)
+        for row in zip(*[columns[str(i)] for i in range(len(columns))])
+    ]
+
+
+def _remove(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class SnapshotMixin:
+    """
+Saves and loads a memory as a directory of .npz shards. Each save appends only the records inserted since the
+previous save as a new shard, and shards only holding overwritten records are deleted, so that checkpoints after the
+first are cheap. State that changes after insertion (eg. priorities) is saved in full on every save.
+
+The manifest records the run id of the memory that wrote it, a snapshot of another run is replaced rather than appended
+to. A memory continues the run of the snapshot it was loaded from. Files are named by the run and never rewritten while
+a manifest refers to them, the files of the previous manifest are deleted once the new one has replaced it, so that an
+interrupted save leaves the previous snapshot loadable.
+
+Implementors provide num_inserted, the number of records ever inserted, _snapshot_records, _restore and optionally
+_snapshot_arrays.
+"""
+
+    snapshot_directory_name = "replay_buffer_snapshot"
+    manifest_file_name = "manifest.json"
+    arrays_file_name = "arrays.npz"
+
+    @property
+    def num_inserted(self) -> int:
+        """
+Number of records ever inserted, including the overwritten ones
+
+@return:
+"""
+        raise NotImplementedError
+
+    def _snapshot_records(self, num: int) -> Dict[str, numpy.ndarray]:
+        """
+The num most recently inserted records in insertion order, as one array per field
+
+@param num:
+@return:
+"""
+        raise NotImplementedError
+
+    def _snapshot_arrays(self) -> Dict[str, numpy.ndarray]:
+        """
+State saved in full on every save
+
+@return:
+"""
+        return {}
+
+    def _restore(
+        self,
+        records: Dict[str, numpy.ndarray],
+        arrays: Dict[str, numpy.ndarray],
+        num_inserted: int,
+    ) -> None:
+        """
+Replaces the contents of the memory with records, in insertion order, and arrays
+
+@param records:
+@param arrays:
+@param num_inserted:
+@return:
+"""
+        raise NotImplementedError
+
+    @property
+    def snapshot_run_id(self) -> str:
+        """
+Identifies the snapshots written by this memory, generated on first use
+
+@return:
+"""
+        run_id = getattr(self, "_snapshot_run_id", None)
+        if run_id is None:
+            run_id = self._snapshot_run_id = uuid.uuid4().hex
+        return run_id
+
+    @classmethod
+    def _read_manifest(cls, directory: Path) -> Optional[dict]:
+        manifest_path = directory / cls.manifest_file_name
+        if not manifest_path.exists():
+            return None
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    def save(self, directory: Path) -> None:
+        """
+Appends the records inserted since the last save to directory as a new shard, then replaces the manifest
+
+@param directory:
+@return:
+"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        num_inserted = self.num_inserted
+        first_held = num_inserted - len(self)
+        manifest = self._read_manifest(directory)
+
+        run_id = self.snapshot_run_id
+        if (
+            manifest is None
+            or manifest.get("run_id") != run_id
+            or manifest["num_inserted"] > num_inserted
+        ):  # Another run
+            shards = []
+            start = first_held
+        else:
+            shards = list(manifest["shards"])
+            start = max(manifest["num_inserted"], first_held)
+
+        if num_inserted > start:
+            file_name = f"shard_{run_id}_{start}.npz"
+            numpy.savez(
+                directory / file_name, **self._snapshot_records(num_inserted - start)
+            )
+            shards.append({"file": file_name, "start": start, "end": num_inserted})
+        # Shards whose records have all been overwritten are dropped
+        shards = [shard for shard in shards if shard["end"] > first_held]
+
+        new_manifest = {
+            "run_id": run_id,
+            "num_inserted": num_inserted,
+            "num_held": len(self),
+            "shards": shards,
+        }
+        arrays = self._snapshot_arrays()
+        if arrays:
+            arrays_file_name = Path(self.arrays_file_name)
+            new_manifest["arrays"] = (
+                f"{arrays_file_name.stem}_{run_id}_{num_inserted}"
+                f"{arrays_file_name.suffix}"
+            )
+            tmp_path = directory / f"tmp_{self.arrays_file_name}"
+            numpy.savez(tmp_path, **arrays)
+            tmp_path.replace(directory / new_manifest["arrays"])
+
+        tmp_path = directory / f"{self.manifest_file_name}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(new_manifest, f)
+        tmp_path.replace(directory / self.manifest_file_name)
+
+        if manifest is not None:  # Only now that no manifest refers to them
+            kept = {shard["file"] for shard in shards} | {new_manifest.get("arrays")}
+            for file_name in [shard["file"] for shard in manifest["shards"]] + [
+                manifest.get("arrays", self.arrays_file_name)
+            ]:
+                if file_name not in kept:
+                    _remove(directory / file_name)
+
+    def load(self, directory: Path) -> bool:
+        """
+Replaces the contents of the memory with the snapshot in directory, later saves continue the snapshot
+
+@param directory:
+@return: Whether a snapshot was found
+"""
+        directory = Path(directory)
+        manifest = self._read_manifest(directory)
+        if manifest is None:
+            return False
+
+        parts = []
+        for shard in manifest["shards"]:
+            with numpy.load(directory / shard["file"], allow_pickle=True) as f:
+                parts.append({key: f[key] for key in f.files})
+
+        records = {}
+        if parts:
+            skip = (
+                manifest["num_inserted"]
+                - manifest["num_held"]
+                - manifest["shards"][0]["start"]
+            )
+            records = {
+                key: numpy.concatenate([part[key] for part in parts])[skip:]
+                for key in parts[0]
+            }
+
+        arrays = {}
+        arrays_path = directory / manifest.get("arrays", self.arrays_file_name)
+        if arrays_path.exists():
+            with numpy.load(arrays_path, allow_pickle=True) as f:
+                arrays = {key: f[key] for key in f.files}
+
+        self._restore(records, arrays, manifest["num_inserted"])
+        self._snapshot_run_id = manifest.get("run_id")
+        logging.info(f"Loaded {manifest['num_held']} records from {directory}")
+        return True
@@ -7,6 +7,10 @@ from neodroidagent.common.memory.data_structures.expandable_circular_buffer impo
     ExpandableCircularBuffer,
 )
 from neodroidagent.utilities import NoData
+from neodroidagent.utilities.misc.distribution_parameters import (
+    distribution_parameters,
+    stack_distributions,
+)
 from warg import OrdinalIndexingDictMixin, IterDictValuesMixin
 from warg.arguments import wrap_args
 
@@ -61,11 +65,14 @@ __slots__=["signal", "terminated", "action", "distribution"]
 
 class SampleTrajectoryBuffer(ExpandableCircularBuffer):
     """
-Expandable buffer for storing rollout trajectories
+Expandable buffer for storing rollout trajectories, distributions are stored as their parameter tensors
 """
 
+    record_type = SampleTrajectoryPoint
+
     def __init__(self):
         super().__init__()
+        self._distribution_type = None
 
     @wrap_args(SampleTrajectoryPoint)
     def add_trajectory_point(self, point: SampleTrajectoryPoint):
@@ -74,20 +81,43 @@ Expandable buffer for storing rollout trajectories
 @param point:
 @return:
 """
-        self._add(point)
+        if point.distribution is not None:
+            self._distribution_type = type(point.distribution)
+        self._add(
+            SampleTrajectoryPoint(
+                point.signal,
+                point.terminated,
+                point.action,
+                distribution_parameters(point.distribution),
+            )
+        )
 
     def retrieve_trajectory(self) -> SampleTrajectoryPoint:
         """
 
-@return:
+@return: The fields as tuples over the steps, except distribution which is a single distribution batched over the
+steps along the first axis
 """
         if len(self):
-            return SampleTrajectoryPoint(*zip(*self._sample()))
+            signal, terminated, action, parameters = zip(*self._sample())
+            return SampleTrajectoryPoint(
+                signal,
+                terminated,
+                action,
+                stack_distributions(self._distribution_type, parameters),
+            )
         raise NoData
 
 
 if __name__ == "__main__":
+    import torch
+
     tb = SampleTrajectoryBuffer()
     NoneAr = list(range(6))
-    [tb.add_trajectory_point(NoneAr, NoneAr, NoneAr, NoneAr) for _ in range(10)]
+    [
+        tb.add_trajectory_point(
+            NoneAr, NoneAr, NoneAr, torch.distributions.Categorical(logits=torch.ones(6))
+        )
+        for _ in range(10)
+    ]
     print(tb.retrieve_trajectory())
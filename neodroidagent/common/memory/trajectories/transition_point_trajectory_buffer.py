@@ -7,6 +7,10 @@ from neodroidagent.common.memory.data_structures.expandable_circular_buffer impo
 )
 from neodroidagent.common.memory.transitions import ValuedTransitionPoint
 from neodroidagent.utilities import NoData
+from neodroidagent.utilities.misc.distribution_parameters import (
+    distribution_parameters,
+    stack_distributions,
+)
 from warg.arguments import wrap_args
 
 __author__ = "Christian Heider Nielsen"
@@ -18,11 +22,14 @@ __all__ = ["TransitionPointTrajectoryBuffer"]
 
 class TransitionPointTrajectoryBuffer(ExpandableCircularBuffer):
     """
-
+Distributions are stored as their parameter tensors and sampled as a single distribution batched over the steps
     """
 
+    record_type = ValuedTransitionPoint
+
     def __init__(self):
         super().__init__()
+        self._distribution_type = None
 
     @wrap_args(ValuedTransitionPoint)
     def add_transition_point(self, transition_point: ValuedTransitionPoint) -> None:
@@ -32,12 +39,29 @@ args will be wrapped in a TransitionPoint type tuple and collected as transition
 @param transition_point:
 @return:
 """
-        self._add(transition_point)
+        if transition_point.distribution is not None:
+            self._distribution_type = type(transition_point.distribution)
+        self._add(
+            ValuedTransitionPoint(
+                transition_point.state,
+                transition_point.action,
+                transition_point.successor_state,
+                transition_point.signal,
+                transition_point.terminal,
+                distribution_parameters(transition_point.distribution),
+                transition_point.value_estimate,
+            )
+        )
 
     def sample(self) -> ValuedTransitionPoint:
         """Randomly sample transitions from memory."""
         if len(self):
-            return ValuedTransitionPoint(*zip(*self._sample()))
+            *fields, parameters, value_estimate = zip(*self._sample())
+            return ValuedTransitionPoint(
+                *fields,
+                stack_distributions(self._distribution_type, parameters),
+                value_estimate,
+            )
         raise NoData
 
 
@@ -47,6 +71,6 @@ if __name__ == "__main__":
     a = iter(count())
     for i in range(100):
         b = next(a)
-        tp = ValuedTransitionPoint(*([b] * len(ValuedTransitionPoint.get_fields())))
+        tp = ValuedTransitionPoint(*([b] * 5), None, b)
         tb.add_transition_point(tp)
     print(tb.sample(10))
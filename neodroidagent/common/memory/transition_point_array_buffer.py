@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from itertools import count
+from typing import Optional, Sequence, Union
+
+import torch
+
+from neodroidagent.common.memory.data_structures.array_circular_buffer import (
+    ArrayCircularBuffer,
+)
+from neodroidagent.common.memory.transitions import TransitionPoint
+from neodroidagent.utilities import NoData
+from warg.arguments import wrap_args
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+  Buffer class for for maintaining a columnar circular buffer of TransitionPoint's
+"""
+__all__ = ["TransitionPointArrayBuffer"]
+
+
+class TransitionPointArrayBuffer(ArrayCircularBuffer):
+    """
+Drop-in replacement for TransitionPointBuffer, each field of the TransitionPoint's is stored in a preallocated
+numpy array and batches are gathered by fancy indexing instead of being rebuilt from python objects.
+"""
+
+    def __init__(self, capacity: int = 0, **kwargs):
+        """
+
+@param capacity:
+@param kwargs:
+"""
+        super().__init__(capacity, fields=TransitionPoint.get_fields(), **kwargs)
+
+    @wrap_args(TransitionPoint)
+    def add_transition_point(self, transition_point: TransitionPoint) -> None:
+        """
+args will be wrapped in a TransitionPoint type tuple and collected as transition_point
+
+@param transition_point:
+@return:
+"""
+        self._add(transition_point)
+
+    def add_transition_points(self, transition_points: TransitionPoint) -> None:
+        """
+Adds a batch of transition points, each field of transition_points holds the batch along its first axis
+
+@param transition_points:
+@return:
+"""
+        self._add_columns(transition_points)
+
+    def sample(self, num: int = None) -> TransitionPoint:
+        """Randomly sample transitions from memory, each field is a numpy array with the batch as first axis."""
+        if len(self):
+            return TransitionPoint(*self._sample(num))
+        raise NoData
+
+    def sample_tensors(
+        self,
+        num: int = None,
+        *,
+        device: Union[str, torch.device] = "cpu",
+        dtypes: Sequence[Optional[torch.dtype]] = None,
+        num_staging_buffers: int = 1,
+    ) -> TransitionPoint:
+        """
+Randomly sample transitions from memory as torch tensors on device, the tensors are reused num_staging_buffers calls
+later
+
+@param num:
+@param device:
+@param dtypes: Per field dtype of the tensors, None keeps the dtype of the stored field
+@param num_staging_buffers: Number of sampled minibatches that can be alive at once
+@return:
+"""
+        if len(self):
+            return TransitionPoint(
+                *self._sample_tensors(
+                    num,
+                    device=device,
+                    dtypes=dtypes,
+                    num_staging_buffers=num_staging_buffers,
+                )
+            )
+        raise NoData
+
+
+if __name__ == "__main__":
+    tb = TransitionPointArrayBuffer(10)
+    a = iter(count())
+    for i in range(21):
+        b = next(a)
+        tp = TransitionPoint(*([b] * len(TransitionPoint.get_fields())))
+        tb.add_transition_point(tp)
+
+    print(tb.sample(9))
@@ -17,6 +17,8 @@ __all__ = ["TransitionPointBuffer"]
 
 
 class TransitionPointBuffer(ExpandableCircularBuffer):
+    record_type = TransitionPoint
+
     @wrap_args(TransitionPoint)
     def add_transition_point(self, transition_point: TransitionPoint) -> None:
         """
@@ -27,6 +29,15 @@ args will be wrapped in a TransitionPoint type tuple and collected as transition
 """
         self._add(transition_point)
 
+    def add_transition_points(self, transition_points: TransitionPoint) -> None:
+        """
+Adds a batch of transition points, each field of transition_points holds the batch along its first axis
+
+@param transition_points:
+@return:
+"""
+        self._extend(TransitionPoint(*s) for s in zip(*transition_points))
+
     def sample(self, num=None) -> TransitionPoint:
         """Randomly sample transitions from memory."""
         if len(self):
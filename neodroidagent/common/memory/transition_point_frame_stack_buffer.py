@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from typing import Dict
+
+import numpy
+
+from neodroidagent.common.memory.data_structures.array_circular_buffer import (
+    ArrayCircularBuffer,
+)
+from neodroidagent.common.memory.transitions import TransitionPoint
+from neodroidagent.utilities import NoData
+from warg import is_none_or_zero_or_negative
+from warg.arguments import wrap_args
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+  Buffer class for for maintaining a circular buffer of TransitionPoint's with stacked frame observations, where
+  each frame is only stored once
+"""
+__all__ = ["TransitionPointFrameStackBuffer"]
+
+
+class TransitionPointFrameStackBuffer(ArrayCircularBuffer):
+    """
+Replay for observations that are stacks of the last stack_size frames along their first axis, eg. (4, 84, 84).
+
+Consecutive transitions share all but one frame, so only the newest frame of each state is stored and the stacked
+state and successor_state are rebuilt at sample time from index arithmetic. Frames from before the start of an
+episode, as indicated by terminal, are replaced by the first frame of the episode, which matches the convention of
+initialising the stack by repeating the reset frame. The successor_state of terminal transitions is zeroed.
+
+Each record holds one step of num_streams environments, the rows of a batch are expected to be ordered by time
+then environment, as produced by a vectorised environment.
+
+Once the buffer is full, the frames before its oldest stack_size - 1 steps have been overwritten, so the stacks of these
+steps can not be rebuilt and they are not sampled.
+"""
+
+    def __init__(self, capacity: int, stack_size: int = 4, num_streams: int = 1):
+        """
+
+@param capacity: Maximum number of transitions
+@param stack_size: Number of frames in a stacked observation
+@param num_streams: Number of environments stepped in lockstep
+"""
+        assert capacity >= num_streams > 0
+        assert stack_size > 0
+        super().__init__(
+            capacity // num_streams,
+            fields=("frame", "action", "signal", "terminal", "episode_step"),
+        )
+        self._stack_size = stack_size
+        self._num_streams = num_streams
+        self._episode_steps = numpy.zeros(num_streams, dtype=numpy.int64)
+        self._pending_successor_frame = None
+
+    @property
+    def capacity(self) -> int:
+        """
+
+@return:
+"""
+        return self._capacity * self._num_streams
+
+    @wrap_args(TransitionPoint)
+    def add_transition_point(self, transition_point: TransitionPoint) -> None:
+        """
+args will be wrapped in a TransitionPoint type tuple and collected as transition_point
+
+@param transition_point:
+@return:
+"""
+        assert self._num_streams == 1
+        self.add_transition_points(
+            TransitionPoint(*[numpy.expand_dims(f, 0) for f in transition_point])
+        )
+
+    def add_transition_points(self, transition_points: TransitionPoint) -> None:
+        """
+Adds one or more steps of all streams, each field of transition_points holds the batch along its first axis
+
+@param transition_points:
+@return:
+"""
+        state = numpy.asarray(transition_points.state)
+        assert len(state) % self._num_streams == 0
+
+        for start in range(0, len(state), self._num_streams):
+            rows = slice(start, start + self._num_streams)
+            terminal = numpy.asarray(transition_points.terminal[rows], dtype=bool)
+            terminal = terminal.reshape(self._num_streams)
+
+            self._add(
+                (
+                    state[rows, -1],
+                    transition_points.action[rows],
+                    transition_points.signal[rows],
+                    terminal,
+                    self._episode_steps,
+                )
+            )
+
+            if transition_points.successor_state is None:
+                self._pending_successor_frame = numpy.zeros_like(state[rows, -1])
+            else:
+                self._pending_successor_frame = numpy.asarray(
+                    transition_points.successor_state
+                )[rows, -1]
+
+            self._episode_steps = numpy.where(
+                terminal, 0, numpy.minimum(self._episode_steps + 1, self._stack_size)
+            )
+
+    def _gather_stacked(
+        self, time_indices: numpy.ndarray, streams: numpy.ndarray, ages: numpy.ndarray
+    ) -> TransitionPoint:
+        """
+
+@param time_indices: Indices into the time axis of the columns
+@param streams:
+@param ages: Number of steps stored before each index
+@return:
+"""
+        frames = self._columns["frame"]
+        terminal = self._columns["terminal"][time_indices, streams]
+
+        history = numpy.minimum(
+            self._columns["episode_step"][time_indices, streams], ages
+        )
+        back = numpy.minimum(
+            numpy.arange(self._stack_size - 1, -1, -1)[None], history[:, None]
+        )
+        state = frames[
+            (time_indices[:, None] - back) % self._capacity, streams[:, None]
+        ]
+
+        newest = ages == self._num_entries - 1
+        successor_frame = frames[(time_indices + 1) % self._capacity, streams]
+        successor_frame[newest] = self._pending_successor_frame[streams[newest]]
+        successor_state = numpy.concatenate(
+            (state[:, 1:], successor_frame[:, None]), axis=1
+        )
+        successor_state[terminal] = 0
+
+        return TransitionPoint(
+            state,
+            self._columns["action"][time_indices, streams],
+            successor_state,
+            self._columns["signal"][time_indices, streams],
+            terminal,
+        )
+
+    def _num_sampleable_entries(self) -> int:
+        """
+Number of the newest steps whose stacks can be rebuilt, all of them until the buffer has wrapped around
+
+@return:
+"""
+        if self._num_entries < self._capacity:
+            return self._num_entries
+        return max(self._num_entries - (self._stack_size - 1), 1)
+
+    def sample(self, num: int = None) -> TransitionPoint:
+        """Randomly sample transitions from memory, with replacement, all transitions shuffled if num is not given."""
+        if not len(self):
+            raise NoData
+
+        num_sampleable = self._num_sampleable_entries() * self._num_streams
+        if is_none_or_zero_or_negative(num):
+            flat = numpy.random.permutation(num_sampleable)
+        else:
+            flat = numpy.random.randint(0, num_sampleable, num)
+
+        ages, streams = numpy.divmod(flat, self._num_streams)
+        ages += self._num_entries - self._num_sampleable_entries()
+        oldest = (self._cursor - self._num_entries) % self._capacity
+        return self._gather_stacked((oldest + ages) % self._capacity, streams, ages)
+
+    def _snapshot_arrays(self) -> Dict[str, numpy.ndarray]:
+        """
+
+@return:
+"""
+        arrays = {"episode_steps": self._episode_steps}
+        if self._pending_successor_frame is not None:
+            arrays["pending_successor_frame"] = self._pending_successor_frame
+        return arrays
+
+    def _restore(
+        self,
+        records: Dict[str, numpy.ndarray],
+        arrays: Dict[str, numpy.ndarray],
+        num_inserted: int,
+    ) -> None:
+        """
+
+@param records:
+@param arrays:
+@param num_inserted:
+@return:
+"""
+        super()._restore(records, arrays, num_inserted)
+        if "episode_steps" in arrays:
+            self._episode_steps = arrays["episode_steps"]
+        self._pending_successor_frame = arrays.get("pending_successor_frame")
+
+    def clear(self) -> None:
+        """
+
+@return:
+"""
+        super().clear()
+        self._episode_steps[:] = 0
+        self._pending_successor_frame = None
+
+    def __len__(self) -> int:
+        """Return the number of transitions in memory."""
+        return self._num_entries * self._num_streams
+
+
+if __name__ == "__main__":
+    tb = TransitionPointFrameStackBuffer(10, stack_size=3)
+    stack = numpy.zeros(3)
+    for i in range(12):
+        successor = numpy.append(stack[1:], i + 1)
+        tb.add_transition_point(stack, i, successor, float(i), i == 6)
+        stack = numpy.full(3, i + 1) if i == 6 else successor
+    print(tb.sample(4))
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from neodroidagent.common.memory.data_structures.memory_mapped_array_buffer import (
+    MemoryMappedArrayBuffer,
+)
+from neodroidagent.common.memory.transition_point_array_buffer import (
+    TransitionPointArrayBuffer,
+)
+from neodroidagent.common.memory.transitions import TransitionPoint
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+  Buffer class for for maintaining a memory mapped columnar circular buffer of TransitionPoint's
+"""
+__all__ = ["TransitionPointMemoryMappedBuffer"]
+
+
+class TransitionPointMemoryMappedBuffer(
+    TransitionPointArrayBuffer, MemoryMappedArrayBuffer
+):
+    """
+TransitionPointArrayBuffer with its columns memory mapped from .npy files, see MemoryMappedArrayBuffer.
+
+SingleAgentEnvironmentSession maps it from the save directory of the agent and reopens it when continuing training.
+"""
+
+
+if __name__ == "__main__":
+    tb = TransitionPointMemoryMappedBuffer(10)
+    for i in range(21):
+        tb.add_transition_point(TransitionPoint(i, i, i, i, False))
+    print(tb.directory, tb.sample(9))
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from typing import Any
+from typing import Any, Sequence, Tuple
 
 import numpy
 
@@ -22,11 +22,40 @@ class TransitionPointPrioritisedBuffer(PrioritisedBuffer):
 
 """
 
+    record_type = TransitionPoint
+
     def add_transition_point(self, sample: Any, error: float = 0.0) -> None:
         super().add(sample, error)
 
+    def add_transition_points(
+        self, transition_points: TransitionPoint, errors: Sequence = None
+    ) -> None:
+        """
+Adds a batch of transition points, each field of transition_points holds the batch along its first axis
+
+@param transition_points:
+@param errors:
+@return:
+"""
+        samples = [TransitionPoint(*s) for s in zip(*transition_points)]
+        if errors is None:
+            errors = numpy.zeros(len(samples))
+        super().extend(samples, errors)
+
     def sample(self, num: int) -> Any:
-        return TransitionPoint(*zip(*super().sample(num)))
+        samples, _ = self.sample_weighted(num)
+        return samples
+
+    def sample_weighted(self, num: int) -> Tuple[TransitionPoint, numpy.ndarray]:
+        """
+Samples a batch of transition points along with their importance-sampling weights, see
+PrioritisedBuffer.sample_weighted
+
+@param num:
+@return:
+"""
+        samples, weights = super().sample_weighted(num)
+        return TransitionPoint(*zip(*samples)), weights
 
 
 if __name__ == "__main__":
@@ -42,7 +71,7 @@ if __name__ == "__main__":
 
         print(rb.sample(batch_size))
 
-        rb.update_last_batch(numpy.random.rand(capacity))
+        rb.update_last_batch(numpy.random.rand(batch_size))
 
         print(rb.sample(batch_size))
 
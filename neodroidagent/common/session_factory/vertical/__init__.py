@@ -4,6 +4,7 @@
 __author__ = "Christian Heider Nielsen"
 __doc__ = ""
 
+from .distributed import *
 from .linear import *
 from .parallel import *
 from .procedures import *
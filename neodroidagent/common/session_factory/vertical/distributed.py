@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import math
+import queue
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Type, Union
+
+import numpy
+import torch
+from draugr import sprint
+from draugr.metrics.accumulation import mean_accumulator
+from draugr.writers import MockWriter, Writer
+from torch import multiprocessing
+from torch.distributed import rpc
+from torch.distributed.rpc import RRef
+
+from neodroidagent.agents import Agent
+from neodroidagent.common.memory import Transition
+from neodroidagent.utilities import NoAgent
+from warg import super_init_pass_on_kws
+
+from .environment_session import EnvironmentSession
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+  Actor-learner training over torch.distributed.rpc, observer processes step environments with local copies of the
+  policy and stream their steps to a learner process owning the agent and its memory
+  """
+__all__ = ["DistributedSession"]
+
+LEARNER_NAME = "learner"
+OBSERVER_NAME = "observer{}"
+
+
+def _call_method(method: Callable, rref: RRef, *args, **kwargs) -> Any:
+    """
+Calls method on the object referenced by rref, on its owner
+
+@param method:
+@param rref:
+@param args:
+@param kwargs:
+@return:
+"""
+    return method(rref.local_value(), *args, **kwargs)
+
+
+def _remote_method_async(
+    method: Callable, rref: RRef, *args, timeout: float = None
+) -> torch.futures.Future:
+    """
+
+@param method:
+@param rref:
+@param args:
+@param timeout: Seconds, 0 for none, the rpc_timeout of the session if None
+@return: Future of the result of method on the object referenced by rref
+"""
+    if timeout is None:
+        timeout = rpc.constants.UNSET_RPC_TIMEOUT
+    return rpc.rpc_async(
+        rref.owner(), _call_method, args=(method, rref, *args), timeout=timeout
+    )
+
+
+def _cpu_state_dicts(agent: Agent) -> Dict[str, Dict[str, torch.Tensor]]:
+    return {
+        name: {k: v.detach().cpu() for k, v in model.state_dict().items()}
+        for name, model in agent.models.items()
+    }
+
+
+class _GymEnvironmentFactory(object):
+    """
+Picklable factory of the auto resetting gym environment of LinearSession
+"""
+
+    def __init__(self, environment_name: str):
+        self.environment_name = environment_name
+
+    def __call__(self) -> Any:
+        import gym
+        from neodroid.environments.gym_environment import NeodroidGymEnvironment
+        from trolls import NormalisedActions, VectorWrap
+
+        return VectorWrap(
+            NeodroidGymEnvironment(
+                NormalisedActions(gym.make(self.environment_name)),
+                auto_reset_on_terminal_state=True,
+            )
+        )
+
+
+def _build_agent(
+    agent: Union[Type[Agent], Agent], environment: Any, seed: int, **kwargs
+) -> Agent:
+    if agent is None:
+        raise NoAgent
+    if isinstance(agent, type):
+        agent = agent(seed=seed, **kwargs)
+    agent.build(
+        environment.observation_space,
+        environment.action_space,
+        environment.signal_space,
+        print_inferred_io_shapes=False,
+    )
+    return agent
+
+
+class _Observer(object):
+    """
+Owns an environment and a copy of the agent, whose models are overwritten by the weights broadcast by the learner
+"""
+
+    def __init__(
+        self,
+        agent_type: Type[Agent],
+        agent_kwargs: Dict[str, Any],
+        environment_factory: Callable,
+        seed: int,
+    ):
+        torch.manual_seed(seed)
+        self._environment = environment_factory()
+        self._environment.seed(seed)
+        self._agent = _build_agent(
+            agent_type, self._environment, seed, **agent_kwargs
+        )
+        self._agent.eval()
+        self._lock = threading.Lock()
+
+    def set_weights(self, state_dicts: Dict[str, Dict[str, torch.Tensor]]) -> None:
+        """
+
+@param state_dicts: Per model name of the agent
+@return:
+"""
+        with self._lock:
+            for name, state_dict in state_dicts.items():
+                self._agent.models[name].load_state_dict(state_dict)
+
+    def run(self, learner_rref: RRef, num_steps: int, steps_per_push: int) -> None:
+        """
+Steps the environment num_steps times and sends the steps to the learner steps_per_push at a time
+
+@param learner_rref:
+@param num_steps:
+@param steps_per_push:
+@return:
+"""
+        agent = self._agent
+        state = agent.extract_features(self._environment.reset())
+        steps = []
+        pushed = None
+        for step_i in range(num_steps):
+            with self._lock, torch.no_grad():
+                sample = agent.sample(state)
+            action = agent.extract_action(sample)
+
+            snapshot = self._environment.react(action)
+            successor_state = agent.extract_features(snapshot)
+            steps.append(
+                dict(
+                    state=state,
+                    signal=agent.extract_signal(snapshot),
+                    terminated=numpy.array(snapshot.terminated),
+                    sample=sample,
+                    successor_state=successor_state,
+                    transition=Transition(state, action, successor_state),
+                )
+            )
+            state = successor_state
+
+            if len(steps) == steps_per_push or step_i == num_steps - 1:
+                if pushed is not None:
+                    pushed.wait()  # At most one push in flight
+                pushed = _remote_method_async(_Learner.receive, learner_rref, steps)
+                steps = []
+        if pushed is not None:
+            pushed.wait()
+        self._environment.close()
+
+
+class _Learner(object):
+    """
+Receives the steps of all observers, called concurrently from the rpc threads of the learner process. The queue of
+steps is bounded, receive blocks while it is full so observers outpacing the learner wait for their pushes to complete
+"""
+
+    def __init__(self, max_queued_steps: int):
+        self.steps = queue.Queue(max_queued_steps)
+
+    def receive(self, steps: List[Dict[str, Any]]) -> None:
+        """
+
+@param steps:
+@return: Once all steps are queued
+"""
+        for step in steps:
+            self.steps.put(step)
+
+
+@super_init_pass_on_kws
+class DistributedSession(EnvironmentSession):
+    """
+Rank 0 is the learner, it owns the agent, remembers the steps streamed by the observers of ranks 1 to num_observers
+and updates the agent, broadcasting the weights of its models every weight_sync_interval updates. Every observer runs
+its own environment and a copy of the agent built from the same agent class and keyword arguments.
+
+On one machine calling the session spawns all ranks as local processes communicating over TCP on the loopback
+interface. Across several nodes every node calls the session with the ranks it runs and the address of the learner.
+"""
+
+    def __init__(
+        self,
+        *,
+        environment_name: str = "",
+        environment_factory: Callable = None,
+        num_observers: int = 2,
+        master_address: str = "localhost",
+        master_port: int = 29500,
+        rpc_timeout: float = 60,
+        **kwargs,
+    ):
+        """
+
+@param environment_name: Gym environment id, used when no environment_factory is given
+@param environment_factory: Picklable callable constructing the environment of an observer, it is expected to reset
+itself when terminated
+@param num_observers:
+@param master_address: Address of the learner
+@param master_port:
+@param rpc_timeout: Seconds
+@param kwargs:
+"""
+        assert num_observers > 0
+        if environment_factory is None:
+            assert environment_name != ""
+            environment_factory = _GymEnvironmentFactory(environment_name)
+        super().__init__(environments=None, **kwargs)
+        self._environment_factory = environment_factory
+        self._num_observers = num_observers
+        self._master_address = master_address
+        self._master_port = master_port
+        self._rpc_timeout = rpc_timeout
+
+    @property
+    def world_size(self) -> int:
+        """
+
+@return:
+"""
+        return self._num_observers + 1
+
+    def __call__(
+        self,
+        agent: Union[Type[Agent], Agent],
+        *,
+        ranks: List[int] = None,
+        **kwargs,
+    ) -> None:
+        """
+
+@param agent: Agent class, or agent instance on the learner rank
+@param ranks: Ranks started by this call, all of them if None
+@param kwargs: Passed to _run_rank
+@return:
+"""
+        if ranks is None:
+            ranks = list(range(self.world_size))
+        kwargs.pop("environment", None)  # Environments are constructed by the ranks
+
+        if len(ranks) == 1:
+            self._run_rank(ranks[0], agent, **kwargs)
+        else:
+            processes = []
+            context = multiprocessing.get_context("spawn")
+            for rank in ranks:
+                process = context.Process(
+                    target=self._run_rank, args=(rank, agent), kwargs=kwargs
+                )
+                process.start()
+                processes.append(process)
+            for process in processes:
+                process.join()
+
+    def _run_rank(
+        self, rank: int, agent: Union[Type[Agent], Agent], **kwargs
+    ) -> None:
+        """
+Initialises rpc as rank and runs the learner or waits as an observer until the learner shuts down
+
+@param rank:
+@param agent:
+@param kwargs:
+@return:
+"""
+        options = rpc.TensorPipeRpcBackendOptions(
+            init_method=f"tcp://{self._master_address}:{self._master_port}",
+            rpc_timeout=self._rpc_timeout,
+            num_worker_threads=rpc.constants.DEFAULT_NUM_WORKER_THREADS
+            + self._num_observers,  # A receive per observer may block a thread
+        )
+        name = LEARNER_NAME if rank == 0 else OBSERVER_NAME.format(rank)
+        rpc.init_rpc(
+            name, rank=rank, world_size=self.world_size, rpc_backend_options=options
+        )
+        try:
+            if rank == 0:
+                self._learn(agent, **kwargs)
+        finally:
+            rpc.shutdown()  # Blocks until all ranks are done
+
+    def _learn(
+        self,
+        agent: Union[Type[Agent], Agent],
+        *,
+        num_environment_steps: int = 500000,
+        batch_size: int = 128,
+        initial_observation_period: int = 1000,
+        steps_per_push: int = 32,
+        weight_sync_interval: int = 10,
+        max_update_to_data_ratio: float = 1.0,
+        max_queued_steps: int = 1000,
+        seed: int = 0,
+        train_agent: bool = True,
+        metric_writer: Writer = MockWriter(),
+        save_directory: Path = None,
+        **kwargs,
+    ) -> None:
+        """
+
+@param agent:
+@param num_environment_steps: Steps into the environment of every observer
+@param batch_size:
+@param initial_observation_period: Steps remembered before the first update
+@param steps_per_push: Steps an observer sends to the learner at once
+@param weight_sync_interval: Updates between broadcasts of the weights to the observers
+@param max_update_to_data_ratio: Maximum number of updates per step remembered
+@param max_queued_steps: Steps received but not yet remembered before the observers are held back
+@param seed:
+@param train_agent:
+@param metric_writer:
+@param save_directory: Where the models of the agent are saved when done, not saved if None
+@param kwargs: Agent keyword arguments
+@return:
+"""
+        assert weight_sync_interval > 0 and max_update_to_data_ratio > 0
+        torch.manual_seed(seed)
+        agent_type = agent if isinstance(agent, type) else type(agent)
+        probe = self._environment_factory()
+        agent = _build_agent(agent, probe, seed, **kwargs)
+        probe.close()
+
+        learner = _Learner(max_queued_steps)
+        learner_rref = RRef(learner)
+        observer_rrefs = [
+            rpc.remote(
+                OBSERVER_NAME.format(rank),
+                _Observer,
+                args=(agent_type, kwargs, self._environment_factory, seed + rank),
+            )
+            for rank in range(1, self.world_size)
+        ]
+
+        def broadcast() -> List[torch.futures.Future]:
+            state_dicts = _cpu_state_dicts(agent)
+            return [
+                _remote_method_async(_Observer.set_weights, o, state_dicts)
+                for o in observer_rrefs
+            ]
+
+        torch.futures.wait_all(broadcast())
+        runs = [
+            _remote_method_async(
+                _Observer.run,
+                o,
+                learner_rref,
+                num_environment_steps,
+                steps_per_push,
+                timeout=0,
+            )
+            for o in observer_rrefs
+        ]
+        sprint(
+            f"Learning from {len(observer_rrefs)} observers",
+            color="crimson",
+            bold=True,
+            italic=True,
+        )
+
+        running_signal = mean_accumulator()
+        broadcasts = []
+        num_steps = 0
+        num_updates = 0
+        max_steps_per_drain = max(1, math.ceil(1 / max_update_to_data_ratio))
+
+        def can_update() -> bool:
+            return (
+                train_agent
+                and num_steps > initial_observation_period
+                and len(agent.memory_buffer) > batch_size
+                and num_updates < max_update_to_data_ratio * num_steps
+            )
+
+        while True:
+            observers_done = all(run.done() for run in runs)
+            # Remembers about as many steps as one update is worth, waits only when there is nothing else to do
+            for _ in range(max_steps_per_drain):
+                try:
+                    step = learner.steps.get(
+                        block=not (can_update() or observers_done), timeout=1
+                    )
+                except queue.Empty:
+                    break
+                if train_agent:
+                    agent.remember(**step)
+                running_signal.send(numpy.mean(step["signal"]))
+                num_steps += 1
+
+            if observers_done and learner.steps.empty() and not can_update():
+                break  # The pushes of the observers have all been received
+
+            while can_update():
+                agent.update(metric_writer=metric_writer)
+                num_updates += 1
+                if num_updates % weight_sync_interval == 0:
+                    torch.futures.wait_all(broadcasts)  # At most one broadcast in flight
+                    broadcasts = broadcast()
+                    if metric_writer:
+                        metric_writer.scalar(
+                            "running_signal", next(running_signal), num_updates
+                        )
+
+        for run in runs:
+            run.wait()  # Raises exceptions of the observers
+        torch.futures.wait_all(broadcasts)
+        if save_directory:
+            agent.save(save_directory=save_directory)
+        sprint(
+            f"Learned from {num_steps} steps in {num_updates} updates",
+            color="crimson",
+            bold=True,
+            italic=True,
+        )
@@ -7,6 +7,8 @@ from neodroid.environments import Environment
 from neodroid.environments.gym_environment import NeodroidVectorGymEnvironment
 from neodroid.environments.droid_environment import VectorUnityEnvironment
 from warg import super_init_pass_on_kws
+
+from neodroidagent.common.environment_pool import SubprocessEnvironmentPool
 from .procedures import OnPolicyEpisodic, Procedure
 from .single_agent_environment_session import SingleAgentEnvironmentSession
 
@@ -25,7 +27,8 @@ class ParallelSession(SingleAgentEnvironmentSession):
         environment_name: Union[str] = "",
         num_envs=cpu_count(),
         auto_reset_on_terminal_state=False,
-        environment: Union[bool, str, Environment] = False,
+        environment: Union[bool, str, Environment, SubprocessEnvironmentPool] = False,
+        shared_memory_pool: bool = False,
         **kwargs
     ):
         """
@@ -35,16 +38,25 @@ class ParallelSession(SingleAgentEnvironmentSession):
 @param num_envs:
 @param auto_reset_on_terminal_state:
 @param environment:
+@param shared_memory_pool: Run gym environments in a SubprocessEnvironmentPool instead of a
+NeodroidVectorGymEnvironment
 @param kwargs:
 """
         assert num_envs > 0
         if isinstance(environment, str) and environment == "gym":
             assert environment_name != ""
-            environments = NeodroidVectorGymEnvironment(
-                environment_name=environment_name,
-                num_envs=num_envs,
-                auto_reset_on_terminal_state=auto_reset_on_terminal_state,
-            )
+            if shared_memory_pool:
+                environments = SubprocessEnvironmentPool(
+                    environment_name,
+                    num_envs=num_envs,
+                    auto_reset_on_terminal_state=auto_reset_on_terminal_state,
+                )
+            else:
+                environments = NeodroidVectorGymEnvironment(
+                    environment_name=environment_name,
+                    num_envs=num_envs,
+                    auto_reset_on_terminal_state=auto_reset_on_terminal_state,
+                )
         elif isinstance(environment, bool):
             if not environment:
                 assert environment_name != ""
@@ -55,7 +67,7 @@ class ParallelSession(SingleAgentEnvironmentSession):
                 auto_reset_on_terminal_state=auto_reset_on_terminal_state,
             )
         else:
-            assert isinstance(environment, Environment)
+            assert isinstance(environment, (Environment, SubprocessEnvironmentPool))
             environments = environment
 
         super().__init__(environments=environments, procedure=procedure, **kwargs)
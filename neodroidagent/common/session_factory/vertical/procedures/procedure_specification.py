@@ -6,6 +6,7 @@ from typing import List, Union
 
 from neodroid import Environment
 from neodroidagent.agents import Agent
+from neodroidagent.common.memory import MemoryMappedArrayBuffer, SnapshotMixin
 from warg import drop_unused_kws
 
 __author__ = "Christian Heider Nielsen"
@@ -25,6 +26,7 @@ class Procedure(abc.ABC):
         environment: Environment,
         on_improvement_callbacks=None,
         save_best_throughout_training: bool = True,
+        snapshot_memory_buffer: bool = True,
         train_agent: bool = True
     ):
         """
@@ -33,6 +35,8 @@ class Procedure(abc.ABC):
 @param environment:
 @param on_improvement_callbacks:
 @param save_best_throughout_training:
+@param snapshot_memory_buffer: Also snapshot the memory of the agent when saving the best model, so that resumed
+training does not start from an empty replay buffer
 """
         if on_improvement_callbacks is None:
             on_improvement_callbacks = []
@@ -42,6 +46,10 @@ class Procedure(abc.ABC):
         if save_best_throughout_training and train_agent:
             on_improvement_callbacks.append(self.agent.save)
             print('Saving best model throughout training')
+            if snapshot_memory_buffer and isinstance(
+                self.agent.memory_buffer, SnapshotMixin
+            ):
+                on_improvement_callbacks.append(self.save_memory_buffer)
         self.on_improvement_callbacks = on_improvement_callbacks
 
     @staticmethod
@@ -52,6 +60,23 @@ class Procedure(abc.ABC):
 """
         Procedure.early_stop = True
 
+    @drop_unused_kws
+    def save_memory_buffer(self, *, save_directory: Path) -> None:
+        """
+Appends the memory inserted since the last save to the snapshot next to the models, memory mapped buffers persist
+themselves and are only flushed
+
+@param save_directory:
+@return:
+"""
+        memory_buffer = self.agent.memory_buffer
+        if isinstance(memory_buffer, MemoryMappedArrayBuffer):
+            memory_buffer.flush()
+        else:
+            memory_buffer.save(
+                save_directory / memory_buffer.snapshot_directory_name
+            )
+
     def call_on_improvement_callbacks(self, *, verbose: bool = True, **kwargs):
         """
 
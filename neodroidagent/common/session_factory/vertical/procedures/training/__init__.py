@@ -7,3 +7,4 @@ from .experimental import *
 from .off_policy_batched import *
 from .off_policy_episodic import *
 from .on_policy_episodic import *
+from .on_policy_fixed_horizon import *
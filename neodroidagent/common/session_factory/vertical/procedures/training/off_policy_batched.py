@@ -62,7 +62,7 @@ class OffPolicyBatched(Procedure):
         for batch_i in tqdm(
             range(1, iterations), leave=False, disable=disable_stdout, desc="Batch #",postfix=f"Agent update #{self.agent.update_i}"
         ):
-            for _ in tqdm(
+            for step_i in tqdm(
                 range(batch_size), leave=False, disable=disable_stdout, desc="Step #",
             ):
 
@@ -82,6 +82,7 @@ class OffPolicyBatched(Procedure):
                         terminated=snapshot.terminated,
                         sample=sample,
                         successor_state=successor_state,
+                        new_episode=batch_i == 1 and step_i == 0,
                     )
 
                 state = successor_state
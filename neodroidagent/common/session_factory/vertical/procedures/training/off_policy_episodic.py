@@ -71,16 +71,15 @@ def rollout_off_policy(
 
         if train_agent:
             if use_episodic_buffer:
-                a = [
-                    TransitionPoint(*s)
-                    for s in zip(state, action, successor_state, signal, terminated)
-                ]
-                episode_buffer.extend(a)
+                episode_buffer.append(
+                    TransitionPoint(state, action, successor_state, signal, terminated)
+                )
             else:
                 agent.remember(
                     signal=signal,
                     terminated=terminated,
                     transition=Transition(state, action, successor_state),
+                    new_episode=step_i == 0,
                 )
 
         running_mean_action.send(action.mean())
@@ -93,11 +92,14 @@ def rollout_off_policy(
 
     if train_agent:
         if use_episodic_buffer:
-            t = TransitionPoint(*zip(*episode_buffer))
+            t = TransitionPoint(
+                *[numpy.concatenate(field) for field in zip(*episode_buffer)]
+            )
             agent.remember(
                 signal=t.signal,
                 terminated=t.terminal,
                 transition=Transition(t.state, t.action, t.successor_state),
+                num_episode_steps=len(episode_buffer),
             )
 
     if step_i > 0:
@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import copy
+import math
+import queue
+import threading
 from pathlib import Path
 from typing import Union
 
+import numpy
 import torch
 import torchsnooper
 from draugr.drawers import MplDrawer, MockDrawer
@@ -16,13 +21,46 @@ __author__ = "Christian Heider Nielsen"
 __all__ = ["OffPolicyStepWise"]
 __doc__ = "Collects agent experience in a step wise fashion"
 
+from neodroidagent.agents.agent import Agent
+from neodroidagent.common.memory import Transition
 from neodroidagent.common.session_factory.vertical.procedures.procedure_specification import (
     Procedure,
 )
 from warg import is_positive_and_mod_zero, is_zero_or_mod_below
 
 
+def _acting_copy(agent: Agent) -> Agent:
+    """
+Shallow copy of agent with its own copies of the models, sampling from it is unaffected by concurrent updates of agent
+
+@param agent: A TorchAgent
+@return:
+"""
+    actor = copy.copy(agent)
+    for name, model in agent.models.items():
+        setattr(actor, name, copy.deepcopy(model))
+    return actor
+
+
+def _sync_policy(agent: Agent, actor: Agent) -> None:
+    """
+Copies the parameters of the models of agent into those of actor
+
+@param agent:
+@param actor: As returned by _acting_copy(agent)
+@return:
+"""
+    for name, model in agent.models.items():
+        getattr(actor, name).load_state_dict(model.state_dict())
+
+
 class OffPolicyStepWise(Procedure):
+    """
+Interleaves environment steps and agent updates on one thread, or with overlap_actor_learner steps the environment on
+a worker thread against a periodically synced copy of the policy while the agent updates continuously, see
+_overlapped_call
+"""
+
     def __call__(
         self,
         *,
@@ -37,6 +75,10 @@ class OffPolicyStepWise(Procedure):
         train_agent: bool = True,
         metric_writer: Writer = MockWriter(),
         rollout_drawer: MplDrawer = MockDrawer(),
+        overlap_actor_learner: bool = False,
+        policy_sync_interval: int = 10,
+        max_update_to_data_ratio: float = 1.0,
+        max_queued_steps: int = 1000,
         **kwargs
     ) -> None:
         """
@@ -46,8 +88,27 @@ class OffPolicyStepWise(Procedure):
 :param stat_frequency:
 :param render_frequency:
 :param disable_stdout:
+:param overlap_actor_learner: Step the environment and update the agent concurrently
+:param policy_sync_interval: Agent updates between syncs of the acting policy, when overlapping
+:param max_update_to_data_ratio: Maximum number of agent updates per environment step, when overlapping
+:param max_queued_steps: Steps the actor may run ahead of the learner, when overlapping
 :return:
 """
+        if overlap_actor_learner:
+            return self._overlapped_call(
+                num_environment_steps=num_environment_steps,
+                batch_size=batch_size,
+                render_frequency=render_frequency,
+                initial_observation_period=initial_observation_period,
+                render_duration=render_duration,
+                train_agent=train_agent,
+                metric_writer=metric_writer,
+                rollout_drawer=rollout_drawer,
+                policy_sync_interval=policy_sync_interval,
+                max_update_to_data_ratio=max_update_to_data_ratio,
+                max_queued_steps=max_queued_steps,
+                **kwargs
+            )
 
         state = self.agent.extract_features(self.environment.reset())
 
@@ -77,6 +138,7 @@ class OffPolicyStepWise(Procedure):
                     terminated=terminated,
                     sample=sample,
                     successor_state=successor_state,
+                    new_episode=step_i == 0,
                 )
 
             state = successor_state
@@ -132,5 +194,167 @@ class OffPolicyStepWise(Procedure):
                 break
 
 
+    def _overlapped_call(
+        self,
+        *,
+        num_environment_steps: int,
+        batch_size: int,
+        render_frequency: int,
+        initial_observation_period: int,
+        render_duration: int,
+        train_agent: bool,
+        metric_writer: Writer,
+        rollout_drawer: MplDrawer,
+        policy_sync_interval: int,
+        max_update_to_data_ratio: float,
+        max_queued_steps: int,
+        **kwargs
+    ) -> None:
+        """
+The actor thread samples from a copy of the policy, steps the environment and queues the steps, at most
+max_queued_steps ahead. This thread alternates between remembering a few queued steps, about as many as one update is
+budgeted for, and updating the agent for as long as that keeps the number of updates at or below
+max_update_to_data_ratio times the number of steps remembered, it only waits for steps when no update is budgeted. The
+budget left when the actor finishes is spent before returning. The copy of the policy is synced every
+policy_sync_interval updates.
+
+Only this thread touches the memory and the models of the agent, only the actor thread touches the environment.
+
+:return:
+"""
+        assert policy_sync_interval > 0 and max_update_to_data_ratio > 0
+        actor = _acting_copy(self.agent)
+        policy_lock = threading.Lock()
+        steps = queue.Queue(max_queued_steps)
+        stop = threading.Event()
+        actor_exceptions = []
+
+        def act() -> None:
+            try:
+                state = actor.extract_features(self.environment.reset())
+                for step_i in range(num_environment_steps):
+                    if stop.is_set():
+                        break
+                    with policy_lock, torch.no_grad():
+                        sample = actor.sample(state)
+                    action = actor.extract_action(sample)
+
+                    snapshot = self.environment.react(action)
+                    successor_state = actor.extract_features(snapshot)
+                    steps.put(
+                        dict(
+                            state=state,
+                            signal=actor.extract_signal(snapshot),
+                            terminated=numpy.array(
+                                snapshot.terminated
+                            ),  # Snapshots may be views overwritten by later steps
+                            sample=sample,
+                            successor_state=successor_state,
+                            transition=Transition(state, action, successor_state),
+                            action=action,
+                            new_episode=step_i == 0,
+                        )
+                    )
+                    state = successor_state
+
+                    if (
+                        is_zero_or_mod_below(render_frequency, render_duration, step_i)
+                        and render_frequency != 0
+                    ):
+                        self.environment.render()
+                        if rollout_drawer:
+                            rollout_drawer.draw(action)
+            except Exception as e:
+                actor_exceptions.append(e)
+            finally:
+                steps.put(None)
+
+        actor_thread = threading.Thread(target=act, daemon=True)
+        actor_thread.start()
+
+        running_signal = mean_accumulator()
+        best_running_signal = None
+        running_mean_action = mean_accumulator()
+        signal_since_last_termination = 0
+        duration_since_last_termination = 0
+        num_steps = 0
+        num_updates = 0
+        actor_done = False
+        max_steps_per_drain = max(1, math.ceil(1 / max_update_to_data_ratio))
+
+        def can_update() -> bool:
+            return (
+                train_agent
+                and num_steps > initial_observation_period
+                and len(self.agent.memory_buffer) > batch_size
+                and num_updates < max_update_to_data_ratio * num_steps
+            )
+
+        with tqdm(total=num_environment_steps, desc="Step #", leave=False) as progress:
+            while not self.early_stop:
+                for _ in range(max_steps_per_drain):
+                    if actor_done:
+                        break
+                    try:
+                        step = steps.get(block=not can_update())
+                    except queue.Empty:
+                        break
+                    if step is None:
+                        actor_done = True
+                        break
+
+                    action = step.pop("action")
+                    if train_agent:
+                        self.agent.remember(**step)
+                    num_steps += 1
+                    progress.update()
+
+                    duration_since_last_termination += 1
+                    mean_signal = step["signal"].mean().item()
+                    signal_since_last_termination += mean_signal
+                    running_mean_action.send(action.mean())
+                    running_signal.send(mean_signal)
+
+                    if step["terminated"].any():
+                        if metric_writer:
+                            metric_writer.scalar(
+                                "duration_since_last_termination",
+                                duration_since_last_termination,
+                            )
+                            metric_writer.scalar(
+                                "signal_since_last_termination",
+                                signal_since_last_termination,
+                            )
+                            metric_writer.scalar(
+                                "running_mean_action", next(running_mean_action)
+                            )
+                            metric_writer.scalar("running_signal", next(running_signal))
+                        signal_since_last_termination = 0
+                        duration_since_last_termination = 0
+
+                if actor_done and not can_update():
+                    break
+
+                while can_update() and not self.early_stop:
+                    loss = self.agent.update(metric_writer=metric_writer)
+                    num_updates += 1
+                    if num_updates % policy_sync_interval == 0:
+                        with policy_lock:
+                            _sync_policy(self.agent, actor)
+
+                    sig = next(running_signal)
+                    if not best_running_signal or sig > best_running_signal:
+                        best_running_signal = sig
+                        self.call_on_improvement_callbacks(
+                            loss=loss, signal=sig, **kwargs
+                        )
+
+        stop.set()
+        while not actor_done:  # Unblocks the actor if it waits on a full queue
+            actor_done = steps.get() is None
+        actor_thread.join()
+        if actor_exceptions:
+            raise actor_exceptions[0]
+
 if __name__ == "__main__":
     sw = OffPolicyStepWise()
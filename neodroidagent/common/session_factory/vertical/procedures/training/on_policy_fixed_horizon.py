@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from typing import Any, Tuple
+
+import numpy
+from draugr.drawers import MockDrawer, MplDrawer
+from draugr.metrics.accumulation import mean_accumulator
+from draugr.writers import MockWriter, Writer
+from neodroid.environments.environment import Environment
+from neodroid.utilities import to_one_hot
+from tqdm import tqdm
+from warg import drop_unused_kws, is_positive_and_mod_zero, passes_kws_to
+
+from neodroidagent.agents.agent import Agent
+from neodroidagent.common.session_factory.vertical.procedures.procedure_specification import (
+    Procedure,
+)
+
+__author__ = "Christian Heider Nielsen"
+__all__ = ["rollout_fixed_horizon", "OnPolicyFixedHorizon"]
+__doc__ = r"""
+  Collects a fixed number of steps from every environment of an auto resetting vector environment per agent update,
+  the synchronous collection of A2C and PPO
+  """
+
+
+@drop_unused_kws
+def rollout_fixed_horizon(
+    agent: Agent,
+    state: Any,
+    env: Environment,
+    *,
+    horizon: int = 2048,
+    episode_signal: numpy.ndarray = None,
+    render_environment: bool = False,
+    metric_writer: Writer = MockWriter(),
+    rollout_drawer: MplDrawer = MockDrawer(),
+    train_agent: bool = True,
+    disable_stdout: bool = False,
+) -> Tuple[Any, numpy.ndarray, list]:
+    """Steps all environments horizon times and then updates the agent. Environments are expected to reset themselves
+when terminated, the per environment terminal flags are remembered as masks, so episodes ending within the horizon do
+not stall the other environments.
+
+:param agent:
+:param state: Features of the current observation of every environment
+:param env: Environment constructed with auto_reset_on_terminal_state=True
+:param horizon: Steps into every environment before updating
+:param episode_signal: Signal accumulated per environment in the unfinished episodes, carried between rollouts
+:param render_environment:
+:param metric_writer:
+:param rollout_drawer:
+:param train_agent: Whether the agent should use the rollout to update its model
+:param disable_stdout:
+:return:
+-state - features of the observation the next rollout starts from
+-episode_signal - signal accumulated in the unfinished episodes
+-episode_returns - returns of the episodes that terminated within the rollout
+"""
+    running_mean_action = mean_accumulator()
+    episode_returns = []
+
+    for step_i in tqdm(
+        range(horizon),
+        "Rollout",
+        unit="th step",
+        leave=False,
+        disable=disable_stdout,
+        postfix=f"Agent update #{agent.update_i}",
+    ):
+        sample = agent.sample(state)
+        action = agent.extract_action(sample)
+
+        snapshot = env.react(action)
+
+        successor_state = agent.extract_features(snapshot)
+        terminated = numpy.asarray(snapshot.terminated).reshape(-1)
+        signal = agent.extract_signal(snapshot)
+
+        if train_agent:
+            agent.remember(
+                state=state,
+                signal=signal,
+                terminated=terminated,
+                sample=sample,
+                successor_state=successor_state,
+            )
+
+        state = successor_state
+
+        signal = numpy.asarray(signal).reshape(-1)
+        if episode_signal is None:
+            episode_signal = numpy.zeros_like(signal, dtype=numpy.float64)
+        episode_signal += signal
+        if terminated.any():
+            episode_returns.extend(episode_signal[terminated])
+            episode_signal[terminated] = 0
+
+        running_mean_action.send(action.mean())
+
+        if render_environment:
+            env.render()
+            if rollout_drawer:
+                if env.action_space.is_discrete:
+                    action = to_one_hot(agent.output_shape, action)
+                rollout_drawer.draw(action)
+
+    if train_agent:
+        agent.update(metric_writer=metric_writer)
+
+    if metric_writer:
+        metric_writer.scalar("running_mean_action", next(running_mean_action))
+        if episode_returns:
+            metric_writer.scalar("signal", numpy.mean(episode_returns))
+            metric_writer.scalar("episodes_terminated", len(episode_returns))
+
+    return state, episode_signal, episode_returns
+
+
+class OnPolicyFixedHorizon(Procedure):
+    """
+Keeps every environment busy, as opposed to OnPolicyEpisodic which waits for the slowest environment to terminate.
+Requires a session with auto_reset_on_terminal_state=True.
+"""
+
+    @passes_kws_to(rollout_fixed_horizon)
+    def __call__(
+        self,
+        *,
+        iterations: int = 1000,
+        render_frequency: int = 100,
+        stat_frequency: int = 10,
+        disable_stdout: bool = False,
+        metric_writer: Writer = MockWriter(),
+        **kwargs,
+    ):
+        r"""
+:param disable_stdout: Whether to disable stdout statements or not
+:type disable_stdout: bool
+:param iterations: How many rollouts of horizon steps, and agent updates, to train for
+:type iterations: int
+:param render_frequency: How often to render environment
+:type render_frequency: int
+:param stat_frequency: How often to write statistics
+:type stat_frequency: int
+:return:
+"""
+        state = self.agent.extract_features(self.environment.reset())
+        episode_signal = None
+        best_mean_return = None
+
+        for rollout_i in tqdm(range(1, iterations), desc="Rollout #", leave=False):
+            kwargs.update(
+                render_environment=is_positive_and_mod_zero(render_frequency, rollout_i)
+            )
+            state, episode_signal, episode_returns = rollout_fixed_horizon(
+                self.agent,
+                state,
+                self.environment,
+                episode_signal=episode_signal,
+                metric_writer=is_positive_and_mod_zero(
+                    stat_frequency, rollout_i, ret=metric_writer
+                ),
+                disable_stdout=disable_stdout,
+                **kwargs,
+            )
+
+            if episode_returns:
+                mean_return = numpy.mean(episode_returns)
+                if best_mean_return is None or mean_return > best_mean_return:
+                    best_mean_return = mean_return
+                    self.call_on_improvement_callbacks(**kwargs)
+
+            if self.early_stop:
+                break
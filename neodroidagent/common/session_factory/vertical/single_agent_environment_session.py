@@ -13,6 +13,7 @@ from draugr.drawers import DiscreteScrollPlot, SeriesScrollPlot
 from draugr.torch_utilities import TensorBoardPytorchWriter, torch_seed
 from neodroidagent import PROJECT_APP_PATH
 from neodroidagent.agents import Agent
+from neodroidagent.common.memory import MemoryMappedArrayBuffer, SnapshotMixin
 from neodroidagent.utilities import NoAgent
 from warg import GDKC, passes_kws_to
 from warg.context_wrapper import ContextWrapper
@@ -160,6 +161,27 @@ Start a session, builds Agent and starts/connect environment(s), and runs Proced
                     italic=True,
                     )
 
+            if isinstance(agent.memory_buffer, MemoryMappedArrayBuffer):
+              if agent.memory_buffer.open(
+                  save_directory / "replay_buffer", resume=continue_training
+                  ):
+                sprint(
+                    f"Reopened replay buffer with {len(agent.memory_buffer)} entries",
+                    color="crimson",
+                    bold=True,
+                    italic=True,
+                    )
+            elif continue_training and isinstance(agent.memory_buffer, SnapshotMixin):
+              if agent.memory_buffer.load(
+                  save_directory / agent.memory_buffer.snapshot_directory_name
+                  ):
+                sprint(
+                    f"Restored replay buffer with {len(agent.memory_buffer)} entries",
+                    color="crimson",
+                    bold=True,
+                    italic=True,
+                    )
+
             if not train_agent:
               agent.eval()
             else:
@@ -200,6 +222,9 @@ Start a session, builds Agent and starts/connect environment(s), and runs Proced
             if save_ending_model:
               agent.save(**kwargs)
 
+            if isinstance(agent.memory_buffer, MemoryMappedArrayBuffer):
+              agent.memory_buffer.flush()
+
             try:
               self._environment.close()
             except BrokenPipeError:
@@ -8,6 +8,9 @@ from neodroidagent.common import (
     CategoricalActorCriticMLP,
     ParallelSession,
 )
+from neodroidagent.common.session_factory.vertical.procedures.training.on_policy_fixed_horizon import (
+    OnPolicyFixedHorizon,
+)
 from neodroidagent.configs.test_reference.base_continous_test_config import *
 
 __author__ = "Christian Heider Nielsen"
@@ -39,6 +42,7 @@ DISCRETE_ARCH_SPEC: GDKC = GDKC(
     constructor=CategoricalActorCriticMLP, hidden_layers=128
 )
 # GRADIENT_NORM_CLIPPING = TogglableLowHigh(True, 0, 0.1)
+HORIZON = 2048  # Steps into every environment per update, see OnPolicyFixedHorizon
 
 ppo_config = globals()
 
@@ -73,7 +77,14 @@ def ppo_run(
     session_factory(
         ProximalPolicyOptimizationAgent,
         config,
-        session=ParallelSession,
+        session=GDKC(
+            ParallelSession,
+            procedure=OnPolicyFixedHorizon,
+            environment_name=ENVIRONMENT_NAME,
+            auto_reset_on_terminal_state=True,
+            environment=environment_type,
+            **kwargs
+        ),
         environment=environment_type,
         skip_confirmation=skip_confirmation,**kwargs
     )
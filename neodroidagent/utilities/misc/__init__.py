@@ -11,3 +11,4 @@ from .target_updates import *
 from .training_resume import *
 from .environment_model import *
 from .tanh_normal import *
+from .distribution_parameters import *
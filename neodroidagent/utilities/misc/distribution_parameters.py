@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from typing import Dict, Optional, Sequence, Tuple, Type
+
+import torch
+from torch.distributions import (
+    Categorical,
+    Distribution,
+    MultivariateNormal,
+    Normal,
+)
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+  Stores distributions by their parameter tensors, so that the distributions of a rollout can be rebuilt as a single
+  batched distribution
+  """
+
+__all__ = [
+    "distribution_parameters",
+    "distribution_parameter_names",
+    "stack_distributions",
+]
+
+DISTRIBUTION_PARAMETER_NAMES = {
+    Categorical: ("logits",),
+    Normal: ("loc", "scale"),
+    MultivariateNormal: ("loc", "scale_tril"),
+}
+
+
+def distribution_parameter_names(
+    distribution_type: Type[Distribution],
+) -> Tuple[str, ...]:
+    """
+
+@param distribution_type:
+@return: The constructor argument names of the parameters stored for distribution_type
+"""
+    names = DISTRIBUTION_PARAMETER_NAMES.get(distribution_type)
+    if names is None:
+        raise NotImplementedError(
+            f"{distribution_type} is not one of {list(DISTRIBUTION_PARAMETER_NAMES)}"
+        )
+    return names
+
+
+def distribution_parameters(
+    distribution: Optional[Distribution],
+) -> Optional[Dict[str, torch.Tensor]]:
+    """
+
+@param distribution:
+@return: The tensors parameterising distribution, keyed by the constructor argument names
+"""
+    if distribution is None:
+        return None
+    return {
+        name: getattr(distribution, name)
+        for name in distribution_parameter_names(type(distribution))
+    }
+
+
+def stack_distributions(
+    distribution_type: Type[Distribution],
+    parameters: Sequence[Optional[Dict[str, torch.Tensor]]],
+    dim: int = 0,
+) -> Optional[Distribution]:
+    """
+Rebuilds the distributions described by parameters as one distribution, batched along dim
+
+@param distribution_type:
+@param parameters: As returned by distribution_parameters
+@param dim:
+@return:
+"""
+    if distribution_type is None or parameters[0] is None:
+        return None
+    return distribution_type(
+        **{
+            name: torch.stack([p[name] for p in parameters], dim)
+            for name in parameters[0]
+        },
+        validate_args=False,
+    )
+
+
+if __name__ == "__main__":
+    dists = [Categorical(logits=torch.randn(3, 4)) for _ in range(5)]
+    stacked = stack_distributions(
+        Categorical, [distribution_parameters(d) for d in dists]
+    )
+    actions = torch.stack([d.sample() for d in dists])
+    print(
+        stacked.log_prob(actions)
+        - torch.stack([d.log_prob(a) for d, a in zip(dists, actions)])
+    )
@@ -7,8 +7,6 @@ __doc__ = r"""
            Created on 27/02/2020
            """
 
-from collections import defaultdict
-
 import numpy
 
 __all__ = ["EnvModel"]
@@ -18,7 +16,9 @@ class EnvModel(object):
     """
   A simple tabular environment model that maintains the counts of each
   reward-outcome pair given the state and action that preceded them. The
-  model can be queried with
+  predecessors of every outcome state are indexed as the counts are
+  updated, so looking them up does not scan the model. The model can be
+  queried with
 
   >>> M = EnvModel()
   >>> M[(state, action, reward, next_state)] += 1
@@ -32,39 +32,67 @@ class EnvModel(object):
 
     def __init__(self):
         super(EnvModel, self).__init__()
-        self._model = defaultdict(lambda: defaultdict(lambda: 0))
+        # (s, a) -> {(r, s_): column of the outcome in the count array of (s, a)}
+        self._columns = {}
+        self._counts = {}
+        self._totals = {}
+        # s_ -> {(s, a): number of (r, s_) outcomes of (s, a) with a nonzero count}
+        self._predecessors = {}
+        self._outcome_probs = {}
 
     def __setitem__(self, key, value):
         s, a, r, s_ = key
-        self._model[(s, a)][(r, s_)] = value
+        sa, outcome = (s, a), (r, s_)
+        columns = self._columns.setdefault(sa, {})
+        column = columns.get(outcome)
+        if column is None:
+            column = columns[outcome] = len(columns)
+            self._counts[sa] = numpy.append(self._counts.get(sa, []), 0.0)
+            self._totals.setdefault(sa, 0.0)
+
+        counts = self._counts[sa]
+        previous = counts[column]
+        counts[column] = value
+        self._totals[sa] += value - previous
+        self._outcome_probs.pop(sa, None)
+
+        predecessors = self._predecessors.setdefault(s_, {})
+        if previous == 0 and value != 0:
+            predecessors[sa] = predecessors.get(sa, 0) + 1
+        elif previous != 0 and value == 0:
+            predecessors[sa] -= 1
+            if predecessors[sa] == 0:
+                del predecessors[sa]
 
     def __getitem__(self, key):
         s, a, r, s_ = key
-        return self._model[(s, a)][(r, s_)]
+        column = self._columns.get((s, a), {}).get((r, s_))
+        if column is None:
+            return 0
+        return self._counts[(s, a)][column]
 
     def __contains__(self, key):
         s, a, r, s_ = key
-        p1 = (s, a) in self.state_action_pairs()
-        p2 = (r, s_) in self.reward_outcome_pairs()
-        return p1 and p2
+        return (r, s_) in self._columns.get((s, a), {})
 
     def state_action_pairs(self):
         """
 Return all (state, action) pairs in the environment model
 """
-        return list(self._model.keys())
+        return list(self._columns.keys())
 
     def reward_outcome_pairs(self, s, a):
         """
 Return all (reward, next_state) pairs associated with taking action `a`
 in state `s`.
 """
-        return list(self._model[(s, a)].keys())
+        return list(self._columns.get((s, a), {}).keys())
 
     def outcome_probs(self, s, a):
         """
 Return the probability under the environment model of each outcome
-state after taking action `a` in state `s`.
+state after taking action `a` in state `s`. The probabilities are cached
+until the counts of (s, a) change.
 
 Parameters
 ----------
@@ -79,16 +107,25 @@ outcome_probs : list of (state, prob) tuples
 A list of each possible outcome and its associated probability
 under the model.
 """
-        items = list(self._model[(s, a)].items())
-        total_count = numpy.sum([c for (_, c) in items])
-        outcome_probs = [c / total_count for (_, c) in items]
-        outcomes = [p for (p, _) in items]
-        return list(zip(outcomes, outcome_probs))
+        sa = (s, a)
+        outcome_probs = self._outcome_probs.get(sa)
+        if outcome_probs is None:
+            outcome_probs = []
+            if self._totals.get(sa):
+                probs = self._counts[sa] / self._totals[sa]
+                outcome_probs = [
+                    (outcome, probs[column])
+                    for outcome, column in self._columns[sa].items()
+                    if probs[column] != 0
+                ]
+            self._outcome_probs[sa] = outcome_probs
+        return outcome_probs
 
     def state_action_pairs_leading_to_outcome(self, outcome):
         """
 Return all (state, action) pairs that have a nonzero probability of
-producing `outcome` under the current model.
+producing `outcome` under the current model, read from an index
+maintained on insert.
 
 Parameters
 ----------
@@ -101,9 +138,4 @@ pairs : list of (state, action) tuples
 A list of all (state, action) pairs with a nonzero probability of
 producing `outcome` under the model.
 """
-        pairs = []
-        for sa in self.state_action_pairs():
-            outcomes = [o for (r, o) in self.reward_outcome_pairs(*sa)]
-            if outcome in outcomes:
-                pairs.append(sa)
-        return pairs
+        return list(self._predecessors.get(outcome, {}).keys())
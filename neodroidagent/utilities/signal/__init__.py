@@ -6,6 +6,7 @@ __doc__ = ""
 
 from .advantage_estimation import *
 from .discounting import *
+from .linear_recurrence import *
 from .numpy_discounting import *
 from .experimental import *
 from .objective_regressor import *
@@ -5,6 +5,7 @@ from typing import Union
 import numpy
 
 from draugr.torch_utilities import to_tensor
+from neodroidagent.utilities.signal.linear_recurrence import reverse_discount_torch
 
 __author__ = "Christian Heider Nielsen"
 
@@ -44,20 +45,16 @@ expectations can be adjust to make actions more likely.
 @param divide_by_zero_safety:
 @param normalise:
 """
-    horizon_length, num_workers, *_ = signal.size()
-
     advantages_out = torch.zeros_like(signal, device=device)
-    adv = torch.zeros(num_workers, device=device)
-
-    for t in reversed(range(horizon_length - 1)):
-        delta = (
-            signal[t]
-            + value_estimate[t + 1] * discount_factor * non_terminal[t]
-            - value_estimate[t]
-        )
-        adv = adv * discount_factor * tau * non_terminal[t] + delta
 
-        advantages_out[t] = adv
+    delta = (
+        signal[:-1]
+        + value_estimate[1:] * discount_factor * non_terminal[:-1]
+        - value_estimate[:-1]
+    )
+    advantages_out[:-1] = reverse_discount_torch(
+        delta, discount_factor * tau, non_terminal[:-1]
+    )
 
     if normalise:
         advantages_out = (advantages_out - advantages_out.mean()) / (
@@ -95,18 +92,10 @@ Computes discounted return and advantage
         f"{signal.shape}, {non_terminal.shape}, " f"{values.shape}"
     )
 
-    ret = []
-    gae = 0
-    for step_i in reversed(range(len_signal)):
-        delta = (
-            signal[step_i]
-            + discount_factor * values[step_i + 1] * non_terminal[step_i]
-            - values[step_i]
-        )
-        gae = delta + discount_factor * gae_lambda * non_terminal[step_i] * gae
-        ret.insert(0, gae + values[step_i])
+    delta = signal + discount_factor * values[1:] * non_terminal - values[:-1]
+    gae = reverse_discount_torch(delta, discount_factor * gae_lambda, non_terminal)
 
-    ret = to_tensor(ret, device=device)
+    ret = to_tensor(gae + values[:-1], device=device)
     advantage = ret - values[:-1]
 
     if normalise_adv:
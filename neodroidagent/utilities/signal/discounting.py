@@ -17,6 +17,7 @@ from scipy.signal import lfilter
 __all__ = ["discount_rollout_signal_torch"]
 
 from draugr.torch_utilities import to_tensor, global_torch_device
+from neodroidagent.utilities.signal.linear_recurrence import reverse_discount_torch
 
 
 # @jit(nopython=True, nogil=True)
@@ -58,15 +59,12 @@ non_terminal if supplied lets you define a mask for masking terminal state signa
 @return:
 """
 
-    discounted = torch.zeros_like(signal, device=device)
-    R = torch.zeros(signal.shape[-1], device=device)
-    NT = torch.ones_like(signal, device=device)
     if non_terminal is not None:
-        NT = to_tensor(non_terminal, device=device)
+        non_terminal = to_tensor(non_terminal, device=device)
 
-    for i in reversed(range(signal.shape[0])):
-        R = signal[i] + discounting_factor * R * NT[i]
-        discounted[i] = R
+    discounted = reverse_discount_torch(
+        signal.to(device), discounting_factor, non_terminal
+    )
 
     if batch_normalised:
         # WARNING! Sometimes causes NANs!
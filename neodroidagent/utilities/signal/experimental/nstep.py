@@ -4,44 +4,70 @@
 __author__ = "Christian Heider Nielsen"
 __doc__ = ""
 
+from typing import Union
+
 import numpy
+import torch
 
 from neodroidagent.utilities.signal.experimental.discounting import valued_discount
+from neodroidagent.utilities.signal.linear_recurrence import reverse_discount_torch
 
 __all__ = ["discounted_nstep", "discounted_nstep_adv"]
 
 
 def discounted_nstep(
-    signals: numpy.ndarray,
-    values: numpy.ndarray,
-    terminals: numpy.ndarray,
+    signals: Union[numpy.ndarray, torch.Tensor],
+    values: Union[numpy.ndarray, torch.Tensor],
+    terminals: Union[numpy.ndarray, torch.Tensor],
     discount_factor,
     n,
-) -> numpy.ndarray:
+) -> Union[numpy.ndarray, torch.Tensor]:
     r"""
 Implementation of n-step reward given by the equation:
 
 .. math:: G_{t:t+n} = R_{t+1} + \gamma R_{t+2} + \cdots + \gamma^{n-1} R_{t+n} + \gamma^n V_{t+n-1}(S_{t+n})
 
+All windows are discounted at once, every step of the window is applied to all start indices through strided views of
+the time axis, so the work in Python is O(n) instead of O(T * n). Windows stop at terminals and at the end of the
+signal, where they bootstrap from the last value.
+
+Works on numpy arrays and torch tensors, time is the last axis, signals and terminals of shape (..., T) and values
+of shape (..., T + 1).
 
 :param discount_factor: discount value. Should be between `(0, 1]`
 :param n: (optional) number of steps to compute reward over. If `None` then calculates it till
 the end of episode
 """
+    horizon = signals.shape[-1]
+    non_terminals = 1.0 - terminals
 
     if n is None:
-        return valued_discount(signals, values[:, -1], terminals, discount_factor)
-
-    discounted = numpy.zeros_like(signals)
-
-    for start in range(signals.shape[1]):
-        end = min(start + n, signals.shape[1])
-        discounted[:, start] = valued_discount(
-            signals[:, start:end],
-            values[:, end],
-            terminals[:, start:end],
-            discount_factor,
-        )[:, 0]
+        if torch.is_tensor(signals):
+            bootstrapped = signals.clone()
+            bootstrapped[..., -1] += (
+                discount_factor * values[..., -1] * non_terminals[..., -1]
+            )
+            return reverse_discount_torch(
+                bootstrapped.movedim(-1, 0),
+                discount_factor,
+                non_terminals.movedim(-1, 0),
+            ).movedim(0, -1)
+        return valued_discount(signals, values[..., -1], terminals, discount_factor)
+
+    ends = numpy.minimum(numpy.arange(horizon) + n, horizon)
+    if torch.is_tensor(values):
+        discounted = values[..., torch.as_tensor(ends, device=values.device)].to(
+            signals.dtype
+        )
+    else:
+        discounted = values[..., ends].astype(signals.dtype)
+
+    for k in reversed(range(min(n, horizon))):  # Window step k of every start index t < T - k
+        discounted[..., : horizon - k] = (
+            signals[..., k:]
+            + discount_factor * discounted[..., : horizon - k] * non_terminals[..., k:]
+        )
+
     return discounted
 
 
@@ -62,5 +88,5 @@ t+n-1}(S_{t+n})
 """
     return (
         discounted_nstep(signals, values, terminals, discount_factor, n)
-        - values[:, :-1]
+        - values[..., :-1]
     )
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from typing import Union
+
+import numpy
+import torch
+from scipy.signal import lfilter
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+  Discounting along the time axis as the reverse linear recurrence
+
+    y[t] = x[t] + discount * non_terminal[t] * y[t + 1],  y[T] = 0
+
+  over signals of shape (T, ...), eg. (T, num_envs, 1), without stepping through time in Python
+  """
+__all__ = ["reverse_discount_numpy", "reverse_discount_torch"]
+
+
+def reverse_discount_numpy(
+    signal: numpy.ndarray,
+    discount: float,
+    non_terminal: numpy.ndarray = None,
+) -> numpy.ndarray:
+    """
+Without non_terminal the recurrence is time-invariant and is solved by scipy's lfilter, masked recurrences are solved by
+the scan of reverse_discount_torch on tensors sharing the memory of the arrays
+
+@param signal: shape (T, ...)
+@param discount:
+@param non_terminal: broadcastable to signal, 0 where an episode ended
+@return: shape of signal
+"""
+    signal = numpy.asarray(signal)
+    signal = signal.astype(numpy.result_type(signal, numpy.float32), copy=False)
+    if non_terminal is None:
+        return numpy.flip(
+            lfilter([1], [1, -discount], numpy.flip(signal, 0), axis=0), 0
+        ).astype(signal.dtype)
+
+    return reverse_discount_torch(
+        torch.from_numpy(numpy.ascontiguousarray(signal)),
+        discount,
+        torch.from_numpy(numpy.ascontiguousarray(non_terminal)),
+    ).numpy()
+
+
+def _reverse_scan(x: torch.Tensor, coefficients: torch.Tensor) -> torch.Tensor:
+    """
+Solves y[t] = x[t] + coefficients[t] * y[t + 1] along the first axis by recursive doubling, after the pass with
+offset k every y[t] holds the sum over the steps t to t + 2k - 1 and coefficients[t] the product of their
+coefficients, so ceil(log2(T)) vectorised passes replace T sequential steps. Terminals are zero coefficients, no
+division is involved.
+
+@param x:
+@param coefficients:
+@return:
+"""
+    y = x.clone()
+    coefficients = coefficients.clone()
+    offset = 1
+    while offset < y.shape[0]:
+        y[:-offset] += coefficients[:-offset] * y[offset:]
+        coefficients[:-offset] *= coefficients[offset:].clone()
+        offset *= 2
+    return y
+
+
+def reverse_discount_torch(
+    signal: torch.Tensor,
+    discount: Union[float, torch.Tensor],
+    non_terminal: torch.Tensor = None,
+) -> torch.Tensor:
+    """
+
+@param signal: shape (T, ...)
+@param discount:
+@param non_terminal: broadcastable to signal, 0 where an episode ended
+@return: shape of signal
+"""
+    coefficients = torch.as_tensor(discount, dtype=signal.dtype, device=signal.device)
+    if non_terminal is not None:
+        coefficients = coefficients * non_terminal.to(signal.device, signal.dtype)
+
+    return _reverse_scan(signal, coefficients.expand_as(signal))
+
+
+if __name__ == "__main__":
+    s = numpy.ones((10, 2, 1))
+    nt = numpy.ones((10, 2, 1))
+    nt[3, 0] = 0
+    print(reverse_discount_numpy(s, 0.5)[:, :, 0].T)
+    print(reverse_discount_numpy(s, 0.5, nt)[:, :, 0].T)
@@ -12,6 +12,8 @@ __doc__ = r"""
 
 from scipy.signal import lfilter
 
+from neodroidagent.utilities.signal.linear_recurrence import reverse_discount_numpy
+
 __all__ = ["discount_signal", "discount_signal_numpy"]
 
 
@@ -23,12 +25,7 @@ def discount_signal(signal: list, discounting_factor: float) -> list:
 @param discounting_factor:
 @return:
 """
-    signals = []
-    r_ = numpy.zeros_like(signal[0])
-    for r in signal[::-1]:
-        r_ = r + discounting_factor * r_
-        signals.insert(0, r_)
-    return signals
+    return list(reverse_discount_numpy(numpy.asarray(signal), discounting_factor))
 
 
 # @jit(nopython=True, nogil=True)
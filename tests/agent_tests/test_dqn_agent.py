@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+import numpy
+import pytest
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+"""
+
+
+@pytest.mark.parametrize("use_per", [True, False])
+@pytest.mark.parametrize("n_step", [1, 3])
+def test_dqn_remembers_and_updates_vectorised_steps(use_per, n_step):
+    from neodroidagent.agents import DeepQNetworkAgent
+    from neodroidagent.common import (
+        Transition,
+        TransitionPointArrayBuffer,
+        TransitionPointPrioritisedBuffer,
+    )
+
+    num_envs, batch_size = 4, 8
+    agent = DeepQNetworkAgent(
+        memory_buffer=TransitionPointPrioritisedBuffer(100)
+        if use_per
+        else TransitionPointArrayBuffer(100),
+        use_per=use_per,
+        batch_size=batch_size,
+        initial_observation_period=0,
+        n_step=n_step,
+    )
+    agent.build(
+        SimpleNamespace(shape=(3,), is_discrete=False, is_continuous=True),
+        SimpleNamespace(shape=(2,), is_discrete=True, is_continuous=False),
+        SimpleNamespace(shape=(1,)),
+        print_model_repr=False,
+    )
+
+    state = numpy.random.rand(num_envs, 3).astype(numpy.float32)
+    for _ in range(8):
+        successor_state = numpy.random.rand(num_envs, 3).astype(numpy.float32)
+        agent.remember(
+            signal=numpy.random.rand(num_envs),
+            terminated=numpy.random.rand(num_envs) < 0.2,
+            transition=Transition(
+                state, agent.extract_action(agent.sample(state)), successor_state
+            ),
+        )
+        state = successor_state
+
+    assert len(agent.memory_buffer) == num_envs * (8 - n_step + 1)
+    td_error, Q_expected, Q_state = agent._td_error(
+        agent.memory_buffer.sample(batch_size)
+    )
+    assert td_error.shape == Q_expected.shape == Q_state.shape == (batch_size, 1)
+
+    assert numpy.isfinite(agent.update())
+    assert numpy.isfinite(agent.update())
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy
+
+from neodroidagent.agents.numpy_agents.q_table import DenseQTable, HashQTable
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+"""
+
+
+def test_dense_q_table_rows_are_vectorised():
+    Q = DenseQTable(4, 3)
+    Q[1, 2] += 5.0
+    assert Q.argmax(1) == 2
+    assert Q.max(1) == Q[1, 2]
+    numpy.testing.assert_array_equal(Q.argmax(numpy.array([1, 1])), [2, 2])
+
+    Q[numpy.array([0, 0]), numpy.array([1, 1])] = 7.0
+    assert Q.max(0) == 7.0
+
+
+def test_epsilon_soft_probs():
+    Q = DenseQTable(2, 4, numpy.zeros)
+    Q[0, 3] = 1.0
+    probs = Q.epsilon_soft_probs(0, 0.2)
+    numpy.testing.assert_allclose(probs, [0.05, 0.05, 0.05, 0.85])
+    assert Q.epsilon_soft_probs(numpy.arange(2), 0.2).shape == (2, 4)
+    numpy.testing.assert_allclose(Q.expected(0, probs), 0.85)
+
+
+def test_hash_q_table_initialises_rows_on_access():
+    Q = HashQTable(3, numpy.zeros)
+    assert Q.n_states == 0
+    Q[(5, 1)] += 1.0
+    assert Q.n_states == 1
+    assert Q.argmax(5) == 1
+    assert Q.max(6) == 0.0
+    assert Q.n_states == 2
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import threading
+from types import SimpleNamespace
+
+import numpy
+import pytest
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+"""
+
+
+def continuous_space(*shape):
+    return SimpleNamespace(shape=shape, is_discrete=False, is_continuous=True)
+
+
+@pytest.mark.parametrize("prefetch_batches", [0, 2])
+def test_sac_updates_from_array_buffer(prefetch_batches):
+    from neodroidagent.agents import SoftActorCriticAgent
+    from neodroidagent.common import TransitionPointArrayBuffer
+
+    agent = SoftActorCriticAgent(
+        memory_buffer=TransitionPointArrayBuffer(100),
+        batch_size=8,
+        num_inner_updates=2,
+        prefetch_batches=prefetch_batches,
+    )
+    agent.build(
+        continuous_space(3),
+        continuous_space(2),
+        SimpleNamespace(shape=(1,)),
+        print_model_repr=False,
+    )
+
+    num_threads = threading.active_count()
+    state = numpy.random.rand(4, 3).astype(numpy.float32)
+    for _ in range(8):
+        successor_state = numpy.random.rand(4, 3).astype(numpy.float32)
+        agent.remember(
+            state=state,
+            signal=numpy.random.rand(4),  # float64 signals and bool terminals as stored
+            terminated=numpy.random.rand(4) < 0.2,
+            sample=agent.sample(state),
+            successor_state=successor_state,
+        )
+        state = successor_state
+
+    assert numpy.isfinite(agent.update())
+    assert numpy.isfinite(agent.update())
+
+    agent.eval()  # Stops the prefetching worker
+    assert threading.active_count() == num_threads
+    assert numpy.isfinite(agent.update())
+    agent.close_prefetcher()
+    assert threading.active_count() == num_threads
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+import numpy
+import pytest
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+"""
+
+
+class Chain:
+    """
+Moves right on action 1 and left on action 0, terminates with a reward of 1 at the right end
+"""
+
+    spec = SimpleNamespace(id="Chain-v0", nondeterministic=False)
+
+    def __init__(self, length=6):
+        import gym
+
+        self.length = length
+        self.observation_space = gym.spaces.Discrete(length)
+        self.action_space = gym.spaces.Discrete(2)
+
+    def reset(self):
+        self.position = 0
+        return self.position
+
+    def step(self, action):
+        self.position = int(
+            numpy.clip(self.position + (1 if action else -1), 0, self.length - 1)
+        )
+        done = self.position == self.length - 1
+        return self.position, float(done), done, {}
+
+    def render(self):
+        pass
+
+
+@pytest.mark.parametrize("off_policy", [False, True])
+def test_batched_td_agent_learns_chain(off_policy):
+    from neodroidagent.agents.numpy_agents.model_free.td_agent import (
+        TemporalDifferenceAgent,
+    )
+
+    numpy.random.seed(0)
+    agent = TemporalDifferenceAgent([Chain() for _ in range(8)], off_policy=off_policy)
+    for _ in range(30):
+        total_reward, n_steps = agent.train_episode(100)
+
+    assert total_reward.shape == n_steps.shape == (8,)
+    assert agent.derived_variables["episode_num"] == 30 * 8
+    assert agent.greedy_policy(20, render=False) == (1.0, 5)
+
+
+def test_batched_dyna_agent_learns_chain():
+    from neodroidagent.agents.numpy_agents.model_based.dyna_agent import DynaAgent
+
+    numpy.random.seed(0)
+    agent = DynaAgent([Chain() for _ in range(4)], n_simulated_actions=10)
+    for _ in range(10):
+        total_reward, n_steps = agent.train_episode(100)
+
+    assert total_reward.shape == n_steps.shape == (4,)
+    assert agent.greedy_policy(20, render=False) == (1.0, 5)
+
+
+def test_monte_carlo_agent_averages_first_visit_returns():
+    from neodroidagent.agents.numpy_agents.model_free.monte_carlo_agent import (
+        MonteCarloAgent,
+    )
+
+    agent = MonteCarloAgent(Chain(), temporal_discount=0.5)
+    Q = agent.parameters["Q"]
+
+    for rewards, expected in (
+        ([1.0, 2.0, 3.0, 4.0], [3.25, 4.5, 4.0]),
+        ([0.0, 0.0, 0.0, 0.0], [3.25 / 2, 4.5 / 2, 4.0 / 2]),
+    ):
+        agent.episode_history["state_actions"] = [(0, 1), (1, 0), (0, 1), (1, 1)]
+        agent.episode_history["rewards"] = rewards
+        agent.update()
+        numpy.testing.assert_allclose([Q[0, 1], Q[1, 0], Q[1, 1]], expected)
+
+    assert agent.derived_variables["n_returns"][0, 1] == 2
+    assert agent.episode_history["rewards"] == []
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy
+import pytest
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+Runs pools of two CartPole environments in spawned worker processes, the factories are defined at module level so that
+the workers can unpickle them
+"""
+
+NUM_ENVS = 2
+
+
+def cart_pole():
+    import gym
+
+    return gym.make("CartPole-v1")
+
+
+class FailingCartPole:
+    """
+CartPole whose step raises after num_steps steps
+"""
+
+    def __init__(self, num_steps: int = 3):
+        self.num_steps = num_steps
+
+    def __call__(self):
+        environment = cart_pole()
+        step = environment.step
+        steps = iter(range(self.num_steps))
+
+        def failing_step(action):
+            if next(steps, None) is None:
+                raise ValueError("Failing step")
+            return step(action)
+
+        environment.step = failing_step
+        return environment
+
+
+def actions(value=0):
+    return numpy.full((NUM_ENVS, 1), value)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    from neodroidagent.common import SubprocessEnvironmentPool
+
+    with SubprocessEnvironmentPool(
+        num_envs=NUM_ENVS, environment_factory=cart_pole, start_method="spawn"
+    ) as pool:
+        pool.seed(0)
+        yield pool
+
+
+@pytest.mark.slow
+def test_pool_reacts_in_lockstep(pool):
+    assert pool.num_envs == NUM_ENVS
+    snapshot = pool.reset()
+    assert snapshot.observables.shape == (NUM_ENVS, 4)
+    assert not snapshot.terminated.any()
+
+    snapshot = pool.react(actions())
+    assert snapshot.observables.shape == (NUM_ENVS, 4)
+    assert snapshot.signal.tolist() == [1.0] * NUM_ENVS
+    assert not snapshot.terminated.any()
+
+
+@pytest.mark.slow
+def test_pool_steps_asynchronously(pool):
+    pool.reset()
+    pool.step_async(actions(1))
+    with pytest.raises(AssertionError):
+        pool.step_async(actions(1))
+    snapshot = pool.step_wait()
+    assert snapshot.signal.tolist() == [1.0] * NUM_ENVS
+    with pytest.raises(AssertionError):
+        pool.step_wait()
+
+
+@pytest.mark.slow
+def test_pool_auto_resets_terminated_environments(pool):
+    pool.reset()
+    for _ in range(100):  # Pushing the cart one way topples the pole within a few dozen steps
+        snapshot = pool.react(actions(1))
+        if snapshot.terminated.any():
+            break
+    else:
+        pytest.fail("No environment terminated")
+
+    # The snapshot holds the initial observation of the next episode
+    terminated = snapshot.terminated.copy()
+    assert (numpy.abs(snapshot.observables[terminated]) <= 0.05).all()
+    assert not pool.react(actions(1)).terminated[terminated].any()
+
+
+@pytest.mark.slow
+def test_pool_snapshot_is_valid_while_next_step_is_in_flight(pool):
+    pool.reset()
+    snapshot = pool.react(actions(1))
+    observables = snapshot.observables.copy()
+
+    pool.step_async(actions(1))
+    next_snapshot = pool.step_wait()
+    assert (snapshot.observables == observables).all()
+    assert not (next_snapshot.observables == observables).all()
+
+    pool.react(actions(1))  # The step after overwrites the half of the first snapshot
+    assert not (snapshot.observables == observables).all()
+
+
+@pytest.mark.slow
+def test_pool_raises_worker_errors():
+    from neodroidagent.common import SubprocessEnvironmentPool
+
+    with SubprocessEnvironmentPool(
+        num_envs=NUM_ENVS, environment_factory=FailingCartPole(3), start_method="spawn"
+    ) as pool:
+        pool.reset()
+        for _ in range(3):
+            pool.react(actions())
+        with pytest.raises(RuntimeError, match="Failing step"):
+            pool.react(actions())
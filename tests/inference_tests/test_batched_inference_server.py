@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import threading
+
+import numpy
+import pytest
+import torch
+
+from neodroidagent.common.inference import BatchedInferenceServer, slice_output
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = ""
+
+
+class HistogramWriter:
+    def __init__(self):
+        self.histograms = {}
+
+    def histogram(self, tag, values, step):
+        self.histograms.setdefault(tag, []).extend(values)
+
+
+def test_requests_are_batched_and_scattered():
+    model = torch.nn.Linear(4, 2)
+    forward_sizes = []
+
+    def forward(states):
+        forward_sizes.append(len(states))
+        with torch.no_grad():
+            return model(torch.as_tensor(states, dtype=torch.float))
+
+    writer = HistogramWriter()
+    states = [numpy.random.rand(3, 4) for _ in range(32)]
+    results = [None] * len(states)
+    with BatchedInferenceServer(
+        forward,
+        max_batch_size=12,
+        max_latency=0.05,
+        metric_writer=writer,
+        report_interval=1,
+    ) as server:
+
+        def request(i):
+            results[i] = server.sample(states[i])
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(32)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    with torch.no_grad():
+        for state, result in zip(states, results):
+            expected = model(torch.as_tensor(state, dtype=torch.float))
+            assert torch.allclose(result, expected)
+    assert sum(forward_sizes) == 32 * 3
+    assert max(forward_sizes) <= 12
+    assert len(forward_sizes) < 32
+    assert sorted(writer.histograms["inference_batch_size"]) == sorted(forward_sizes)
+    assert len(writer.histograms["inference_latency"]) == 32
+
+
+def test_distributions_are_sliced():
+    logits = torch.randn(5, 3)
+    action, distribution = slice_output(
+        (torch.arange(5), torch.distributions.Categorical(logits=logits)), 1, 3
+    )
+    assert torch.equal(action, torch.arange(1, 3))
+    assert torch.allclose(
+        distribution.logits, torch.distributions.Categorical(logits=logits[1:3]).logits
+    )
+
+
+def test_stop_answers_submitted_requests():
+    server = BatchedInferenceServer(lambda s: s * 2, max_latency=1.0).start()
+    futures = [server.submit(numpy.full((1, 1), i)) for i in range(5)]
+    server.stop()
+    assert [f.result().item() for f in futures] == [0, 2, 4, 6, 8]
+
+
+def test_unsliceable_outputs_are_raised_by_the_requests():
+    bernoulli = True
+
+    def forward(states):
+        probabilities = torch.as_tensor(states, dtype=torch.float)
+        if bernoulli:  # Has no known parameters to be sliced by
+            return torch.distributions.Bernoulli(probs=probabilities)
+        return probabilities
+
+    with BatchedInferenceServer(forward, max_latency=0.01) as server:
+        with pytest.raises(NotImplementedError):
+            server.sample(numpy.full((2, 1), 0.5))
+
+        bernoulli = False
+        assert server.sample(numpy.full((2, 1), 0.5)).tolist() == [[0.5], [0.5]]
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy
+import torch
+
+from neodroidagent.common.memory import (
+    TransitionPoint,
+    TransitionPointArrayBuffer,
+    TransitionPointFrameStackBuffer,
+    TransitionPointMemoryMappedBuffer,
+)
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = ""
+
+
+def test_array_buffer_infers_columns():
+    rb = TransitionPointArrayBuffer(10)
+    rb.add_transition_point(
+        numpy.zeros(3, numpy.float32), numpy.array([1]), numpy.ones(3), 0.5, False
+    )
+    assert rb.columns["state"].shape == (10, 3)
+    assert rb.columns["state"].dtype == numpy.float32
+    assert rb.columns["action"].shape == (10, 1)
+    assert rb.columns["terminal"].dtype == numpy.bool_
+
+
+def test_array_buffer_wraps_around():
+    rb = TransitionPointArrayBuffer(4)
+    for i in range(6):
+        rb.add_transition_point(TransitionPoint(i, i, i, i, False))
+    assert len(rb) == 4
+    assert sorted(rb.columns["state"]) == [2, 3, 4, 5]
+
+
+def test_array_buffer_sample():
+    rb = TransitionPointArrayBuffer(100)
+    a = numpy.random.random((9, 9))
+    for e in a:
+        rb.add_transition_point(e, 0, e, 0.0, False)
+    b = rb.sample(5)
+    assert isinstance(b, TransitionPoint)
+    assert b.state.shape == (5, 9)
+    assert numpy.array(
+        [(a == i).all(-1).any() for i in b.state]
+    ).all(), f"Expected {a} to cover {b.state}"
+
+
+def test_array_buffer_unbounded_grows():
+    rb = TransitionPointArrayBuffer(initial_unbounded_capacity=2)
+    for i in range(9):
+        rb.add_transition_point(i, i, None, i, False)
+    b = rb.sample()
+    assert (b.state == numpy.arange(9)).all()
+    assert b.successor_state is None
+    rb.clear()
+    assert len(rb) == 0
+
+
+def test_array_buffer_batch_insert_wraps_around():
+    rb = TransitionPointArrayBuffer(4)
+    rb.add_transition_point(TransitionPoint(0, 0, 0, 0, False))
+    batch = numpy.arange(1, 6)
+    rb.add_transition_points(
+        TransitionPoint(batch, batch, batch, batch, numpy.zeros(5, bool))
+    )
+    assert len(rb) == 4
+    assert list(rb.columns["state"]) == [4, 5, 2, 3]
+
+
+def test_memory_mapped_buffer_reopens(tmp_path):
+    rb = TransitionPointMemoryMappedBuffer(8, directory=tmp_path)
+    batch = numpy.arange(10)
+    rb.add_transition_points(
+        TransitionPoint(batch, batch, batch, batch, numpy.zeros(10, bool))
+    )
+    rb.flush()
+
+    reopened = TransitionPointMemoryMappedBuffer(8)
+    assert reopened.open(tmp_path)
+    assert len(reopened) == 8
+    assert sorted(reopened.columns["state"]) == list(range(2, 10))
+    assert reopened.sample(4).state.shape == (4,)
+
+
+def test_frame_stack_buffer_rebuilds_stacks():
+    num_streams, stack_size = 2, 3
+    rb = TransitionPointFrameStackBuffer(
+        8, stack_size=stack_size, num_streams=num_streams
+    )
+    rng = numpy.random.RandomState(0)
+    stacks = [numpy.repeat(rng.random((1, 2)), stack_size, 0)] * num_streams
+    stored = {}
+    for t in range(7):
+        terminal = rng.random(num_streams) < 0.3
+        successors = [numpy.concatenate((s[1:], rng.random((1, 2)))) for s in stacks]
+        rb.add_transition_points(
+            TransitionPoint(
+                numpy.stack(stacks),
+                numpy.full(num_streams, t),
+                numpy.stack(successors),
+                rng.random(num_streams),
+                terminal,
+            )
+        )
+        for i in range(num_streams):
+            stored[(t, i)] = (stacks[i], successors[i], terminal[i])
+        stacks = [
+            numpy.repeat(rng.random((1, 2)), stack_size, 0) if d else s
+            for s, d in zip(successors, terminal)
+        ]
+
+    assert len(rb) == 8
+    b = rb.sample()
+    # The oldest stack_size - 1 steps lost part of their history and are not sampled
+    assert b.state.shape == ((4 - (stack_size - 1)) * num_streams, stack_size, 2)
+    for state, action, successor, terminal in zip(
+        b.state, b.action, b.successor_state, b.terminal
+    ):
+        assert action >= 3 + stack_size - 1, "Expected the oldest steps to be skipped"
+        matches = [
+            v
+            for (t, _), v in stored.items()
+            if t == action and (v[0][-1] == state[-1]).all()
+        ]
+        assert len(matches) == 1
+        expected_state, expected_successor, expected_terminal = matches[0]
+        assert terminal == expected_terminal
+        assert numpy.allclose(state, expected_state)
+        if not terminal:
+            assert numpy.allclose(successor, expected_successor)
+        else:
+            assert (successor == 0).all()
+
+
+def test_array_buffer_sample_tensors_reuses_staging():
+    rb = TransitionPointArrayBuffer(10)
+    for i in range(10):
+        rb.add_transition_point(numpy.full(3, i), i, numpy.full(3, i + 1), i, False)
+    a = rb.sample_tensors(4, dtypes=(torch.float, None, None, None, None))
+    assert a.state.dtype == torch.float
+    assert a.action.dtype == torch.int64
+    assert a.state.shape == (4, 3)
+    assert (a.successor_state[:, 0] == a.state[:, 0] + 1).all()
+    b = rb.sample_tensors(4, dtypes=(torch.float, None, None, None, None))
+    assert b.state.data_ptr() == a.state.data_ptr()
+    assert b.action.data_ptr() == a.action.data_ptr()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy
+import pytest
+
+from neodroidagent.common.memory.data_structures.indexed_priority_queue import (
+    IndexedPriorityQueue,
+)
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = ""
+
+
+def test_pops_in_priority_order_after_changes():
+    queue = IndexedPriorityQueue()
+    for key, priority in zip("abcde", (3, 1, 4, 1, 5)):
+        queue[key] = priority
+    queue["e"] = 0  # Decrease
+    queue["b"] = 6  # Increase
+    del queue["c"]
+
+    assert len(queue) == 4 and "c" not in queue
+    assert queue["a"] == 3
+    assert queue.peek() == ("b", 6)
+    assert [queue.pop() for _ in range(len(queue))] == [
+        ("b", 6),
+        ("a", 3),
+        ("d", 1),
+        ("e", 0),
+    ]
+    with pytest.raises(KeyError):
+        queue.pop()
+
+
+def test_matches_sorting_under_random_updates():
+    rng = numpy.random.RandomState(0)
+    queue, reference = IndexedPriorityQueue(), {}
+    for _ in range(2000):
+        key = int(rng.randint(50))
+        if key in reference and rng.rand() < 0.2:
+            del queue[key], reference[key]
+        else:
+            queue[key] = reference[key] = float(rng.rand())
+    assert len(queue._heap) <= 2 * len(queue) + 32
+
+    popped = [queue.pop()[1] for _ in range(len(queue))]
+    assert popped == sorted(reference.values(), reverse=True)
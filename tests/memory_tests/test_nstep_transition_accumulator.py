@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy
+
+from neodroidagent.common.memory import NStepTransitionAccumulator, TransitionPoint
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = ""
+
+
+def test_nstep_transitions_stop_at_terminals():
+    accumulator = NStepTransitionAccumulator(3, 0.5)
+    emitted = []
+    for i in range(4):
+        a = numpy.full((2, 1), i)
+        emitted.append(
+            accumulator.add(
+                TransitionPoint(a, a, a + 1, numpy.ones(2), numpy.array([False, i == 1]))
+            )
+        )
+
+    assert emitted[0] is None and emitted[1] is None
+    first = emitted[2]
+    numpy.testing.assert_array_equal(first.state, [[0], [0]])
+    numpy.testing.assert_array_equal(first.successor_state, [[3], [2]])
+    numpy.testing.assert_allclose(first.signal, [1.75, 1.5])
+    numpy.testing.assert_array_equal(first.terminal, [False, True])
+    numpy.testing.assert_array_equal(emitted[3].terminal, [False, True])
+    assert accumulator.bootstrap_discount_factor == 0.125
+
+
+def test_single_step_passes_through():
+    accumulator = NStepTransitionAccumulator(1, 0.5)
+    point = TransitionPoint(*[numpy.zeros(2)] * 5)
+    assert accumulator.add(point) is point
+
+
+def test_episode_batches_fold_along_time():
+    num_steps, num_envs = 4, 2
+    terminals = numpy.zeros((num_steps, num_envs), bool)
+    terminals[1, 1] = terminals[3] = True
+    steps = numpy.repeat(numpy.arange(num_steps), num_envs).reshape(-1, 1)
+
+    accumulator = NStepTransitionAccumulator(3, 0.5)
+    folded = accumulator.add_episode(
+        TransitionPoint(
+            steps,
+            steps,
+            steps + 1,
+            numpy.ones(num_steps * num_envs),
+            terminals.reshape(-1),
+        ),
+        num_steps,
+    )
+
+    step_wise = []
+    for i in range(num_steps + 2):  # Terminal padding flushes the last windows
+        a = numpy.full((num_envs, 1), i)
+        step_wise.append(
+            accumulator.add(
+                TransitionPoint(
+                    a,
+                    a,
+                    a + 1,
+                    numpy.ones(num_envs) * (i < num_steps),
+                    terminals[i] if i < num_steps else numpy.ones(num_envs, bool),
+                ),
+                new_episode=i == 0,
+            )
+        )
+    step_wise = step_wise[2:]
+
+    for field in TransitionPoint.get_fields():
+        numpy.testing.assert_allclose(
+            getattr(folded, field),
+            numpy.concatenate([getattr(p, field) for p in step_wise]),
+        )
+
+
+def test_unterminated_episode_drops_incomplete_windows():
+    accumulator = NStepTransitionAccumulator(3, 0.5)
+    steps = numpy.arange(5).reshape(-1, 1)
+    folded = accumulator.add_episode(
+        TransitionPoint(steps, steps, steps + 1, numpy.ones(5), numpy.zeros(5, bool)),
+        5,
+    )
+    numpy.testing.assert_array_equal(folded.state, [[0], [1], [2]])
+    numpy.testing.assert_array_equal(folded.successor_state, [[3], [4], [5]])
+    numpy.testing.assert_allclose(folded.signal, [1.75] * 3)
+    assert not folded.terminal.any()
+
+    assert (
+        accumulator.add_episode(
+            TransitionPoint(
+                steps[:2], steps[:2], steps[:2] + 1, numpy.ones(2), numpy.zeros(2, bool)
+            ),
+            2,
+        )
+        is None
+    )
+
+
+def test_new_episode_drops_pending_transitions():
+    accumulator = NStepTransitionAccumulator(2, 0.5)
+    point = TransitionPoint(*[numpy.zeros(1)] * 4, numpy.zeros(1, bool))
+    assert accumulator.add(point) is None
+    assert accumulator.add(point, new_episode=True) is None
+    assert accumulator.add(point) is not None
+
+
+def test_new_episode_flushes_terminated_windows():
+    accumulator = NStepTransitionAccumulator(3, 0.5)
+    stored = []
+    for episode in range(2):
+        for step_i in range(5):
+            a = numpy.full((1, 1), 10 * episode + step_i)
+            emitted = accumulator.add(
+                TransitionPoint(a, a, a + 1, numpy.ones(1), numpy.array([step_i == 4])),
+                new_episode=step_i == 0,
+            )
+            if emitted is not None:
+                stored.append(emitted)
+    stored.append(accumulator.flush())
+
+    state = numpy.concatenate([p.state for p in stored]).ravel()
+    assert state.tolist() == [0, 1, 2, 3, 4, 10, 11, 12, 13, 14]
+    last = stored[-1]  # The terminal transition of the last episode
+    numpy.testing.assert_array_equal(last.state, [[13], [14]])
+    numpy.testing.assert_array_equal(last.successor_state, [[15], [15]])
+    numpy.testing.assert_allclose(last.signal, [1.5, 1.0])
+    numpy.testing.assert_array_equal(last.terminal, [True, True])
+    assert accumulator.flush() is None
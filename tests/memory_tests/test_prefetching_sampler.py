@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import itertools
+
+import numpy
+import pytest
+
+from neodroidagent.common.memory import (
+    PrefetchingSampler,
+    TransitionPoint,
+    TransitionPointArrayBuffer,
+)
+from neodroidagent.utilities import NoData
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = ""
+
+
+def test_prefetching_sampler_keeps_order():
+    counter = itertools.count()
+    with PrefetchingSampler(lambda: next(counter), 3) as sampler:
+        assert [next(sampler) for _ in range(10)] == list(range(10))
+
+
+def test_prefetching_sampler_reraises():
+    rb = TransitionPointArrayBuffer(10)
+    sampler = PrefetchingSampler(lambda: rb.sample(2), 2)
+    with pytest.raises(NoData):
+        next(sampler)
+
+    with sampler.lock:
+        rb.add_transition_point(TransitionPoint(1, 1, 1, 1, False))
+        rb.add_transition_point(TransitionPoint(1, 1, 1, 1, False))
+    assert next(sampler).state.tolist() == [1, 1]
+    sampler.close()
+
+
+def test_prefetched_staging_is_not_overwritten():
+    num_prefetch = 2
+    rb = TransitionPointArrayBuffer(100)
+    rb.add_transition_points(
+        TransitionPoint(*[numpy.arange(100)] * 4, numpy.zeros(100, bool))
+    )
+
+    with PrefetchingSampler(
+        lambda: rb.sample_tensors(
+            8, num_staging_buffers=PrefetchingSampler.num_alive(num_prefetch)
+        ),
+        num_prefetch,
+    ) as sampler:
+        first = next(sampler)
+        expected = first.state.clone()
+        for _ in range(num_prefetch):
+            next(sampler)
+        assert (first.state == expected).all()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import torch
+
+from neodroidagent.common.memory import RolloutStorage
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = ""
+
+
+def fill(storage, steps, num_envs=3):
+    torch.manual_seed(0)
+    for t in range(steps):
+        storage.insert(
+            state=torch.full((num_envs, 2), float(t)),
+            signal=torch.randn(num_envs, 1),
+            non_terminal=(torch.rand(num_envs, 1) > 0.2).float(),
+            value_estimate=torch.randn(num_envs, 1),
+        )
+
+
+def test_storage_grows():
+    storage = RolloutStorage(4)
+    fill(storage, 10)
+    assert len(storage) == 10
+    assert storage.num_steps >= 10
+    assert torch.equal(storage["state"][:, 0, 0], torch.arange(10.0))
+
+
+def test_buffers_are_reused():
+    storage = RolloutStorage(8)
+    fill(storage, 5)
+    buffer = storage["state"].data_ptr()
+    storage.after_update()
+    fill(storage, 5)
+    assert storage["state"].data_ptr() == buffer
+
+
+def test_compute_returns_matches_loop():
+    storage = RolloutStorage(16)
+    fill(storage, 12)
+    next_value = torch.randn(3, 1)
+    gamma, tau = 0.9, 0.95
+    storage.compute_returns(next_value, True, gamma, tau, normalise_advantages=False)
+
+    signal, non_terminal, value = (
+        storage["signal"],
+        storage["non_terminal"],
+        storage["value_estimate"],
+    )
+    gae = torch.zeros(3, 1)
+    advantages = torch.zeros_like(signal)
+    for t in reversed(range(len(storage))):
+        successor = next_value if t == len(storage) - 1 else value[t + 1]
+        delta = signal[t] + gamma * successor * non_terminal[t] - value[t]
+        gae = delta + gamma * tau * non_terminal[t] * gae
+        advantages[t] = gae
+
+    assert torch.allclose(storage["advantages"], advantages, atol=1e-5)
+    assert torch.allclose(storage["returns"], advantages + value, atol=1e-5)
+
+
+def test_feed_forward_generator_covers_rollout():
+    storage = RolloutStorage(8)
+    fill(storage, 5)
+    seen = torch.cat(
+        [state[:, 0] for state, in storage.feed_forward_generator(4, "state")]
+    )
+    assert torch.equal(
+        seen.sort().values, storage["state"][..., 0].flatten().sort().values
+    )
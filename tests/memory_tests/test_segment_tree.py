@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy
+
+from neodroidagent.common.memory.data_structures.segment_tree import (
+    MinSegmentTree,
+    SumSegmentTree,
+)
+
+__author__ = "Christian Heider Nielsen"
+
+
+def test_reduce():
+    values = numpy.random.random(13)
+    tree = SumSegmentTree(16)
+    tree[numpy.arange(13)] = values
+    min_tree = MinSegmentTree(16)
+    min_tree[numpy.arange(13)] = values
+
+    for start in range(13):
+        for end in range(start + 1, 17):
+            assert numpy.isclose(tree.sum(start, end), values[start:end].sum())
+            assert min_tree.min(start, end) == values[start:end].min()
+    assert numpy.isclose(tree.sum(2, -3), values[2:13].sum())
+
+
+def test_bulk_set_matches_sequential_set():
+    indices = numpy.random.randint(0, 64, 100)
+    values = numpy.random.random(100)
+    bulk = SumSegmentTree(64)
+    bulk[indices] = values
+    sequential = SumSegmentTree(64)
+    for i, v in zip(indices, values):
+        sequential[i] = v
+
+    assert numpy.allclose(bulk._value, sequential._value)
+    assert numpy.array_equal(bulk[numpy.arange(64)], sequential[numpy.arange(64)])
+
+
+def test_find_prefix_sum_idx():
+    tree = SumSegmentTree(8)
+    tree[numpy.arange(4)] = [1.0, 0.0, 2.0, 3.0]
+
+    assert tree.find_prefix_sum_idx(0.5) == 0
+    assert tree.find_prefix_sum_idx(1.0) == 2
+    assert tree.find_prefix_sum_idx(3.5) == 3
+    assert numpy.array_equal(
+        tree.find_prefix_sum_idx(numpy.array([0.5, 1.0, 2.9, 3.5, 5.9])),
+        [0, 2, 2, 3, 3],
+    )
+
+
+def test_min_tree_in_lockstep():
+    tree = SumSegmentTree(8, with_min_tree=True)
+    tree[numpy.arange(8)] = numpy.arange(1.0, 9.0)
+    assert tree.min() == 1.0
+    tree[numpy.array([0, 3])] = [4.0, 0.5]
+    assert tree.min() == 0.5
+    assert tree.min(4) == 5.0
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+
+import numpy
+import pytest
+
+from neodroidagent.common.memory import (
+    TransitionPoint,
+    TransitionPointArrayBuffer,
+    TransitionPointBuffer,
+    TransitionPointPrioritisedBuffer,
+)
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = ""
+
+
+def transition_points(start, stop):
+    a = numpy.arange(start, stop)
+    return TransitionPoint(a, a, a, a * 0.5, numpy.zeros(len(a), bool))
+
+
+def test_array_buffer_snapshot_appends_shards(tmp_path):
+    rb = TransitionPointArrayBuffer(8)
+    rb.add_transition_points(transition_points(0, 5))
+    rb.save(tmp_path)
+    rb.add_transition_points(transition_points(5, 7))
+    rb.save(tmp_path)
+    assert sorted(p.name for p in tmp_path.glob("shard_*")) == [
+        f"shard_{rb.snapshot_run_id}_0.npz",
+        f"shard_{rb.snapshot_run_id}_5.npz",
+    ]
+
+    rb.add_transition_points(transition_points(7, 15))
+    rb.save(tmp_path)
+    assert [p.name for p in tmp_path.glob("shard_*")] == [
+        f"shard_{rb.snapshot_run_id}_7.npz"
+    ]
+
+    restored = TransitionPointArrayBuffer(8)
+    assert restored.load(tmp_path)
+    assert len(restored) == 8
+    assert restored.num_inserted == 15
+    assert sorted(restored.columns["state"]) == list(range(7, 15))
+
+
+def test_array_buffer_snapshot_drops_overwritten_records(tmp_path):
+    rb = TransitionPointArrayBuffer(4)
+    rb.add_transition_points(transition_points(0, 3))
+    rb.save(tmp_path)
+    rb.add_transition_points(transition_points(3, 5))
+    rb.save(tmp_path)
+
+    restored = TransitionPointArrayBuffer(4)
+    assert restored.load(tmp_path)
+    assert sorted(restored.columns["state"]) == [1, 2, 3, 4]
+
+
+def test_snapshot_of_another_run_is_replaced(tmp_path):
+    old_run = TransitionPointArrayBuffer(200)
+    old_run.add_transition_points(transition_points(0, 100))
+    old_run.save(tmp_path)
+
+    new_run = TransitionPointArrayBuffer(200)
+    new_run.add_transition_points(transition_points(1000, 1150))
+    new_run.save(tmp_path)
+
+    restored = TransitionPointArrayBuffer(200)
+    assert restored.load(tmp_path)
+    assert len(restored) == 150
+    assert sorted(restored.columns["state"][:150]) == list(range(1000, 1150))
+
+    restored.add_transition_points(transition_points(1150, 1160))  # Continues the run
+    restored.save(tmp_path)
+    assert len(list(tmp_path.glob("shard_*"))) == 2
+
+
+def interrupt(*args, **kwargs):
+    raise KeyboardInterrupt
+
+
+def test_interrupted_save_keeps_the_previous_snapshot(tmp_path, monkeypatch):
+    old_run = TransitionPointPrioritisedBuffer(200)
+    old_run.add_transition_points(transition_points(0, 100), numpy.ones(100))
+    old_run.save(tmp_path)
+
+    new_run = TransitionPointPrioritisedBuffer(200)
+    new_run.add_transition_points(transition_points(1000, 1150), numpy.ones(150))
+    with monkeypatch.context() as m:
+        m.setattr(json, "dump", interrupt)
+        with pytest.raises(KeyboardInterrupt):  # Before the manifest is replaced
+            new_run.save(tmp_path)
+
+    restored = TransitionPointPrioritisedBuffer(200)
+    assert restored.load(tmp_path)
+    assert len(restored) == 100
+    assert restored.snapshot_run_id == old_run.snapshot_run_id
+
+    new_run.save(tmp_path)
+    restored = TransitionPointPrioritisedBuffer(200)
+    assert restored.load(tmp_path)
+    assert len(restored) == 150
+    assert len(list(tmp_path.glob("shard_*"))) == 1
+    assert len(list(tmp_path.glob("arrays_*"))) == 1
+
+
+def test_prioritised_buffer_snapshot_keeps_priorities(tmp_path):
+    rb = TransitionPointPrioritisedBuffer(8)
+    rb.add_transition_points(transition_points(0, 6), numpy.arange(6) * 0.1)
+    rb.sample(4)
+    rb.update_last_batch(numpy.ones(4))
+    rb.save(tmp_path)
+
+    restored = TransitionPointPrioritisedBuffer(8)
+    assert restored.load(tmp_path)
+    assert len(restored) == 6
+    assert numpy.isclose(restored._tree.total, rb._tree.total)
+    assert restored.beta == rb.beta
+    _, priorities, data = restored._tree.latest(6)
+    _, expected_priorities, expected_data = rb._tree.latest(6)
+    assert numpy.allclose(priorities, expected_priorities)
+    assert [d.state for d in data] == [d.state for d in expected_data]
+
+
+def test_transition_point_buffer_snapshot(tmp_path):
+    rb = TransitionPointBuffer(4)
+    rb.add_transition_points(transition_points(0, 6))
+    rb.save(tmp_path)
+
+    restored = TransitionPointBuffer(4)
+    assert restored.load(tmp_path)
+    assert len(restored) == 4
+    assert sorted(restored.sample().state) == [2, 3, 4, 5]
+    assert isinstance(restored._memory[0], TransitionPoint)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy
+
+from neodroidagent.common.memory import (
+    ExpandableCircularBuffer,
+    PrioritisedBuffer,
+    SumTree,
+    TransitionPoint,
+    TransitionPointPrioritisedBuffer,
+)
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = ""
+
+
+def test_sum_tree_extend_equals_push():
+    pushed, extended = SumTree(8), SumTree(8)
+    data = list(range(11))
+    sums = numpy.random.random(11)
+    for d, s in zip(data, sums):
+        pushed.push(d, s)
+    extended.extend(data, sums)
+    assert list(pushed) == list(extended)
+    assert numpy.allclose(pushed.total, extended.total)
+    assert numpy.isclose(extended.total, sums[-8:].sum())
+
+
+def test_circular_buffer_extend_equals_add():
+    added, extended = ExpandableCircularBuffer(4), ExpandableCircularBuffer(4)
+    for i in range(6):
+        added._add(i)
+    extended.extend(range(6))
+    assert added._memory == extended._memory
+
+
+def test_sum_tree_get_batch_equals_get():
+    tree = SumTree(16)
+    tree.extend(range(16), numpy.random.random(16))
+    queries = numpy.random.random(32)
+    leaf_indices, _, priorities, data = tree.get_batch(queries)
+    expected = [tree.get(q) for q in queries]
+    assert list(leaf_indices) == [e[0] for e in expected]
+    assert data == [e[3] for e in expected]
+
+
+def test_sum_tree_update_leaves_keeps_sums():
+    tree = SumTree(5, round_capacity_to_nearest_power_of_two=False)
+    tree.extend(range(5), numpy.ones(5))
+    tree.update_leaves(numpy.array([4, 6, 8]), numpy.array([2.0, 3.0, 4.0]))
+    assert numpy.isclose(tree.total, 1 + 2 + 1 + 3 + 4)
+
+
+def test_prioritised_buffer_importance_sampling_weights():
+    rb = PrioritisedBuffer(64)
+    rb.extend(range(64), numpy.random.random(64))
+    data, weights = rb.sample_weighted(8)
+    assert len(data) == len(weights) == 8
+    assert (weights > 0).all() and numpy.isclose(weights.max(), 1.0)
+    rb.update_last_batch(numpy.zeros(8))
+
+
+def test_transition_point_prioritised_buffer_samples_columns():
+    rb = TransitionPointPrioritisedBuffer(16)
+    a = numpy.arange(8)
+    rb.add_transition_points(TransitionPoint(a, a, a, a * 0.5, a > 6))
+    for batch in (rb.sample(4), rb.sample_weighted(4)[0]):
+        assert isinstance(batch, TransitionPoint)
+        assert len(batch.state) == len(batch.terminal) == 4
+        numpy.testing.assert_allclose(
+            numpy.array(batch.signal), numpy.array(batch.state) * 0.5
+        )
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import torch
+
+from neodroidagent.common.memory import (
+    SampleTrajectoryBuffer,
+    TransitionPointTrajectoryBuffer,
+    ValuedTransitionPoint,
+)
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = ""
+
+
+def test_trajectory_distribution_is_batched():
+    distributions = [
+        torch.distributions.Categorical(logits=torch.randn(3, 4)) for _ in range(5)
+    ]
+    actions = [d.sample() for d in distributions]
+    tb = SampleTrajectoryBuffer()
+    for d, a in zip(distributions, actions):
+        tb.add_trajectory_point(0.0, False, a, d)
+
+    trajectory = tb.retrieve_trajectory()
+    assert torch.allclose(
+        trajectory.distribution.log_prob(torch.stack(trajectory.action)),
+        torch.stack([d.log_prob(a) for d, a in zip(distributions, actions)]),
+    )
+
+
+def test_transition_trajectory_distribution_is_batched():
+    distributions = [
+        torch.distributions.Normal(torch.randn(3, 2), torch.rand(3, 2) + 0.1)
+        for _ in range(5)
+    ]
+    actions = [d.sample() for d in distributions]
+    tb = TransitionPointTrajectoryBuffer()
+    for d, a in zip(distributions, actions):
+        tb.add_transition_point(ValuedTransitionPoint(0, a, 0, 0.0, False, d, 0.0))
+
+    transitions = tb.sample()
+    assert transitions.distribution.batch_shape == (5, 3, 2)
+    assert torch.allclose(
+        transitions.distribution.log_prob(torch.stack(transitions.action)),
+        torch.stack([d.log_prob(a) for d, a in zip(distributions, actions)]),
+    )
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import pytest
+
+from neodroidagent.utilities.misc.environment_model.environment_model import EnvModel
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+"""
+
+
+def test_outcome_probs_follow_counts():
+    M = EnvModel()
+    M[(0, 1, 0.0, 2)] += 1
+    assert M.outcome_probs(0, 1) == [((0.0, 2), 1.0)]
+
+    M[(0, 1, 1.0, 3)] += 3
+    assert dict(M.outcome_probs(0, 1)) == {
+        (0.0, 2): pytest.approx(0.25),
+        (1.0, 3): pytest.approx(0.75),
+    }
+    assert M[(0, 1, 1.0, 3)] == 3
+    assert M[(0, 1, 1.0, 4)] == 0
+    assert (0, 1, 1.0, 3) in M
+    assert (0, 1, 1.0, 4) not in M
+
+
+def test_predecessors_are_indexed():
+    M = EnvModel()
+    M[(0, 0, 0.0, 2)] += 1
+    M[(1, 0, 0.0, 2)] += 1
+    M[(1, 0, 1.0, 2)] += 1
+    M[(1, 1, 0.0, None)] += 1
+    assert sorted(M.state_action_pairs_leading_to_outcome(2)) == [(0, 0), (1, 0)]
+    assert M.state_action_pairs_leading_to_outcome(None) == [(1, 1)]
+    assert M.state_action_pairs_leading_to_outcome(5) == []
+
+    M[(1, 0, 0.0, 2)] = 0
+    assert sorted(M.state_action_pairs_leading_to_outcome(2)) == [(0, 0), (1, 0)]
+    M[(1, 0, 1.0, 2)] = 0
+    assert M.state_action_pairs_leading_to_outcome(2) == [(0, 0)]
+    assert M.outcome_probs(1, 0) == []
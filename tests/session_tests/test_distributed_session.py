@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import time
+
+import numpy
+import pytest
+import torch
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+Runs a DistributedSession of three observers over the TCP loopback, the agents and environments are defined at module
+level so that the spawned ranks can unpickle them
+"""
+
+
+class Space:
+    shape = (1,)
+
+
+class Snapshot:
+    def __init__(self, observables, signal, terminated):
+        self.observables = observables
+        self.signal = signal
+        self.terminated = terminated
+
+
+class EchoEnvironment:
+    """
+The signal is the action
+"""
+
+    observation_space = action_space = signal_space = Space()
+
+    def seed(self, seed):
+        pass
+
+    def reset(self):
+        return Snapshot(numpy.zeros((1, 1)), numpy.zeros(1), numpy.zeros(1, bool))
+
+    def react(self, action):
+        return Snapshot(
+            numpy.ones((1, 1)), numpy.ravel(action), numpy.random.rand(1) < 0.1
+        )
+
+    def close(self):
+        pass
+
+
+class BiasAgent:
+    """
+Acts with the bias of its model, every update increments the bias and is slower than the steps of the observers
+"""
+
+    def __init__(self, seed=0, **kwargs):
+        self.memory_buffer = []
+        self.steps_at_update = []
+
+    def build(self, *args, **kwargs):
+        self.model = torch.nn.Linear(1, 1)
+        torch.nn.init.zeros_(self.model.weight)
+        torch.nn.init.zeros_(self.model.bias)
+
+    @property
+    def models(self):
+        return {"model": self.model}
+
+    def eval(self):
+        pass
+
+    def sample(self, state):
+        return self.model(torch.tensor(state, dtype=torch.float))
+
+    def extract_action(self, sample):
+        return sample.numpy()
+
+    def extract_features(self, snapshot):
+        return numpy.array(snapshot.observables)
+
+    def extract_signal(self, snapshot):
+        return numpy.array(snapshot.signal)
+
+    def remember(self, **kwargs):
+        self.memory_buffer.append(kwargs)
+
+    def update(self, **kwargs):
+        time.sleep(1e-3)
+        self.steps_at_update.append(len(self.memory_buffer))
+        with torch.no_grad():
+            self.model.bias.add_(1.0)
+
+    def save(self, save_directory):
+        signals = numpy.concatenate([s["signal"] for s in self.memory_buffer])
+        numpy.save(save_directory / "signals.npy", signals)
+        numpy.save(save_directory / "steps_at_update.npy", self.steps_at_update)
+
+
+@pytest.mark.slow
+def test_distributed_session_broadcasts_weights(tmp_path):
+    from neodroidagent.common.session_factory.vertical.distributed import (
+        DistributedSession,
+    )
+
+    session = DistributedSession(
+        environment_factory=EchoEnvironment, num_observers=3, master_port=29531
+    )
+    session(
+        BiasAgent,
+        num_environment_steps=300,
+        batch_size=8,
+        initial_observation_period=20,
+        steps_per_push=16,
+        weight_sync_interval=5,
+        max_update_to_data_ratio=0.5,
+        max_queued_steps=32,
+        save_directory=tmp_path,
+    )
+
+    signals = numpy.load(tmp_path / "signals.npy")
+    steps_at_update = numpy.load(tmp_path / "steps_at_update.npy")
+    num_updates = len(steps_at_update)
+    assert len(signals) == 3 * 300
+    assert num_updates == 0.5 * len(signals)
+    assert (numpy.arange(num_updates) < 0.5 * steps_at_update).all()
+    assert (
+        steps_at_update <= numpy.maximum(2 * numpy.arange(num_updates) + 2, 20 + 2)
+    ).all()  # The learner keeps up with the observers, remembering two steps per update
+    assert signals.max() > 0  # The observers act with broadcast weights
+    assert signals.max() <= num_updates
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import math
+import time
+
+import numpy
+import pytest
+import torch
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+"""
+
+
+class Snapshot:
+    def __init__(self, observables, signal, terminated):
+        self.observables = observables
+        self.signal = signal
+        self.terminated = terminated
+
+
+class RandomEnvironment:
+    def reset(self):
+        return Snapshot(numpy.zeros((1, 1)), numpy.zeros(1), numpy.zeros(1, bool))
+
+    def react(self, action):
+        return Snapshot(
+            numpy.random.rand(1, 1), numpy.random.rand(1), numpy.random.rand(1) < 0.1
+        )
+
+    def render(self):
+        pass
+
+
+class SlowLearningAgent:
+    """
+Records the number of steps remembered at every update, updates are slower than environment steps
+"""
+
+    def __init__(self):
+        self.memory_buffer = []
+        self.steps_at_update = []
+        self.model = torch.nn.Linear(1, 1)
+
+    @property
+    def models(self):
+        return {"model": self.model}
+
+    def save(self, **kwargs):
+        pass
+
+    def sample(self, state):
+        return self.model(torch.tensor(state, dtype=torch.float))
+
+    def extract_action(self, sample):
+        return sample.numpy()
+
+    def extract_features(self, snapshot):
+        return numpy.array(snapshot.observables)
+
+    def extract_signal(self, snapshot):
+        return numpy.array(snapshot.signal)
+
+    def remember(self, **kwargs):
+        self.memory_buffer.append(kwargs)
+
+    def update(self, **kwargs):
+        time.sleep(1e-3)
+        self.steps_at_update.append(len(self.memory_buffer))
+
+
+@pytest.mark.parametrize("max_update_to_data_ratio", [1.0, 0.25, 2.0])
+def test_overlapped_updates_follow_update_to_data_ratio(max_update_to_data_ratio):
+    from neodroidagent.common.session_factory.vertical.procedures.training.off_policy_step_wise import (
+        OffPolicyStepWise,
+    )
+
+    agent = SlowLearningAgent()
+    OffPolicyStepWise(
+        agent,
+        environment=RandomEnvironment(),
+        save_best_throughout_training=False,
+    )(
+        overlap_actor_learner=True,
+        num_environment_steps=200,
+        batch_size=8,
+        initial_observation_period=20,
+        render_frequency=0,
+        max_update_to_data_ratio=max_update_to_data_ratio,
+        max_queued_steps=16,
+    )
+
+    assert len(agent.memory_buffer) == 200
+    assert len(agent.steps_at_update) == math.ceil(max_update_to_data_ratio * 200)
+    for num_updates, num_steps in enumerate(agent.steps_at_update):
+        assert num_steps > 20
+        assert num_updates < max_update_to_data_ratio * num_steps
+    assert agent.steps_at_update[0] < 200  # Updates are interleaved with the steps
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import numpy
+import pytest
+import torch
+
+from neodroidagent.utilities.signal.linear_recurrence import (
+    reverse_discount_numpy,
+    reverse_discount_torch,
+)
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = ""
+
+
+def stepwise_discount(signal, discount, non_terminal):
+    discounted = numpy.zeros_like(signal)
+    running = numpy.zeros_like(signal[0])
+    for t in reversed(range(len(signal))):
+        running = signal[t] + discount * non_terminal[t] * running
+        discounted[t] = running
+    return discounted
+
+
+@pytest.mark.parametrize("horizon", [1, 2, 7, 64, 1000])
+def test_reverse_discount_matches_stepwise(horizon):
+    signal = numpy.random.randn(horizon, 3, 1)
+    non_terminal = (numpy.random.random((horizon, 3, 1)) > 0.1).astype(float)
+    expected = stepwise_discount(signal, 0.97, non_terminal)
+
+    numpy.testing.assert_allclose(
+        reverse_discount_numpy(signal, 0.97, non_terminal), expected
+    )
+    numpy.testing.assert_allclose(
+        reverse_discount_torch(
+            torch.from_numpy(signal), 0.97, torch.from_numpy(non_terminal)
+        ).numpy(),
+        expected,
+    )
+    numpy.testing.assert_allclose(
+        reverse_discount_numpy(signal, 0.97),
+        stepwise_discount(signal, 0.97, numpy.ones_like(signal)),
+    )
+
+
+def test_reverse_discount_respects_episode_end():
+    signal = numpy.ones((5, 1), numpy.float32)
+    non_terminal = numpy.array([[1], [0], [1], [1], [1]], numpy.float32)
+    numpy.testing.assert_allclose(
+        reverse_discount_numpy(signal, 0.5, non_terminal)[:, 0],
+        [1.5, 1, 1.75, 1.5, 1],
+    )
@@ -23,3 +23,41 @@ def sample_transitions():
 @pytest.fixture
 def transitions():
     return sample_transitions()
+
+
+def stepwise_nstep(signals, values, terminals, discount_factor, n):
+    horizon = signals.shape[-1]
+    discounted = numpy.zeros_like(signals)
+    for start in range(horizon):
+        end = min(start + n, horizon)
+        g = values[:, end]
+        for t in reversed(range(start, end)):
+            g = signals[:, t] + discount_factor * g * (1 - terminals[:, t])
+        discounted[:, start] = g
+    return discounted
+
+
+@pytest.mark.parametrize("n", [1, 3, 20])
+def test_discounted_nstep_numpy_and_torch(n):
+    import torch
+
+    from neodroidagent.utilities.signal.experimental.nstep import discounted_nstep
+
+    signals = numpy.random.randn(4, 12)
+    terminals = (numpy.random.random((4, 12)) < 0.2).astype(float)
+    values = numpy.random.randn(4, 13)
+    expected = stepwise_nstep(signals, values, terminals, 0.9, n)
+
+    numpy.testing.assert_allclose(
+        discounted_nstep(signals, values, terminals, 0.9, n), expected
+    )
+    numpy.testing.assert_allclose(
+        discounted_nstep(
+            torch.from_numpy(signals),
+            torch.from_numpy(values),
+            torch.from_numpy(terminals),
+            0.9,
+            n,
+        ).numpy(),
+        expected,
+    )